@@ -14,6 +14,35 @@ with open(os.path.join(here, "keops_version"), encoding="utf-8") as v:
 from .config.config import set_build_folder, get_build_folder
 from .utils.code_gen_utils import clean_keops
 
+
+def precompile(specs, workers=None):
+    """
+    Compiles a list of formulas in parallel, see keopscore.utils.precompile
+    """
+    from .utils.precompile import precompile
+
+    return precompile(specs, workers=workers)
+
+
+def cache_stats():
+    """
+    Returns statistics about the cache of compiled formulas, see keopscore.utils.Cache
+    """
+    from .utils.Cache import cache_stats
+
+    return cache_stats()
+
+
+def clean_cache(max_size):
+    """
+    Removes the least recently used compiled formulas from the build folder,
+    until the total size of compiled files is lower than max_size (in bytes).
+    """
+    from .utils.Cache import clean_cache
+
+    return clean_cache(max_size)
+
+
 # flags for debugging :
 # prints information about atomic operations during code building
 debug_ops = False
@@ -23,12 +52,22 @@ debug_ops_at_exec = False
 
 cuda_block_size = 192
 
-from . import config as keopscoreconfig
+# parameters for the cache-blocked Cpu map-reduce scheme (CpuReduc_tiled) :
+# size in bytes of the local tiles of data (should fit in L1 cache),
+# and maximal number of i rows processed together in a block.
+cpu_tile_size = 16384
+cpu_block_size = 32
+
+# K-min type reductions (e.g. for K-nearest neighbors search) use the specialized Cpu
+# scheme CpuReduc_KMin ; set to False to use the generic Cpu schemes instead, e.g. for benchmarks.
+use_cpu_kmin_scheme = True
 
-if keopscoreconfig.config.use_cuda:
-    keopscoreconfig.config.init_cudalibs()
-    from .binders.nvrtc.Gpu_link_compile import Gpu_link_compile
-    from .binders.nvrtc.Gpu_link_compile import jit_compile_dll
+# maximal size in bytes of the compiled formulas in the build folder : when it is exceeded
+# after a compilation, the least recently used formulas are removed. None (default)
+# disables this ; see also clean_cache.
+cache_max_size = None
 
-    if not os.path.exists(jit_compile_dll()):
-        Gpu_link_compile.compile_jit_compile_dll()
+# N.B. Cuda libraries are not loaded here : this is done on first access to the
+# Cuda related parameters of keopscore.config.config (see probe_cuda), so that
+# importing keopscore does not probe the system.
+from . import config as keopscoreconfig
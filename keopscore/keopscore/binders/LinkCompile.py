@@ -3,8 +3,12 @@ import os
 import keopscore.config.config
 from keopscore.config.config import get_build_folder
 from keopscore.utils.code_gen_utils import get_hash_name
-from keopscore.utils.misc_utils import KeOps_Error, KeOps_Message
-from keopscore.config.config import cpp_flags
+from keopscore.utils.misc_utils import (
+    KeOps_Error,
+    KeOps_Message,
+    KeOps_FileLock,
+    KeOps_atomic_write,
+)
 
 
 class LinkCompile:
@@ -12,6 +16,10 @@ class LinkCompile:
     Base class for compiling the map_reduce schemes and providing the dll to KeOps bindings.
     """
 
+    # version of the calling interface of the compiled code. It is part of the hash,
+    # so that code compiled with a previous interface is not reused.
+    interface_version = 0
+
     def __init__(self):
         # N.B. Here self is assumed to be populated by the __init__ of one of the MapReduce classes
 
@@ -21,7 +29,7 @@ class LinkCompile:
             self.red_formula_string,
             self.aliases,
             self.nargs,
-            self.dtype,
+            self.storage_dtype,
             self.dtypeacc,
             self.sum_scheme_string,
             self.tagHostDevice,
@@ -29,7 +37,15 @@ class LinkCompile:
             self.tag1D2D,
             self.use_half,
             self.device_id,
-            cpp_flags,
+            self.use_int64_index,
+            self.use_strides,
+            keopscore.config.config.cpp_flags,
+            self.interface_version,
+        )
+
+        # lock_file is used to prevent concurrent compilations of the same formula, e.g. 7b9a611f7e.lock
+        self.lock_file = os.path.join(
+            get_build_folder(), self.gencode_filename + ".lock"
         )
 
         # info_file is the name of the file that will contain some meta-information required by the bindings, e.g. 7b9a611f7e.nfo
@@ -47,11 +63,10 @@ class LinkCompile:
         # create info_file to save some parameters : dim (dimension of output vectors),
         #                                            tagI (O or 1, reduction over i or j indices),
         #                                            dimy (sum of dimensions of j-indexed vectors)
-        f = open(self.info_file, "w")
-        f.write(
-            f"red_formula={self.red_formula_string}\ndim={self.dim}\ntagI={self.tagI}\ndimy={self.dimy}"
+        KeOps_atomic_write(
+            self.info_file,
+            f"red_formula={self.red_formula_string}\ndim={self.dim}\ntagI={self.tagI}\ndimy={self.dimy}",
         )
-        f.close()
 
     def read_info(self):
         # read info_file to retreive dim, tagI, dimy
@@ -81,26 +96,35 @@ class LinkCompile:
 
     def write_code(self):
         # write the generated code in the source file ; this is used as a subfunction of compile_code
-        f = open(self.gencode_file, "w")
-        f.write(self.code)
-        f.close()
+        KeOps_atomic_write(self.gencode_file, self.code)
 
     def generate_code(self):
         pass
 
+    def is_compiled(self):
+        return os.path.exists(self.file_to_check) and os.path.exists(self.info_file)
+
     def get_dll_and_params(self):
         # main method of the class : it generates - if needed - the code and returns the name of the dll to be run for
         # performing the reduction, e.g. 7b9a611f7e.so, or in the case of JIT compilation, the name of the main KeOps dll,
         # and the name of the assembly code file.
-        if not os.path.exists(self.file_to_check):
-            KeOps_Message(
-                "Generating code for formula " + self.red_formula.__str__() + " ... ",
-                flush=True,
-                end="",
-            )
-            self.generate_code()
-            self.save_info()
-            KeOps_Message("OK", use_tag=False, flush=True)
+        # The info file is written last, so that its existence means the compilation is complete.
+        if not self.is_compiled():
+            # several processes may share the same build folder : we lock and check again
+            with KeOps_FileLock(self.lock_file):
+                if not self.is_compiled():
+                    KeOps_Message(
+                        "Generating code for formula "
+                        + self.red_formula.__str__()
+                        + " ... ",
+                        flush=True,
+                        end="",
+                    )
+                    self.generate_code()
+                    self.save_info()
+                    KeOps_Message("OK", use_tag=False, flush=True)
+                else:
+                    self.read_info()
         else:
             self.read_info()
         return dict(
@@ -112,6 +136,7 @@ class LinkCompile:
             tag1D2D=self.tag1D2D,
             dimred=self.red_formula.dimred,
             dim=self.dim,
+            dimind=self.red_formula.dimind if self.index_output else 0,
             dimy=self.dimy,
             indsi=self.varloader.indsi,
             indsj=self.varloader.indsj,
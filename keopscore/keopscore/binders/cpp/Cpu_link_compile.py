@@ -1,25 +1,122 @@
+import os
+
+import keopscore.config.config
 from keopscore.binders.LinkCompile import LinkCompile
+from keopscore.utils.misc_utils import (
+    KeOps_Error,
+    KeOps_OS_Run,
+    code_generation_lock,
+)
 
 
 class Cpu_link_compile(LinkCompile):
     source_code_extension = "cpp"
 
+    # version 1 : separate integer output array for indices
+    # version 2 : number of OpenMP threads given at each call
+    # version 3 : strides of the input arrays
+    interface_version = 3
+
     def __init__(self):
         LinkCompile.__init__(self)
         # these are used for command line compiling mode
         self.low_level_code_file = "".encode("utf-8")
 
-        # actual dll to be called
-        self.true_dllname = self.gencode_file
+        # actual dll to be called : the generated code is compiled into a single shared library,
+        # which exposes a plain C entry point that the bindings load with ctypes.
+        self.true_dllname = os.path.join(
+            os.path.dirname(self.gencode_file), self.gencode_filename + ".so"
+        )
         # file to check for existence to detect compilation is needed
-        self.file_to_check = self.gencode_file
+        self.file_to_check = self.true_dllname
+
+    def get_c_entry_point_code(self):
+        # C wrapper around the launch_keops_cpu_ function of the generated code. Vectors are
+        # passed as (size, pointer) pairs, so that no binding library is needed to call it.
+        # If num_threads>0, the parallel loops of the call use num_threads OpenMP threads ;
+        # this setting is local to the calling thread, and restored after the call.
+        # argstrides gives the (row, column) strides of the input arrays, for the routines
+        # compiled with use_strides=1 ; it may be NULL otherwise.
+        dtype = self.dtype
+        return f"""
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
+extern "C" int launch_keops_cpu(int num_threads,
+                                int dimY, int nx, int ny,
+                                int tagI, int tagZero, int use_half,
+                                int dimred,
+                                int use_chunk_mode,
+                                int nindsi, int *indsi, int nindsj, int *indsj, int nindsp, int *indsp,
+                                int dimout,
+                                int *dimsx, int *dimsy, int *dimsp,
+                                int **ranges,
+                                int nshapeout, int *shapeout,
+                                {dtype} *out, int64_t *outind,
+                                int nargs, {dtype} **arg, int64_t *argstrides,
+                                int *argshape_sizes, int **argshape) {{
+
+    std::vector< std::vector< int > > argshape_v(nargs);
+    for (int k = 0; k < nargs; k++)
+        argshape_v[k] = std::vector< int >(argshape[k], argshape[k] + argshape_sizes[k]);
+
+#ifdef _OPENMP
+    int max_threads = omp_get_max_threads();
+    if (num_threads > 0)
+        omp_set_num_threads(num_threads);
+#endif
+
+    int res = launch_keops_cpu_{self.gencode_filename}< {dtype} >(dimY,
+                                                    nx,
+                                                    ny,
+                                                    tagI,
+                                                    tagZero,
+                                                    use_half,
+                                                    dimred,
+                                                    use_chunk_mode,
+                                                    std::vector< int >(indsi, indsi + nindsi),
+                                                    std::vector< int >(indsj, indsj + nindsj),
+                                                    std::vector< int >(indsp, indsp + nindsp),
+                                                    dimout,
+                                                    std::vector< int >(dimsx, dimsx + nindsi),
+                                                    std::vector< int >(dimsy, dimsy + nindsj),
+                                                    std::vector< int >(dimsp, dimsp + nindsp),
+                                                    ranges,
+                                                    std::vector< int >(shapeout, shapeout + nshapeout),
+                                                    out,
+                                                    outind,
+                                                    arg,
+                                                    argstrides,
+                                                    argshape_v);
+
+#ifdef _OPENMP
+    if (num_threads > 0)
+        omp_set_num_threads(max_threads);
+#endif
+    return res;
+}}
+"""
 
     def generate_code(self):
         # method to generate the code and compile it
         # generate the code and save it in self.code, by calling get_code method from CpuReduc class :
-        self.get_code()
+        with code_generation_lock:
+            self.get_code()
+            self.code += self.get_c_entry_point_code()
         # write the code in the source file
         self.write_code()
+        # compile the code into the shared library. We compile to a temporary file which is then
+        # moved to its final location, so that other processes never load a partially written library.
+        tmp_dllname = f"{self.true_dllname}.{os.getpid()}.tmp"
+        KeOps_OS_Run(
+            f"{keopscore.config.config.cxx_compiler} {keopscore.config.config.cpp_flags} {self.gencode_file} -o {tmp_dllname}"
+        )
+        if not os.path.exists(tmp_dllname):
+            KeOps_Error(
+                "Compilation of formula " + self.red_formula.__str__() + " failed."
+            )
+        os.replace(tmp_dllname, self.true_dllname)
         # retreive some parameters that will be saved into info_file.
         self.tagI = self.red_formula.tagI
         self.dim = self.red_formula.dim
@@ -15,7 +15,12 @@ from keopscore.config.config import (
     cuda_available,
     get_build_folder,
 )
-from keopscore.utils.misc_utils import KeOps_Error, KeOps_Message, KeOps_OS_Run
+from keopscore.utils.misc_utils import (
+    KeOps_Error,
+    KeOps_Message,
+    KeOps_OS_Run,
+    code_generation_lock,
+)
 from keopscore.utils.gpu_utils import get_gpu_props, cuda_include_fp16_path
 
 jit_compile_src = os.path.join(
@@ -60,7 +65,8 @@ class Gpu_link_compile(LinkCompile):
     def generate_code(self):
         # method to generate the code and compile it
         # generate the code and save it in self.code, by calling get_code method from GpuReduc class :
-        self.get_code()
+        with code_generation_lock:
+            self.get_code()
         # write the code in the source file
         self.write_code()
         # we execute the main dll, passing the code as argument, and the name of the low level code file to save the assembly instructions
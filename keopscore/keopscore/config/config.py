@@ -8,8 +8,8 @@ from keopscore.utils.misc_utils import KeOps_Warning, KeOps_Error
 import platform, sys
 
 # global parameters can be set here :
-use_cuda = True  # use cuda if possible
-use_OpenMP = True  # use OpenMP if possible (see function set_OpenMP below)
+use_cuda_if_possible = True  # use cuda if possible
+use_OpenMP_if_possible = True  # use OpenMP if possible (see probe_OpenMP below)
 
 # System Path
 base_dir_path = os.path.abspath(join(os.path.dirname(os.path.realpath(__file__)), ".."))
@@ -72,7 +72,9 @@ def set_build_folder(
     # reset all cached formulas if needed
     if reset_all:
         keopscore.get_keops_dll.get_keops_dll.reset(new_save_folder=_build_path)
-        if keopscore.config.config.use_cuda:
+        # N.B. if Cuda has not been probed yet, the jit compiler will be compiled
+        # when it is, so we do not trigger the probing here.
+        if globals().get("use_cuda", False):
             from keopscore.binders.nvrtc.Gpu_link_compile import (
                 Gpu_link_compile,
                 jit_compile_dll,
@@ -89,8 +91,6 @@ def get_build_folder():
     return _build_path
 
 
-jit_binary = join(_build_path, "keops_nvrtc.so")
-
 # Compiler
 cxx_compiler = os.getenv("CXX")
 if cxx_compiler is None:
@@ -110,65 +110,80 @@ if shutil.which(cxx_compiler) is None:
 compile_options = " -shared -fPIC -O3 -std=c++11"
 
 
-# cpp options
-if platform.system() == "Darwin":
-    cpp_flags = compile_options + " -flto"
-else:
-    cpp_flags = compile_options + " -flto=auto"
+# cpp options ; each formula is compiled as a single translation unit, so that
+# link time optimization is not needed.
+base_cpp_flags = compile_options
 
 disable_pragma_unrolls = True
 
-# OpenMP setting
-# adds compile flags for OpenMP support.
-if use_OpenMP:
-    if platform.system() == "Darwin":
-        import subprocess, importlib
 
-        res = subprocess.run(
-            'echo "#include <omp.h>" | g++ -E - -o /dev/null',
-            stdout=subprocess.PIPE,
-            shell=True,
-        )
-        if res.returncode != 0:
-            KeOps_Warning("omp.h header is not in the path, disabling OpenMP.")
-            use_OpenMP = False
-        else:
-            # we try to import either mkl or numpy, because it will load
-            # the shared libraries for OpenMP.
-            import importlib.util
-
-            if importlib.util.find_spec("mkl"):
-                import mkl
-            elif importlib.util.find_spec("numpy"):
-                import numpy
-            # Now we can look if one of libmkl_rt, libomp and/or libiomp is loaded.
-            pid = os.getpid()
-            loaded_libs = {}
-            for lib in ["libomp", "libiomp", "libmkl_rt"]:
-                res = subprocess.run(
-                    f"lsof -p {pid} | grep {lib}", stdout=subprocess.PIPE, shell=True
-                )
-                loaded_libs[lib] = (
-                    os.path.dirname(res.stdout.split(b" ")[-1]).decode("utf-8")
-                    if res.returncode == 0
-                    else None
-                )
-            if loaded_libs["libmkl_rt"]:
-                cpp_flags += f' -Xclang -fopenmp -lmkl_rt -L{loaded_libs["libmkl_rt"]}'
-            elif loaded_libs["libiomp"]:
-                cpp_flags += f' -Xclang -fopenmp -liomp5 -L{loaded_libs["libiomp"]}'
-            elif loaded_libs["libomp"]:
-                cpp_flags += f' -Xclang -fopenmp -lomp -L{loaded_libs["libomp"]}'
-            else:
-                KeOps_Warning("OpenMP shared libraries not loaded, disabling OpenMP.")
+# N.B. The parameters below (use_OpenMP, cpp_flags, use_cuda, cuda_version, etc.) require
+# to probe the system for OpenMP and Cuda libraries, which is slow. So they are not
+# computed at import, but on first access, through the module __getattr__ function
+# defined at the end of this file. Setting one of them before it is accessed
+# (e.g. keopscore.config.config.use_cuda = False) is still possible.
+
+
+def probe_OpenMP():
+    # adds compile flags for OpenMP support.
+    global use_OpenMP, cpp_flags
+    use_OpenMP = globals().get("use_OpenMP", use_OpenMP_if_possible)
+    cpp_flags = base_cpp_flags
+    if use_OpenMP:
+        if platform.system() == "Darwin":
+            import subprocess
+
+            res = subprocess.run(
+                'echo "#include <omp.h>" | g++ -E - -o /dev/null',
+                stdout=subprocess.PIPE,
+                shell=True,
+            )
+            if res.returncode != 0:
+                KeOps_Warning("omp.h header is not in the path, disabling OpenMP.")
                 use_OpenMP = False
-    else:
-        cpp_flags += " -fopenmp -fno-fat-lto-objects"
+            else:
+                # we try to import either mkl or numpy, because it will load
+                # the shared libraries for OpenMP.
+                import importlib.util
+
+                if importlib.util.find_spec("mkl"):
+                    import mkl
+                elif importlib.util.find_spec("numpy"):
+                    import numpy
+                # Now we can look if one of libmkl_rt, libomp and/or libiomp is loaded.
+                pid = os.getpid()
+                loaded_libs = {}
+                for lib in ["libomp", "libiomp", "libmkl_rt"]:
+                    res = subprocess.run(
+                        f"lsof -p {pid} | grep {lib}",
+                        stdout=subprocess.PIPE,
+                        shell=True,
+                    )
+                    loaded_libs[lib] = (
+                        os.path.dirname(res.stdout.split(b" ")[-1]).decode("utf-8")
+                        if res.returncode == 0
+                        else None
+                    )
+                if loaded_libs["libmkl_rt"]:
+                    cpp_flags += (
+                        f' -Xclang -fopenmp -lmkl_rt -L{loaded_libs["libmkl_rt"]}'
+                    )
+                elif loaded_libs["libiomp"]:
+                    cpp_flags += f' -Xclang -fopenmp -liomp5 -L{loaded_libs["libiomp"]}'
+                elif loaded_libs["libomp"]:
+                    cpp_flags += f' -Xclang -fopenmp -lomp -L{loaded_libs["libomp"]}'
+                else:
+                    KeOps_Warning(
+                        "OpenMP shared libraries not loaded, disabling OpenMP."
+                    )
+                    use_OpenMP = False
+        else:
+            cpp_flags += " -fopenmp"
 
-if platform.system() == "Darwin":
-    cpp_flags += " -undefined dynamic_lookup"
+    if platform.system() == "Darwin":
+        cpp_flags += " -undefined dynamic_lookup"
 
-cpp_flags += " -I" + bindings_source_dir
+    cpp_flags += " -I" + bindings_source_dir
 
 
 def find_and_try_library(libtag):
@@ -183,57 +198,76 @@ def find_and_try_library(libtag):
             return False
 
 
-cuda_dependencies = ["cuda", "nvrtc"]
-if all([find_and_try_library(lib) for lib in cuda_dependencies]):
-    # N.B. calling get_gpu_props issues a warning if cuda is not available, so we do not add another warning here
-    from keopscore.utils.gpu_utils import (
-        get_gpu_props,
-    )  # N.B. this import should be kept inside the if statement
+def probe_cuda():
+    # detects Cuda libraries and sets the Cuda related parameters.
+    global use_cuda, cuda_available, cuda_version, libcuda_folder, libnvrtc_folder
+    global nvrtc_flags, nvrtc_include, cuda_include_path
+    global jit_source_file, jit_source_header, jit_binary
+    use_cuda = globals().get("use_cuda", use_cuda_if_possible)
 
-    cuda_available = get_gpu_props()[0] > 0
-else:
-    cuda_available = False
-    KeOps_Warning(
-        "Cuda libraries were not detected on the system or could not be loaded ; using cpu only mode"
-    )
+    cuda_dependencies = ["cuda", "nvrtc"]
+    if all([find_and_try_library(lib) for lib in cuda_dependencies]):
+        # N.B. calling get_gpu_props issues a warning if cuda is not available, so we do not add another warning here
+        from keopscore.utils.gpu_utils import (
+            get_gpu_props,
+        )  # N.B. this import should be kept inside the if statement
 
-if not use_cuda and cuda_available:
-    KeOps_Warning(
-        "Cuda appears to be available on your system, but use_cuda is set to False in config.py. Using cpu only mode"
-    )
+        cuda_available = get_gpu_props()[0] > 0
+    else:
+        cuda_available = False
+        KeOps_Warning(
+            "Cuda libraries were not detected on the system or could not be loaded ; using cpu only mode"
+        )
 
-if use_cuda and not cuda_available:
-    use_cuda = False
+    if not use_cuda and cuda_available:
+        KeOps_Warning(
+            "Cuda appears to be available on your system, but use_cuda is set to False. Using cpu only mode"
+        )
 
-if use_cuda:
-    from keopscore.utils.gpu_utils import (
-        libcuda_folder,
-        libnvrtc_folder,
-        get_cuda_include_path,
-        get_cuda_version,
-    )
+    if use_cuda and not cuda_available:
+        use_cuda = False
+
+    if use_cuda:
+        from keopscore.utils.gpu_utils import (
+            libcuda_folder,
+            libnvrtc_folder,
+            get_cuda_include_path,
+            get_cuda_version,
+        )
+
+        cuda_version = get_cuda_version()
+        nvrtc_flags = (
+            compile_options
+            + f" -fpermissive -L{libcuda_folder} -L{libnvrtc_folder} -lcuda -lnvrtc"
+        )
+        nvrtc_include = " -I" + bindings_source_dir
+        cuda_include_path = get_cuda_include_path()
+        if cuda_include_path:
+            nvrtc_include += " -I" + cuda_include_path
+        jit_source_file = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.cpp")
+        jit_source_header = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.h")
+        jit_binary = join(_build_path, "keops_nvrtc.so")
+
+        # loads the Cuda libraries, and compiles the jit compiler if needed
+        init_cudalibs()
+        from keopscore.binders.nvrtc.Gpu_link_compile import (
+            Gpu_link_compile,
+            jit_compile_dll,
+        )
+
+        if not os.path.exists(jit_compile_dll()):
+            Gpu_link_compile.compile_jit_compile_dll()
+    else:
+        cuda_version = None
+        libcuda_folder = None
+        libnvrtc_folder = None
+        nvrtc_flags = None
+        nvrtc_include = None
+        cuda_include_path = None
+        jit_source_file = None
+        jit_source_header = None
+        jit_binary = None
 
-    cuda_version = get_cuda_version()
-    nvrtc_flags = (
-        compile_options
-        + f" -fpermissive -L{libcuda_folder} -L{libnvrtc_folder} -lcuda -lnvrtc"
-    )
-    nvrtc_include = " -I" + bindings_source_dir
-    cuda_include_path = get_cuda_include_path()
-    if cuda_include_path:
-        nvrtc_include += " -I" + cuda_include_path
-    jit_source_file = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.cpp")
-    jit_source_header = join(base_dir_path, "binders", "nvrtc", "keops_nvrtc.h")
-else:
-    cuda_version = None
-    libcuda_folder = None
-    libnvrtc_folder = None
-    nvrtc_flags = None
-    nvrtc_include = None
-    cuda_include_path = None
-    jit_source_file = None
-    jit_source_header = None
-    jit_binary = None
 
 init_cudalibs_flag = False
 
@@ -246,3 +280,30 @@ def init_cudalibs():
         CDLL(find_library("cuda"), mode=RTLD_GLOBAL)
         CDLL(find_library("cudart"), mode=RTLD_GLOBAL)
         keopscore.config.config.init_cudalibs_flag = True
+
+
+# lazily evaluated parameters, and the functions which compute them
+lazy_parameters = {
+    "use_OpenMP": probe_OpenMP,
+    "cpp_flags": probe_OpenMP,
+    "use_cuda": probe_cuda,
+    "cuda_available": probe_cuda,
+    "cuda_version": probe_cuda,
+    "libcuda_folder": probe_cuda,
+    "libnvrtc_folder": probe_cuda,
+    "nvrtc_flags": probe_cuda,
+    "nvrtc_include": probe_cuda,
+    "cuda_include_path": probe_cuda,
+    "jit_source_file": probe_cuda,
+    "jit_source_header": probe_cuda,
+    "jit_binary": probe_cuda,
+}
+
+
+def __getattr__(name):
+    # called only for attributes which are not yet defined : the probing function
+    # sets all the parameters it is responsible for as global variables.
+    if name in lazy_parameters:
+        lazy_parameters[name]()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,6 +7,7 @@ from keopscore.formulas.maths import *
 from keopscore.formulas.complex import *
 from keopscore.formulas.variables import *
 from keopscore.formulas.autodiff import *
+from keopscore.formulas.simplification import simplify_reduction
 
 
 class GetReduction:
@@ -25,6 +26,9 @@ class GetReduction:
                     varname, var = alias.split("=")
                     aliases_dict[varname] = eval(var)
             reduction = eval(red_formula_string, globals(), aliases_dict)
+            # algebraic simplification of the formula, e.g. -(-f) -> f, Sum(f) -> f if f is scalar.
+            # This applies to the gradient formulas as well, since they are also built here.
+            reduction = simplify_reduction(reduction)
             GetReduction.library[string_id_hash] = reduction
             return reduction
 
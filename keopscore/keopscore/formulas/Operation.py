@@ -1,8 +1,22 @@
-from keopscore.utils.code_gen_utils import new_c_varname, c_array
+import threading
+
+from keopscore.utils.code_gen_utils import new_c_varname, c_array, VectCopy
 from keopscore.utils.Tree import Tree
 from keopscore import debug_ops, debug_ops_at_exec
 from keopscore.utils.misc_utils import KeOps_Error
 
+# c_arrays holding the values of the repeated subformulas of the formula being evaluated
+# by the current thread, stored as lists of (subformula, c_array) pairs indexed by the string
+# of the subformula. cse_state.arrays is None outside of the evaluation of a formula.
+# N.B. this state is local to each thread, since the code of several formulas may be
+# generated at the same time by different threads.
+cse_state = threading.local()
+
+
+def get_cse_arrays():
+    return getattr(cse_state, "arrays", None)
+
+
 ###################
 ## Base class
 ###################
@@ -44,11 +58,108 @@ class Operation(Tree):
             new_children = [child.replace(old, new) for child in self.children]
             return type(self)(*new_children, *self.params)
 
-    def __call__(self, out, table):
+    # total number of subformula evaluations removed by common subexpression elimination
+    num_cse_deduplicated = 0
+
+    def count_subformulas(self, counts):
+        # counts the occurences of all subformulas of self, using the string of
+        # subformulas as key and __eq__ to distinguish between formulas with same string.
+        if self.get_cse_array() is not None:
+            # self has already been evaluated outside of the formula
+            return
+        key = self.__repr__()
+        bucket = counts.setdefault(key, [])
+        for item in bucket:
+            if item[0] == self:
+                item[1] += 1
+                break
+        else:
+            bucket.append([self, 1])
+        for child in self.children:
+            child.count_subformulas(counts)
+
+    def num_nodes(self):
+        return 1 + sum(child.num_nodes() for child in self.children)
+
+    def independent_subformulas(self, cat, excluded=()):
+        # returns the list of maximal subformulas of self which do not depend on variables
+        # of category cat, skipping variables and constants, and the subformulas in excluded.
+        # These subformulas can be evaluated outside of the loop over the index of category cat.
+        if len(self.children) == 0 or self in excluded:
+            return []
+        if len(self.Vars(cat)) == 0:
+            return [self]
+        res = []
+        for child in self.children:
+            for f in child.independent_subformulas(cat, excluded):
+                if f not in res:
+                    res.append(f)
+        return res
+
+    def get_cse_array(self):
+        # returns the c_array holding the value of self if it is a repeated subformula
+        # which has already been evaluated, None otherwise.
+        cse_arrays = get_cse_arrays()
+        if not cse_arrays:
+            return None
+        for f, arr in cse_arrays.get(self.__repr__(), []):
+            if f == self:
+                return arr
+        return None
+
+    def __call__(self, out, table, precomputed=()):
         """returns the C++ code string corresponding to the evaluation of the formula
          - out is a c_variable in which the result of the evaluation is stored
          - table is the list of c_variables corresponding to actual local variables
-        required for evaluation : each Var(ind,*,*) corresponds to table[ind]"""
+        required for evaluation : each Var(ind,*,*) corresponds to table[ind]
+         - precomputed is a list of (subformula, c_array) pairs, for subformulas
+        which have already been evaluated, e.g. outside of the inner reduction loop"""
+        if get_cse_arrays() is not None:
+            return self.eval_block(out, table)
+
+        cse_arrays = cse_state.arrays = {}
+        for f, arr in precomputed:
+            cse_arrays.setdefault(f.__repr__(), []).append((f, arr))
+        arr = self.get_cse_array()
+        if arr is not None:
+            cse_state.arrays = None
+            return VectCopy(out, arr)
+
+        # Common subexpression elimination : subformulas that occur several times in the formula
+        # (typically after differentiation) are evaluated only once, into local arrays declared
+        # at the beginning of the code block, and then reused. Inner subformulas are evaluated first.
+        counts = {}
+        self.count_subformulas(counts)
+        repeated, num_deduplicated = [], 0
+        for bucket in counts.values():
+            for f, count in bucket:
+                if count > 1 and len(f.children) > 0:
+                    repeated.append(f)
+                    num_deduplicated += count - 1
+        repeated.sort(key=lambda f: f.num_nodes())
+        string = f"\n{{\n// Evaluation of {len(repeated)} repeated subformulas.\n\n"
+        try:
+            for f in repeated:
+                arr = c_array(
+                    out.dtype, f.dim, new_c_varname("cse_" + f.string_id.lower())
+                )
+                string += f"{arr.declare()}\n"
+                string += f.eval_block(arr, table)
+                cse_arrays.setdefault(f.__repr__(), []).append((f, arr))
+            string += self.eval_block(out, table)
+        finally:
+            cse_state.arrays = None
+        string += "\n}\n"
+        Operation.num_cse_deduplicated += num_deduplicated
+        if debug_ops:
+            print(
+                f"Common subexpression elimination : {num_deduplicated} deduplicated nodes for {self.__repr__()}"
+            )
+        return string
+
+    def eval_block(self, out, table):
+        # returns the C++ code string corresponding to the evaluation of the formula,
+        # reusing the values of repeated subformulas already evaluated.
         from keopscore.formulas.variables.Var import Var
 
         string = f"\n{{\n// Starting code block for {self.__repr__()}.\n\n"
@@ -64,10 +175,14 @@ class Operation(Tree):
         args = []
         # Evaluation of the child operations
         for child in self.children:
+            cse_arg = None if isinstance(child, Var) else child.get_cse_array()
             if isinstance(child, Var):
                 # if the child of the operation is a Var, we do not need to evaluate it,
                 # we simply record the corresponding c_variable
                 arg = table[child.ind]
+            elif cse_arg is not None:
+                # if the child is a repeated subformula, it has already been evaluated
+                arg = cse_arg
             else:
                 # otherwise, we need to evaluate the child operation.
                 # We first create a new c_array to store the result of the child operation.
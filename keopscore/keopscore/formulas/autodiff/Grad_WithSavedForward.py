@@ -1,5 +1,37 @@
+from keopscore.formulas.maths.Concat import Concat
+from keopscore.formulas.reductions.Sum_Reduction import Sum_Reduction
+from keopscore.formulas.reductions.Zero_Reduction import Zero_Reduction
+from keopscore.formulas.variables.Zero import Zero
+from keopscore.utils.misc_utils import KeOps_Error
+
 # same as Grad with additional saved forward variable. This is only used for taking gradients of reductions operations.
+# If v is a concatenation of variables, e.g. Concat(Var(0,3,0),Var(2,1,0)), the gradients with respect
+# to all these variables are computed in a single reduction, which outputs the concatenation of the gradients.
+# This requires all variables to be reduced along the same axis.
 
 
 def Grad_WithSavedForward(red_formula, v, gradin, f0):
+    if isinstance(v, Concat):
+        grads = [Grad_WithSavedForward(red_formula, u, gradin, f0) for u in v.children]
+        tagI = grads[0].tagI
+        for grad in grads:
+            if not isinstance(grad, (Sum_Reduction, Zero_Reduction)):
+                KeOps_Error(
+                    "gradients with respect to several variables are only implemented for sum type gradient reductions."
+                )
+            if grad.tagI != tagI:
+                KeOps_Error(
+                    "gradients with respect to several variables require all variables to be reduced along the same axis."
+                )
+        if all(
+            isinstance(grad, Zero_Reduction) or isinstance(grad.formula, Zero)
+            for grad in grads
+        ):
+            # e.g. for the gradients of ArgMin reductions : the output is filled with zeros
+            # instead of summing a zero formula over all pairs (i,j)
+            return Zero_Reduction(sum(grad.dim for grad in grads), tagI)
+        formula = grads[0].formula
+        for grad in grads[1:]:
+            formula = Concat(formula, grad.formula)
+        return Sum_Reduction(formula, tagI)
     return red_formula.DiffT(v, gradin, f0)
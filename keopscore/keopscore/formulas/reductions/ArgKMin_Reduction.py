@@ -17,6 +17,7 @@ class ArgKMin_Reduction(KMin_ArgKMin_Reduction):
     def __init__(self, formula, K, tagIJ):
         super().__init__(formula, K, tagIJ)
         self.dim = K * formula.dim
+        self.dimind = K * formula.dim
 
     def FinalizeOutput(self, acc, out, i):
         fdim = self.formula.dim
@@ -28,7 +29,9 @@ class ArgKMin_Reduction(KMin_ArgKMin_Reduction):
         )
         body += inner_loop(out[p].assign(acc[l + fdim]) + p.add_assign(fdim))
         return loop(body)
-        outer_body
 
-    def DiffT(self, v, gradin):
+    def FinalizeOutputIndices(self, acc, out, outind, i):
+        return self.FinalizeOutput(acc, outind, i)
+
+    def DiffT(self, v, gradin, f0=None):
         return Zero_Reduction(v.dim, v.cat % 2)
@@ -15,10 +15,14 @@ class ArgMin_Reduction(Min_ArgMin_Reduction_Base):
     def __init__(self, formula, tagIJ):
         super().__init__(formula, tagIJ)
         self.dim = formula.dim
+        self.dimind = formula.dim
 
     def FinalizeOutput(self, acc, out, i):
         acc_val, acc_ind = acc.split(self.dim, self.dim)
         return VectCopy(out, acc_ind)
 
-    def DiffT(self, v, gradin):
+    def FinalizeOutputIndices(self, acc, out, outind, i):
+        return self.FinalizeOutput(acc, outind, i)
+
+    def DiffT(self, v, gradin, f0=None):
         return Zero_Reduction(v.dim, v.cat % 2)
@@ -31,6 +31,8 @@ class KMin_ArgKMin_Reduction(Reduction):
         # We work with a (values,indices) vector
         self.dimred = self.dim  # dimension of inner reduction variables
 
+        self.dimind = K * formula.dim
+
     def InitializeReduction(self, acc):
         # Returns C++ code to be used at initialization phase of the reduction.
         if acc.dtype == "half2":
@@ -44,6 +46,21 @@ class KMin_ArgKMin_Reduction(Reduction):
             )
         )
 
+    def FinalizeOutputIndices(self, acc, out, outind, i):
+        # the accumulator stores the K (values,indices) pairs as 2*fdim consecutive values ;
+        # we write the K values in out and the K indices in outind, with the same (K,fdim) layout.
+        fdim = self.formula.dim
+        p = c_variable("int", new_c_varname("p"))
+        loop, k = c_for_loop(0, fdim, 1, pragma_unroll=True)
+        body = p.declare_assign(k)
+        inner_loop, l = c_for_loop(
+            k, k + 2 * self.K * fdim, 2 * fdim, pragma_unroll=True
+        )
+        body += inner_loop(
+            out[p].assign(acc[l]) + outind[p].assign(acc[l + fdim]) + p.add_assign(fdim)
+        )
+        return loop(body)
+
     def ReducePair(self, acc, xi):
         # Returns C++ code that implements the update phase of the reduction.
         dtype = xi.dtype
@@ -20,6 +20,11 @@ class KMin_Reduction(KMin_ArgKMin_Reduction):
     def __init__(self, formula, K, tagIJ):
         super().__init__(formula, K, tagIJ)
         self.dim = K * formula.dim
+        # only the values are returned, there is no index output
+        self.dimind = 0
+
+    def FinalizeOutputIndices(self, acc, out, outind, i):
+        return self.FinalizeOutput(acc, out, i)
 
     def FinalizeOutput(self, acc, out, i):
         fdim, K = self.formula.dim, self.K
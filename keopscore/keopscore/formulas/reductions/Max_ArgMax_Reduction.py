@@ -14,6 +14,11 @@ class Max_ArgMax_Reduction(Max_ArgMax_Reduction_Base):
     def __init__(self, formula, tagIJ):
         super().__init__(formula, tagIJ)
         self.dim = 2 * formula.dim
+        self.dimind = formula.dim
 
     def FinalizeOutput(self, acc, out, i):
         return VectCopy(out, acc)
+
+    def FinalizeOutputIndices(self, acc, out, outind, i):
+        acc_val, acc_ind = acc.split(self.dimind, self.dimind)
+        return VectCopy(out, acc_val) + VectCopy(outind, acc_ind)
@@ -5,6 +5,10 @@ from keopscore.utils.Tree import Tree
 class Reduction(Tree):
     """Base class for all KeOps final reductions over a formula"""
 
+    # number of output values of the reduction which are indices (e.g. for ArgMin reduction).
+    # Map-reduce schemes which support it write them in a separate integer output array.
+    dimind = 0
+
     def __init__(self, formula, tagI):
         """- formula is an object of type Operation, it is the formula on which we apply a reduction
         - tagI : 0 or 1, specifies wether we do the reduction over "i"-indexed or "j"-indexed variables.
@@ -38,3 +42,9 @@ class Reduction(Tree):
         updated during the reduction, with possibly a cast if the accumulator was of
         different data type."""
         return VectCopy(out, acc)
+
+    def FinalizeOutputIndices(self, acc, out, outind, i):
+        """Same as FinalizeOutput, for map-reduce schemes which write the indices
+        in the separate integer array outind, of dimension dimind. In this case out
+        has dimension dim-dimind and contains the other output values."""
+        return self.FinalizeOutput(acc, out, i)
@@ -0,0 +1,254 @@
+from copy import copy
+
+from keopscore import debug_ops
+from keopscore.formulas.maths import Abs, Exp, Extract, Inv, Log, Sqrt
+from keopscore.formulas.maths.Add import Add, Add_Impl
+from keopscore.formulas.maths.Divide import Divide, Divide_Impl
+from keopscore.formulas.maths.Minus import Minus, Minus_Impl
+from keopscore.formulas.maths.Mult import Mult, Mult_Impl
+from keopscore.formulas.maths.Scalprod import Scalprod, Scalprod_Impl
+from keopscore.formulas.maths.Square import Square, Square_Impl
+from keopscore.formulas.maths.Subtract import Subtract, Subtract_Impl
+from keopscore.formulas.maths.Sum import Sum, Sum_Impl
+from keopscore.formulas.maths.SumT import SumT, SumT_Impl
+from keopscore.formulas.reductions.Max_SumShiftExpWeight_Reduction import (
+    Max_SumShiftExpWeight_Reduction,
+)
+from keopscore.formulas.variables.IntCst import IntCst, IntCst_Impl
+from keopscore.formulas.variables.Zero import Zero
+
+###########################################################
+# Algebraic simplification of formulas.
+#
+# Formulas are rewritten bottom-up until a fixpoint is reached. Each node is
+# rebuilt with the public constructors (Mult, Add, Sum, etc.), which already
+# perform the basic simplifications (e.g. 1*f -> f, f+Zero -> f), and then the
+# rewrite rules below are applied to it. All rules preserve the dimension of the
+# formula, and are identities on real numbers. Most of them also give the same
+# results in floating point arithmetic, except Log(Exp(f)) -> f and
+# Sqrt(Square(f)) -> Abs(f), which change the values computed by the formula
+# (see simplify_log and simplify_sqrt).
+#
+# N.B. Square(Sqrt(f)) -> f and Exp(Log(f)) -> f are deliberately not
+# implemented, since they are not valid for negative values of f.
+###########################################################
+
+# public constructors for the operations that perform simplifications
+# at creation, used for rebuilding nodes after their children have changed.
+constructors = {
+    Add_Impl: Add,
+    Divide_Impl: Divide,
+    Minus_Impl: Minus,
+    Mult_Impl: Mult,
+    Scalprod_Impl: Scalprod,
+    Square_Impl: Square,
+    Subtract_Impl: Subtract,
+    Sum_Impl: Sum,
+    SumT_Impl: SumT,
+}
+
+
+def rebuild(f, children):
+    # creates a copy of node f with new children
+    constructor = constructors.get(type(f), type(f))
+    return constructor(*children, *f.params)
+
+
+def simplify_minus(f):
+    (arg,) = f.children
+    if isinstance(arg, Minus_Impl):
+        # -(-f) -> f
+        return arg.children[0]
+    elif isinstance(arg, IntCst_Impl):
+        # -(n) -> (-n)
+        return IntCst(-arg.val)
+    elif isinstance(arg, Subtract_Impl):
+        # -(f-g) -> g-f
+        return Subtract(arg.children[1], arg.children[0])
+    elif isinstance(arg, Mult_Impl) and isinstance(arg.children[0], IntCst_Impl):
+        # -(n*f) -> (-n)*f
+        return Mult(IntCst(-arg.children[0].val), arg.children[1])
+
+
+def simplify_add(f):
+    arg0, arg1 = f.children
+    if isinstance(arg0, IntCst_Impl) and isinstance(arg1, IntCst_Impl):
+        # m+n -> (m+n)
+        return IntCst(arg0.val + arg1.val)
+    elif isinstance(arg1, Minus_Impl):
+        # f+(-g) -> f-g
+        return Subtract(arg0, arg1.children[0])
+    elif isinstance(arg0, Minus_Impl):
+        # (-f)+g -> g-f
+        return Subtract(arg1, arg0.children[0])
+
+
+def simplify_subtract(f):
+    arg0, arg1 = f.children
+    if isinstance(arg0, IntCst_Impl) and isinstance(arg1, IntCst_Impl):
+        # m-n -> (m-n)
+        return IntCst(arg0.val - arg1.val)
+    elif isinstance(arg1, Minus_Impl):
+        # f-(-g) -> f+g
+        return Add(arg0, arg1.children[0])
+
+
+def simplify_mult(f):
+    arg0, arg1 = f.children
+    if isinstance(arg0, Minus_Impl) and isinstance(arg1, Minus_Impl):
+        # (-f)*(-g) -> f*g
+        return Mult(arg0.children[0], arg1.children[0])
+    elif isinstance(arg0, IntCst_Impl) and isinstance(arg1, Minus_Impl):
+        # n*(-f) -> (-n)*f
+        return Mult(IntCst(-arg0.val), arg1.children[0])
+
+
+def simplify_divide(f):
+    arg0, arg1 = f.children
+    if isinstance(arg1, IntCst_Impl) and arg1.val == 1:
+        # f/1 -> f
+        return arg0
+    elif isinstance(arg0, Minus_Impl) and isinstance(arg1, Minus_Impl):
+        # (-f)/(-g) -> f/g
+        return Divide(arg0.children[0], arg1.children[0])
+
+
+def simplify_sum(f):
+    (arg,) = f.children
+    if arg.dim == 1:
+        # Sum(f) -> f if f is scalar-valued
+        return arg
+
+
+def simplify_sumt(f):
+    (arg,) = f.children
+    if isinstance(arg, Zero):
+        # SumT(Zero(1),d) -> Zero(d)
+        return Zero(f.dim)
+
+
+def simplify_scalprod(f):
+    if any(isinstance(arg, Zero) for arg in f.children):
+        # <f,Zero> -> Zero(1)
+        return Zero(1)
+
+
+def simplify_square(f):
+    (arg,) = f.children
+    if isinstance(arg, (Minus_Impl, Abs)):
+        # Square(-f) -> Square(f), Square(Abs(f)) -> Square(f)
+        return Square(arg.children[0])
+
+
+def simplify_abs(f):
+    (arg,) = f.children
+    if isinstance(arg, (Minus_Impl, Abs)):
+        # Abs(-f) -> Abs(f), Abs(Abs(f)) -> Abs(f)
+        return Abs(arg.children[0])
+
+
+def simplify_sqrt(f):
+    (arg,) = f.children
+    if isinstance(arg, Square_Impl):
+        # Sqrt(Square(f)) -> Abs(f)
+        # N.B. this is not exact in floating point arithmetic : Square(f) overflows to inf
+        # for large values of f (e.g. |f| > 1.8e19 in float32), whereas Abs(f) does not ;
+        # and the gradient at f=0 becomes 0 (Sign(0)) instead of NaN (0 times inf).
+        return Abs(arg.children[0])
+
+
+def simplify_inv(f):
+    (arg,) = f.children
+    if isinstance(arg, Inv):
+        # Inv(Inv(f)) -> f
+        return arg.children[0]
+
+
+def simplify_log(f):
+    (arg,) = f.children
+    if isinstance(arg, Exp):
+        # Log(Exp(f)) -> f
+        # N.B. this is not exact in floating point arithmetic : Exp(f) overflows to inf
+        # (resp. underflows to 0) for large (resp. large negative) values of f, e.g. f > 88
+        # in float32, so that Log(Exp(f)) gives inf (resp. -inf) where f is returned now.
+        return arg.children[0]
+
+
+def simplify_extract(f):
+    (arg,) = f.children
+    if isinstance(arg, Zero):
+        # Extract(Zero) -> Zero
+        return Zero(f.dim)
+    elif f.start == 0 and f.dim == arg.dim:
+        # Extract(f,0,f.dim) -> f
+        return arg
+
+
+rules = {
+    Abs: simplify_abs,
+    Add_Impl: simplify_add,
+    Divide_Impl: simplify_divide,
+    Extract: simplify_extract,
+    Inv: simplify_inv,
+    Log: simplify_log,
+    Minus_Impl: simplify_minus,
+    Mult_Impl: simplify_mult,
+    Scalprod_Impl: simplify_scalprod,
+    Sqrt: simplify_sqrt,
+    Square_Impl: simplify_square,
+    Subtract_Impl: simplify_subtract,
+    Sum_Impl: simplify_sum,
+    SumT_Impl: simplify_sumt,
+}
+
+
+def simplify_node(f):
+    # simplifies the children of f, then applies the rewrite rules to f itself
+    if len(f.children) == 0:
+        return f
+    children = [simplify_node(child) for child in f.children]
+    if any(new is not old for new, old in zip(children, f.children)):
+        f = rebuild(f, children)
+    rule = rules.get(type(f), None)
+    while rule is not None:
+        res = rule(f)
+        if res is None:
+            break
+        f = res
+        rule = rules.get(type(f), None)
+    return f
+
+
+def simplify(formula, max_iter=100):
+    """Returns a simplified formula equivalent to formula, obtained by applying
+    rewrite rules until a fixpoint is reached."""
+    for _ in range(max_iter):
+        res = simplify_node(formula)
+        if res == formula:
+            break
+        formula = res
+    return formula
+
+
+def simplify_reduction(red):
+    """Returns the reduction red with simplified formulas."""
+    if isinstance(red, Max_SumShiftExpWeight_Reduction):
+        formulaF, formulaG = simplify(red.formulaF), simplify(red.formulaG)
+        if formulaF == red.formulaF and formulaG == red.formulaG:
+            return red
+        res = Max_SumShiftExpWeight_Reduction(formulaF, red.tagI, formulaG)
+    elif hasattr(red, "formula"):
+        formula = simplify(red.formula)
+        if formula == red.formula:
+            return red
+        # N.B. some reductions have extra parameters (e.g. K for KMin),
+        # so we copy the reduction object rather than create a new one.
+        res = copy(red)
+        res.formula = formula
+        res.children = [formula]
+        res.Vars_ = formula.Vars_
+    else:
+        return red
+    if debug_ops:
+        print(f"Simplification : {red.__repr__()} -> {res.__repr__()}")
+    return res
@@ -1,6 +1,6 @@
 """
 This is the main entry point for all binders. It takes as inputs :
-  - map_reduce_id : string naming the type of map-reduce scheme to be used : either "CpuReduc", "GpuReduc1D_FromDevice", ...
+  - map_reduce_id : string naming the type of map-reduce scheme to be used : either "CpuReduc", "CpuReduc_tiled", "GpuReduc1D_FromDevice", ...
   - red_formula_string : string expressing the formula, such as "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)",
   - enable_chunks : -1, 0 or 1, for Gpu mode only, enable special routines for high dimensions (-1 means automatic setting)
   - enable_finalchunks : -1, 0 or 1, for Gpu mode only, enable special routines for final operation in high dimensions (-1 means automatic setting)
@@ -15,6 +15,10 @@ This is the main entry point for all binders. It takes as inputs :
   - tag1D2D : 0 or 1, for Gpu mode only, use 1D (0) or 2D (1) computation map-reduce scheme
   - use_half : 0 or 1, for Gpu mode only, enable special routines for half-precision data type
   - device_id : integer, for Gpu mode only, id of Gpu device to build the code for
+  - use_int64_index : 0 or 1, for Cpu mode only, compute the offsets of the rows in the input arrays
+      with 64 bits integers, for arrays with more than 2^31-1 elements
+  - use_strides : 0 or 1, for Cpu mode only, read the input arrays with the (row, column) strides
+      given at each call, so that strided views of arrays can be used without copies
 
 It returns
       - tag : string, hash code used as id for the input formula and parameters
@@ -32,6 +36,9 @@ It returns
       - tag1D2D : same as input
       - dimred : integer, dimension of the inner reduction operation.
       - dim : integer, dimension of the output tensor.
+      - dimind : integer, number of output values which are indices (e.g. for ArgMin reductions) and are
+            written in a separate integer output tensor, in which case the output tensor has dimension dim-dimind.
+            This is only supported in Cpu mode ; in Gpu mode dimind=0 and indices are encoded as floats.
       - dimy : integer, total dimension of the j indexed variables.
       - indsi : list of integers, indices of i indexed variables.
       - indsj : list of integers, indices of j indexed variables.
@@ -42,11 +49,12 @@ It returns
 
 It can be used as a Python function or as a standalone Python script (in which case it prints the outputs):
   - example (as Python function) :
-      get_keops_dll("CpuReduc", "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)", 0, 0, 0, [], 3, "float", "float", "block_sum", 0, 0, 0, 0, 0)
+      get_keops_dll("CpuReduc", "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)", 0, 0, 0, [], 3, "float", "float", "block_sum", 0, 0, 0, 0, 0, 0, 0)
   - example (as Python script) :
-      python get_keops_dll.py CpuReduc "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)" 0 0 0 "[]" 3 float float block_sum 0 0 0 0 0
+      python get_keops_dll.py CpuReduc "Sum_Reduction((Exp(Minus(Sum(Square((Var(0,3,0) / Var(1,3,1)))))) * Var(2,1,1)),0)" 0 0 0 "[]" 3 float float block_sum 0 0 0 0 0 0 0
 """
 import inspect
+import os
 import sys
 
 import keopscore.config.config
@@ -61,16 +69,26 @@ from keopscore.config.chunks import (
     use_final_chunks,
     set_mult_var_highdim,
 )
-from keopscore.formulas import Zero_Reduction, Sum_Reduction
+from keopscore.formulas import Zero_Reduction, Sum_Reduction, KMin_ArgKMin_Reduction
 from keopscore.formulas.GetReduction import GetReduction
 from keopscore.formulas.variables.Zero import Zero
-from keopscore.utils.Cache import Cache
+from keopscore.utils.Cache import Cache, clean_cache
 from keopscore.utils.code_gen_utils import KeOps_Error
+from keopscore.utils.misc_utils import code_generation_lock
 
 # Get every classes in mapreduce
 map_reduce = dict(inspect.getmembers(keopscore.mapreduce, inspect.isclass))
 
 
+def get_map_reduce_class(map_reduce_id):
+    # the Gpu classes are added to map_reduce on first use
+    if map_reduce_id not in map_reduce and "Gpu" in map_reduce_id:
+        import keopscore.mapreduce.gpu
+
+        map_reduce.update(inspect.getmembers(keopscore.mapreduce.gpu, inspect.isclass))
+    return map_reduce[map_reduce_id]
+
+
 def get_keops_dll_impl(
     map_reduce_id,
     red_formula_string,
@@ -80,51 +98,69 @@ def get_keops_dll_impl(
     aliases,
     *args,
 ):
-    # detecting the need for special chunked computation modes :
-    use_chunk_mode = 0
-    if "Gpu" in map_reduce_id:
-        if not keopscore.config.config.use_cuda:
-            KeOps_Error(
-                "You selected a Gpu reduce scheme but KeOps is in Cpu only mode."
-            )
-        set_enable_chunk(enable_chunks)
-        set_enable_finalchunk(enable_finalchunks)
-        set_mult_var_highdim(mul_var_highdim)
-        red_formula = GetReduction(red_formula_string, aliases)
-        if use_final_chunks(red_formula) and map_reduce_id != "GpuReduc2D":
-            use_chunk_mode = 2
-            map_reduce_id += "_finalchunks"
-        elif get_enable_chunk() and map_reduce_id != "GpuReduc2D":
-            if len(red_formula.formula.chunked_formulas(dimchunk)) == 1:
-                from keopscore.mapreduce.Chunk_Mode_Constants import (
-                    Chunk_Mode_Constants,
-                )
-
-                chk = Chunk_Mode_Constants(red_formula)
-                if not chk.chunk_postchunk_mix:
-                    use_chunk_mode = 1
-                    map_reduce_id += "_chunks"
-    # Instantiation of
-    map_reduce_class = map_reduce[map_reduce_id]
-
-    map_reduce_obj = map_reduce_class(red_formula_string, aliases, *args)
-
-    # detecting the case of formula being equal to zero, to bypass reduction.
-    rf = map_reduce_obj.red_formula
-    if isinstance(rf, Zero_Reduction) or (
-        isinstance(rf.formula, Zero) and isinstance(rf, Sum_Reduction)
-    ):
+    # the code itself is generated by map_reduce_obj.get_dll_and_params, under the same lock
+    with code_generation_lock:
+        # detecting the need for special chunked computation modes :
+        use_chunk_mode = 0
         if "Gpu" in map_reduce_id:
-            map_reduce_class = map_reduce["GpuReduc1D"]
-        map_reduce_obj = map_reduce_class.AssignZero(red_formula_string, aliases, *args)
-        tagZero = 1
-    else:
-        tagZero = 0
+            if not keopscore.config.config.use_cuda:
+                KeOps_Error(
+                    "You selected a Gpu reduce scheme but KeOps is in Cpu only mode."
+                )
+            set_enable_chunk(enable_chunks)
+            set_enable_finalchunk(enable_finalchunks)
+            set_mult_var_highdim(mul_var_highdim)
+            red_formula = GetReduction(red_formula_string, aliases)
+            if use_final_chunks(red_formula) and map_reduce_id != "GpuReduc2D":
+                use_chunk_mode = 2
+                map_reduce_id += "_finalchunks"
+            elif get_enable_chunk() and map_reduce_id != "GpuReduc2D":
+                if len(red_formula.formula.chunked_formulas(dimchunk)) == 1:
+                    from keopscore.mapreduce.Chunk_Mode_Constants import (
+                        Chunk_Mode_Constants,
+                    )
+
+                    chk = Chunk_Mode_Constants(red_formula)
+                    if not chk.chunk_postchunk_mix:
+                        use_chunk_mode = 1
+                        map_reduce_id += "_chunks"
+        elif map_reduce_id in ("CpuReduc", "CpuReduc_tiled"):
+            # K-min type reductions (e.g. for K-nearest neighbors search) use a special
+            # Cpu scheme, which rejects most candidates by comparing them to the largest
+            # of the K best values found so far, see CpuReduc_KMin. This can be disabled
+            # with the keopscore.use_cpu_kmin_scheme flag.
+            red_formula = GetReduction(red_formula_string, aliases)
+            if keopscore.use_cpu_kmin_scheme and isinstance(
+                red_formula, KMin_ArgKMin_Reduction
+            ):
+                map_reduce_id = "CpuReduc_KMin"
+        # Instantiation of
+        map_reduce_class = get_map_reduce_class(map_reduce_id)
+
+        map_reduce_obj = map_reduce_class(red_formula_string, aliases, *args)
+
+        # detecting the case of formula being equal to zero, to bypass reduction.
+        rf = map_reduce_obj.red_formula
+        if isinstance(rf, Zero_Reduction) or (
+            isinstance(rf.formula, Zero) and isinstance(rf, Sum_Reduction)
+        ):
+            if "Gpu" in map_reduce_id:
+                map_reduce_class = get_map_reduce_class("GpuReduc1D")
+            map_reduce_obj = map_reduce_class.AssignZero(
+                red_formula_string, aliases, *args
+            )
+            tagZero = 1
+        else:
+            tagZero = 0
 
     res = map_reduce_obj.get_dll_and_params()
 
     tag1D2D = 0 if tagZero == 1 else res["tag1D2D"]
 
+    # removing the least recently used formulas if the build folder is too large
+    if keopscore.cache_max_size is not None:
+        clean_cache(keopscore.cache_max_size, keep=(res["tag"],))
+
     return (
         res["tag"],
         res["source_file"],
@@ -137,6 +173,7 @@ def get_keops_dll_impl(
         tag1D2D,
         res["dimred"],
         res["dim"],
+        res["dimind"],
         res["dimy"],
         res["indsi"],
         res["indsj"],
@@ -147,10 +184,25 @@ def get_keops_dll_impl(
     )
 
 
+def check_keops_dll(res):
+    # checks that the files of a formula compiled by another process, or before
+    # a call to clean_cache, still exist, and marks them as recently used.
+    files = [res[1]]
+    if res[2]:
+        files.append(res[2].decode("utf-8"))
+    try:
+        for file in files:
+            os.utime(file)
+    except OSError:
+        return False
+    return True
+
+
 get_keops_dll = Cache(
     get_keops_dll_impl,
     use_cache_file=True,
     save_folder=get_build_folder(),
+    check_value=check_keops_dll,
 )
 
 
@@ -173,6 +225,8 @@ if __name__ == "__main__":
         "tag1D2D": int,
         "use_half": int,
         "device_id": int,
+        "use_int64_index": int,
+        "use_strides": int,
     }
 
     if len(argv) != len(argdict):
@@ -1,6 +1,14 @@
 from keopscore.formulas.reductions import *
 from keopscore.formulas.GetReduction import GetReduction
-from keopscore.utils.code_gen_utils import Var_loader, new_c_varname, pointer, c_include
+from keopscore.utils.code_gen_utils import (
+    Var_loader,
+    new_c_varname,
+    pointer,
+    c_include,
+    storage_types,
+    storage_types_code,
+)
+from keopscore.utils.misc_utils import KeOps_Error
 
 
 class MapReduce:
@@ -8,6 +16,10 @@ class MapReduce:
     base class for map-reduce schemes
     """
 
+    # if True, the indices computed by the reduction (e.g. for ArgMin reduction, see Reduction.dimind)
+    # are written in a separate integer output array instead of being encoded as floats in the output.
+    index_output = False
+
     def __init__(
         self,
         red_formula_string,
@@ -21,12 +33,22 @@ class MapReduce:
         tag1D2D,
         use_half,
         device_id,
+        use_int64_index,
+        use_strides,
     ):
         self.red_formula_string = red_formula_string
         self.aliases = aliases
 
         self.red_formula = GetReduction(red_formula_string, aliases=aliases)
 
+        # in Cpu mode, "half" and "bfloat16" are storage types : the data is converted
+        # to float when it is loaded, and the computations are performed in float.
+        self.storage_dtype = dtype
+        if dtype in storage_types:
+            if tagCpuGpu != 0:
+                KeOps_Error(f"The {dtype} storage type is only supported in Cpu mode.")
+            dtype = "float"
+
         self.dtype = dtype
         self.dtypeacc = dtypeacc
         self.nargs = nargs
@@ -38,7 +60,40 @@ class MapReduce:
         )
         self.use_half = use_half
         self.device_id = device_id
-        self.varloader = Var_loader(self.red_formula)
+
+        # in Cpu mode, the offsets of the rows in the input arrays may be computed with
+        # 64 bits integers, for arrays with more than 2^31-1 elements.
+        if use_int64_index and tagCpuGpu != 0:
+            KeOps_Error("64 bits indexing is only supported in Cpu mode.")
+        self.use_int64_index = use_int64_index
+
+        # in Cpu mode, the input arrays may be strided views : the rows and the columns
+        # of each array are read with the strides given at each call.
+        if use_strides and tagCpuGpu != 0:
+            KeOps_Error("Strided input arrays are only supported in Cpu mode.")
+        self.use_strides = use_strides
+        self.varloader = Var_loader(self.red_formula, use_int64_index, use_strides)
+
+        # indices are stored in the accumulator of the reduction during the computation,
+        # so we use double precision accumulators which represent exactly all
+        # integers up to 2^53, instead of 2^24 for single precision.
+        if self.index_output and self.red_formula.dimind > 0 and dtypeacc == "float":
+            self.dtypeacc = "double"
+
+    def get_hoisted_subformulas(self, hoist_j=False):
+        # returns the lists of subformulas which can be evaluated outside of the inner loop over j :
+        # - subformulas which depend only on "i" variables and parameters, to be evaluated once per "i" row,
+        # - if hoist_j is True, subformulas which depend only on "j" variables and parameters,
+        #   to be evaluated once per "j" row, e.g. when loading a tile of "j" variables.
+        formula = self.red_formula.formula
+        tagI, tagJ = self.red_formula.tagI, self.red_formula.tagJ
+        hoisted_j = []
+        if hoist_j:
+            for f in formula.independent_subformulas(tagI):
+                if len(f.Vars(tagJ)) > 0:
+                    hoisted_j.append(f)
+        hoisted_i = formula.independent_subformulas(tagJ, excluded=hoisted_j)
+        return hoisted_i, hoisted_j
 
     def get_code(self):
         self.headers = "#define C_CONTIGUOUS 1\n"
@@ -68,8 +123,22 @@ class MapReduce:
         argname = new_c_varname("arg")
         self.arg = c_variable(pointer(pointer(dtype)), argname)
         self.args = [self.arg[k] for k in range(nargs)]
+        if self.storage_dtype != dtype:
+            # the pointers to the data are cast to pointers to the storage type
+            storage_type = storage_types[self.storage_dtype]
+            self.headers += storage_types_code
+            self.args = [
+                c_variable(pointer(storage_type), f"(({storage_type}*){arg.id})")
+                for arg in self.args
+            ]
 
         self.acc = c_array(dtypeacc, red_formula.dimred, "acc")
         self.acctmp = c_array(dtypeacc, red_formula.dimred, "acctmp")
         self.fout = c_array(dtype, formula.dim, "fout")
-        self.outi = c_array(dtype, red_formula.dim, f"(out + i * {red_formula.dim})")
+        dimind = red_formula.dimind if self.index_output else 0
+        dimout = red_formula.dim - dimind
+        # N.B. in Cpu mode, the offsets of the output rows are computed with 64 bits integers,
+        # since the output may have more than 2^31-1 elements even if the inputs do not.
+        row = "(int64_t) i" if self.tagCpuGpu == 0 else "i"
+        self.outi = c_array(dtype, dimout, f"(out + {row} * {dimout})")
+        self.outindi = c_array("int64_t", dimind, f"(outind + {row} * {dimind})")
@@ -1,5 +1,4 @@
 from .cpu import *
-from ..config.config import use_cuda
 
-if use_cuda:
-    from .gpu import *
+# N.B. the Gpu map-reduce schemes are imported on first use (see get_map_reduce_class
+# in keopscore.get_keops_dll), since this requires to probe the system for Cuda.
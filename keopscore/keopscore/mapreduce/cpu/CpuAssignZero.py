@@ -11,6 +11,8 @@ import keopscore
 class CpuAssignZero(MapReduce, Cpu_link_compile):
     # class for generating the final C++ code, Cpu version
 
+    index_output = True
+
     def __init__(self, *args):
         MapReduce.__init__(self, *args)
         Cpu_link_compile.__init__(self)
@@ -24,7 +26,7 @@ class CpuAssignZero(MapReduce, Cpu_link_compile):
         arg = self.arg
         args = self.args
 
-        headers = ["stdlib.h"]
+        headers = ["stdlib.h", "cstdint"]
         if keopscore.config.config.use_OpenMP:
             headers.append("omp.h")
         if debug_ops_at_exec:
@@ -35,7 +37,7 @@ class CpuAssignZero(MapReduce, Cpu_link_compile):
 {self.headers}
 
 template < typename TYPE >
-int AssignZeroCpu_{self.gencode_filename}(int nx, int ny, TYPE* out,  TYPE **{arg.id}) {{
+int AssignZeroCpu_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* outind, TYPE **{arg.id}, int64_t *argstrides) {{
     #pragma omp parallel for
     for (int i = 0; i < nx; i++) {{
         {outi.assign(c_zero_float)}
@@ -47,7 +49,7 @@ int AssignZeroCpu_{self.gencode_filename}(int nx, int ny, TYPE* out,  TYPE **{ar
 #include <vector>
 
 template < typename TYPE >
-int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TYPE **arg) {{
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *outind, TYPE **arg, int64_t *argstrides) {{
 
     if (tagI==1) {{
         int tmp = ny;
@@ -55,7 +57,7 @@ int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TY
         nx = tmp;
     }}
 
-    return AssignZeroCpu_{self.gencode_filename}< TYPE > (nx, ny, out, arg);
+    return AssignZeroCpu_{self.gencode_filename}< TYPE > (nx, ny, out, outind, arg, argstrides);
 
 }}
 
@@ -72,12 +74,13 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                          int dimout,
                                          std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                          int **ranges,
-                                         std::vector< int > shapeout, TYPE *out,
+                                         std::vector< int > shapeout, TYPE *out, int64_t *outind,
                                          TYPE **arg,
+                                         int64_t *argstrides,
                                          std::vector< std::vector< int > > argshape) {{
 
 
-    return launch_keops_{self.gencode_filename}< TYPE > (nx, ny, tagI, out, arg);
+    return launch_keops_{self.gencode_filename}< TYPE > (nx, ny, tagI, out, outind, arg, argstrides);
 
 }}
 
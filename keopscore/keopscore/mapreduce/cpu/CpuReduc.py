@@ -2,7 +2,8 @@ from keopscore import debug_ops_at_exec
 from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
 from keopscore.mapreduce.cpu.CpuAssignZero import CpuAssignZero
 from keopscore.mapreduce.MapReduce import MapReduce
-from keopscore.utils.code_gen_utils import c_include
+from keopscore.utils.code_gen_utils import c_array, c_include, new_c_varname
+from keopscore.utils.misc_utils import KeOps_Error
 import keopscore
 
 
@@ -13,8 +14,19 @@ class CpuReduc(MapReduce, Cpu_link_compile):
 
     AssignZero = CpuAssignZero
 
+    index_output = True
+
     def __init__(self, *args):
         MapReduce.__init__(self, *args)
+        # the formula reads its inputs directly in the arrays (see direct_table)
+        if self.storage_dtype != self.dtype:
+            KeOps_Error(
+                f"The {self.storage_dtype} storage type is not supported by the CpuReduc scheme."
+            )
+        if self.use_strides:
+            KeOps_Error(
+                "Strided input arrays are not supported by the CpuReduc scheme."
+            )
         Cpu_link_compile.__init__(self)
         self.dimy = self.varloader.dimy
 
@@ -32,7 +44,18 @@ class CpuReduc(MapReduce, Cpu_link_compile):
         table = self.varloader.direct_table(args, i, j)
         sum_scheme = self.sum_scheme
 
-        headers = ["cmath", "stdlib.h"]
+        # subformulas which do not depend on j are evaluated once per i row, before the loop over j
+        hoisted = [
+            (
+                f,
+                c_array(
+                    self.dtype, f.dim, new_c_varname("hoisted_" + f.string_id.lower())
+                ),
+            )
+            for f in self.get_hoisted_subformulas()[0]
+        ]
+
+        headers = ["cmath", "stdlib.h", "cstdint"]
         if keopscore.config.config.use_OpenMP:
             headers.append("omp.h")
         if debug_ops_at_exec:
@@ -42,7 +65,7 @@ class CpuReduc(MapReduce, Cpu_link_compile):
         self.code = f"""
 {self.headers}
 template < typename TYPE > 
-int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, TYPE **{arg.id}) {{
+int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* outind, TYPE **{arg.id}, int64_t *argstrides) {{
     #pragma omp parallel for
     for (int i = 0; i < nx; i++) {{
         {fout.declare()}
@@ -50,13 +73,15 @@ int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, TYPE **{arg.id})
         {sum_scheme.declare_temporary_accumulator()}
         {red_formula.InitializeReduction(acc)}
         {sum_scheme.initialize_temporary_accumulator()}
+        {"".join(arr.declare() for f, arr in hoisted)}
+        {"".join(f(arr, table) for f, arr in hoisted)}
         for (int j = 0; j < ny; j++) {{
-            {red_formula.formula(fout,table)}
+            {red_formula.formula(fout, table, precomputed=hoisted)}
             {sum_scheme.accumulate_result(acc, fout, j)}
             {sum_scheme.periodic_accumulate_temporary(acc, j)}
         }}
         {sum_scheme.final_operation(acc)}
-        {red_formula.FinalizeOutput(acc, outi, i)}
+        {red_formula.FinalizeOutputIndices(acc, outi, self.outindi, i)}
     }}
     return 0;
 }}
@@ -67,7 +92,7 @@ int CpuConv_{self.gencode_filename}(int nx, int ny, TYPE* out, TYPE **{arg.id})
 #include <vector>
 
 template < typename TYPE > 
-int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TYPE **arg) {{
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *outind, TYPE **arg, int64_t *argstrides) {{
     
     if (tagI==1) {{
         int tmp = ny;
@@ -75,7 +100,7 @@ int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, TY
         nx = tmp;
     }}
     
-    return CpuConv_{self.gencode_filename}< TYPE >(nx, ny, out, arg);
+    return CpuConv_{self.gencode_filename}< TYPE >(nx, ny, out, outind, arg, argstrides);
 
 }}
 template < typename TYPE >
@@ -91,12 +116,13 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                              int dimout,
                                              std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                              int **ranges,
-                                             std::vector< int > shapeout, TYPE *out,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *outind,
                                              TYPE **arg,
+                                             int64_t *argstrides,
                                              std::vector< std::vector< int > > argshape) {{
 
     
-    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, arg);
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, outind, arg, argstrides);
 
 }}
                 """
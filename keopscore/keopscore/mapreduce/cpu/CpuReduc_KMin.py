@@ -0,0 +1,291 @@
+from keopscore import debug_ops_at_exec
+from keopscore.mapreduce.cpu.CpuReduc_tiled import CpuReduc_tiled
+from keopscore.formulas.reductions.KMin_ArgKMin_Reduction import KMin_ArgKMin_Reduction
+from keopscore.utils.code_gen_utils import (
+    c_array,
+    c_include,
+    infinity,
+)
+from keopscore.utils.misc_utils import KeOps_Error
+import keopscore
+
+
+class CpuReduc_KMin(CpuReduc_tiled):
+    """
+    class for generating the final C++ code, Cpu version for K-min type reductions
+    (KMin, ArgKMin and KMin_ArgKMin), e.g. for K-nearest neighbors search.
+    As in CpuReduc_tiled, each thread processes a block of i rows against tiles of j rows.
+    For each i row, the values of the formula are computed for a whole tile of j rows,
+    and then compared to a running threshold, which is the largest of the K smallest
+    values found so far : most candidates are rejected by this single comparison.
+    Accepted candidates are inserted in a sorted list of size K for small values of K,
+    or appended to a buffer of size 2K which is reduced to its K smallest values
+    (in linear time) when it is full, for large values of K.
+    When there are fewer blocks of i rows than threads, the j rows are also split
+    in chunks, and the partial K-min lists of the chunks are merged at the end.
+    """
+
+    # largest value of K for which the K smallest values are kept in a sorted list
+    max_K_sorted = 64
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        if not isinstance(self.red_formula, KMin_ArgKMin_Reduction):
+            KeOps_Error("CpuReduc_KMin is only implemented for K-min type reductions.")
+
+    def kmin_list_code(self):
+        # returns the C++ code of the kmin_list structure, which stores the K smallest
+        # (value, index) pairs of a row, ordered by values and then by indices.
+        K = self.red_formula.K
+        if K <= self.max_K_sorted:
+            capacity = K
+            insert = """
+        // insertion in the sorted list of the K smallest items
+        int p = KMIN_K - 1;
+        while (p > 0 && item < items[p - 1]) {
+            items[p] = items[p - 1];
+            p--;
+        }
+        items[p] = item;
+        thr = items[KMIN_K - 1];"""
+            sort = ""
+        else:
+            capacity = 2 * K
+            insert = """
+        // the buffer is reduced to its K smallest items when it is full
+        items[n++] = item;
+        if (n == KMIN_CAPACITY)
+            select();"""
+            sort = """
+        if (n > KMIN_K)
+            select();
+        std::sort(items, items + KMIN_K);"""
+        return f"""
+#define KMIN_K {K}
+#define KMIN_CAPACITY {capacity}
+
+template < typename TYPE >
+struct kmin_item {{
+    TYPE val;
+    int ind;
+    bool operator<(const kmin_item &other) const {{
+        return (val < other.val) || (val == other.val && ind < other.ind);
+    }}
+}};
+
+template < typename TYPE >
+struct kmin_list {{
+    kmin_item< TYPE > items[KMIN_CAPACITY];
+    int n;
+    // largest of the K smallest items
+    kmin_item< TYPE > thr;
+
+    void init() {{
+        for (int k = 0; k < KMIN_K; k++) {{
+            items[k].val = {infinity(self.dtype).id};
+            items[k].ind = 0;
+        }}
+        n = KMIN_K;
+        thr = items[0];
+    }}
+
+    void select() {{
+        std::nth_element(items, items + KMIN_K - 1, items + n);
+        n = KMIN_K;
+        thr = items[KMIN_K - 1];
+    }}
+
+    // inserts item, which must be smaller than thr
+    void insert(kmin_item< TYPE > item) {{{insert}
+    }}
+
+    // sorts the K smallest items in the first K positions
+    void sort() {{{sort}
+    }}
+}};
+"""
+
+    def get_code(self):
+        super(CpuReduc_tiled, self).get_code()
+
+        dtype = self.dtype
+        red_formula = self.red_formula
+        fdim = red_formula.formula.dim
+        fout = self.fout
+        acc = self.acc
+        outi = self.outi
+        arg = self.arg
+        args = self.args
+        varloader = self.varloader
+        dimx, dimy = varloader.dimx, varloader.dimy
+        param_loc = self.param_loc
+
+        hoisted_i, hoisted_j = self.get_hoisted_subformulas(hoist_j=True)
+        dimhi = sum(f.dim for f in hoisted_i)
+        dimhj = sum(f.dim for f in hoisted_j)
+
+        block_i, tile_j = self.get_tile_sizes(dimhi, dimhj)
+
+        # local buffers for the current block of i rows and the current tile of j rows,
+        # and for the values of the formula on the tile for the current i row.
+        xi_block = c_array(dtype, block_i * dimx, "xi_block")
+        hi_block = c_array(dtype, block_i * dimhi, "hi_block")
+        yj_tile = c_array(dtype, tile_j * dimy, "yj_tile")
+        hj_tile = c_array(dtype, tile_j * dimhj, "hj_tile")
+        fout_tile = c_array(dtype, tile_j * fdim, "fout_tile")
+
+        xi = c_array(dtype, dimx, f"(xi_block + ii * {dimx})")
+        yjrel = c_array(dtype, dimy, f"(yj_tile + jrel * {dimy})")
+        table = varloader.table(xi, yjrel, param_loc)
+        hoisted_i = self.hoisted_views(hoisted_i, "hi_block", "ii", dimhi)
+        hoisted_j = self.hoisted_views(hoisted_j, "hj_tile", "jrel", dimhj)
+
+        # an i row has fdim K-min lists, one for each dimension of the formula ; once sorted,
+        # they are copied in the accumulator of the reduction with its usual layout,
+        # so that the output is written by the reduction itself.
+        finalize = f"""
+            {{
+                {acc.declare()}
+                for (int k = 0; k < {fdim}; k++) {{
+                    lists[k].sort();
+                    for (int l = 0; l < KMIN_K; l++) {{
+                        {acc.id}[k + l * {2 * fdim}] = lists[k].items[l].val;
+                        {acc.id}[k + l * {2 * fdim} + {fdim}] = lists[k].items[l].ind;
+                    }}
+                }}
+                {red_formula.FinalizeOutputIndices(acc, outi, self.outindi, self.i)}
+            }}
+        """
+
+        headers = ["cmath", "stdlib.h", "cstdint", "vector", "algorithm"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+
+#define BLOCK_SIZE_I {block_i}
+#define TILE_SIZE_J {tile_j}
+{self.kmin_list_code()}
+
+template < typename TYPE >
+int CpuConv_KMin_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* outind, TYPE **{arg.id}, int64_t *argstrides) {{
+
+    // load parameters variables once and for all
+    {param_loc.declare()}
+    {varloader.load_vars("p", param_loc, args)}
+
+    int nblocks = (nx + BLOCK_SIZE_I - 1) / BLOCK_SIZE_I;
+    int ntiles = (ny + TILE_SIZE_J - 1) / TILE_SIZE_J;
+
+    int nthreads = 1;
+#ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+#endif
+
+    // the j rows are split in chunks of tiles if there are not enough blocks of i rows
+    // to keep all threads busy ; the K-min lists of the chunks are then stored in
+    // chunk_lists, and merged at the end.
+    int nchunks = 1, tiles_per_chunk = ntiles;
+    if (nblocks > 0 && nblocks < nthreads && ntiles > 1) {{
+        nchunks = (nthreads + nblocks - 1) / nblocks;
+        nchunks = (nchunks < ntiles) ? nchunks : ntiles;
+        tiles_per_chunk = (ntiles + nchunks - 1) / nchunks;
+        nchunks = (ntiles + tiles_per_chunk - 1) / tiles_per_chunk;
+    }}
+    int chunk_size = tiles_per_chunk * TILE_SIZE_J;
+    std::vector< kmin_list< TYPE > > chunk_lists(nchunks > 1 ? (size_t) nchunks * nx * {fdim} : 0);
+
+    #pragma omp parallel for schedule(dynamic, 1)
+    for (int work = 0; work < nblocks * nchunks; work++) {{
+        int block = work / nchunks, chunk = work % nchunks;
+        int istart = block * BLOCK_SIZE_I;
+        int nrows = (nx - istart < BLOCK_SIZE_I) ? (nx - istart) : BLOCK_SIZE_I;
+        int jbegin = chunk * chunk_size;
+        int jend = (ny - jbegin < chunk_size) ? ny : jbegin + chunk_size;
+
+        {xi_block.declare()}
+        {hi_block.declare()}
+        {yj_tile.declare()}
+        {hj_tile.declare()}
+        {fout_tile.declare()}
+        {fout.declare()}
+        std::vector< kmin_list< TYPE > > block_lists(nchunks > 1 ? 0 : nrows * {fdim});
+        kmin_list< TYPE > *lists_block = block_lists.data();
+        if (nchunks > 1)
+            lists_block = chunk_lists.data() + ((size_t) chunk * nx + istart) * {fdim};
+
+        // load the i rows of the block and initialize their K-min lists
+        for (int ii = 0; ii < nrows; ii++) {{
+            int i = istart + ii;
+            {varloader.load_vars("i", xi, args, row_index=self.i)}
+            {"".join(f(arr, table) for f, arr in hoisted_i)}
+            for (int k = 0; k < {fdim}; k++)
+                lists_block[ii * {fdim} + k].init();
+        }}
+
+        for (int jstart = jbegin; jstart < jend; jstart += TILE_SIZE_J) {{
+            int ncols = (jend - jstart < TILE_SIZE_J) ? (jend - jstart) : TILE_SIZE_J;
+
+            // copy the current tile of j rows into the local contiguous buffer
+            for (int jrel = 0; jrel < ncols; jrel++) {{
+                int j = jstart + jrel;
+                {varloader.load_vars("j", yjrel, args, row_index=self.j)}
+                {"".join(f(arr, table) for f, arr in hoisted_j)}
+            }}
+
+            for (int ii = 0; ii < nrows; ii++) {{
+                kmin_list< TYPE > *lists = lists_block + ii * {fdim};
+
+                // values of the formula for the i row and the tile of j rows
+                for (int jrel = 0; jrel < ncols; jrel++) {{
+                    int j = jstart + jrel;
+                    {red_formula.formula(fout, table, precomputed=hoisted_i + hoisted_j)}
+                    for (int k = 0; k < {fdim}; k++)
+                        fout_tile[jrel * {fdim} + k] = {fout.id}[k];
+                }}
+
+                // since j increases, a candidate equal to the threshold is never kept,
+                // so that comparing the values is enough.
+                for (int jrel = 0; jrel < ncols; jrel++) {{
+                    for (int k = 0; k < {fdim}; k++) {{
+                        TYPE val = fout_tile[jrel * {fdim} + k];
+                        if (val < lists[k].thr.val)
+                            lists[k].insert({{val, jstart + jrel}});
+                    }}
+                }}
+            }}
+        }}
+
+        if (nchunks == 1) {{
+            for (int ii = 0; ii < nrows; ii++) {{
+                int i = istart + ii;
+                kmin_list< TYPE > *lists = lists_block + ii * {fdim};
+                {finalize}
+            }}
+        }}
+    }}
+
+    // merge the K-min lists of the chunks in the lists of the first chunk
+    if (nchunks > 1) {{
+        #pragma omp parallel for schedule(static)
+        for (int i = 0; i < nx; i++) {{
+            kmin_list< TYPE > *lists = chunk_lists.data() + (size_t) i * {fdim};
+            for (int chunk = 1; chunk < nchunks; chunk++) {{
+                kmin_list< TYPE > *other = chunk_lists.data() + ((size_t) chunk * nx + i) * {fdim};
+                for (int k = 0; k < {fdim}; k++)
+                    for (int l = 0; l < other[k].n; l++)
+                        if (other[k].items[l] < lists[k].thr)
+                            lists[k].insert(other[k].items[l]);
+            }}
+            {finalize}
+        }}
+    }}
+    return 0;
+}}
+                    """
+
+        self.code += self.get_launch_code(f"CpuConv_KMin_{self.gencode_filename}")
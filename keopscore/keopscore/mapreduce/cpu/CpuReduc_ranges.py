@@ -7,6 +7,7 @@ from keopscore.utils.code_gen_utils import (
     c_variable,
     c_array,
     c_include,
+    new_c_varname,
 )
 import keopscore
 
@@ -16,6 +17,8 @@ class CpuReduc_ranges(MapReduce, Cpu_link_compile):
 
     AssignZero = CpuAssignZero
 
+    index_output = True
+
     def __init__(self, *args):
         MapReduce.__init__(self, *args)
         Cpu_link_compile.__init__(self)
@@ -57,13 +60,19 @@ class CpuReduc_ranges(MapReduce, Cpu_link_compile):
 
         sum_scheme = self.sum_scheme
 
+        # subformulas which do not depend on j are evaluated once per i row, before the loop over j
+        hoisted = [
+            (f, c_array(dtype, f.dim, new_c_varname("hoisted_" + f.string_id.lower())))
+            for f in self.get_hoisted_subformulas()[0]
+        ]
+
         indices_i = c_array("int", nvarsi, "indices_i")
         indices_j = c_array("int", nvarsj, "indices_j")
         indices_p = c_array("int", nvarsp, "indices_p")
         imstartx = c_variable("int", "i-start_x")
         jmstarty = c_variable("int", "j-start_y")
 
-        headers = ["cmath", "stdlib.h"]
+        headers = ["cmath", "stdlib.h", "cstdint"]
         if keopscore.config.config.use_OpenMP:
             headers.append("omp.h")
         if debug_ops_at_exec:
@@ -94,6 +103,9 @@ void check_nargs(int nargs, int nminargs) {{
 }}
 #endif
 
+#include <vector>
+#include <algorithm>
+
 #include "include/Sizes.h"
 #include "include/ranges_utils.h"
 #include "include/Ranges.h"
@@ -103,7 +115,7 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
                     int nbatchdims, int* shapes,
                     std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
                     int nranges_x, int nranges_y, int **ranges,
-                    TYPE* out, TYPE **{arg.id}) {{
+                    TYPE* out, int64_t* outind, TYPE **{arg.id}, int64_t *argstrides) {{
                         
     int sizei = indsi.size();
     int sizej = indsj.size();
@@ -131,16 +143,11 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
     // And finally for the parameters, with "1" instead of "M".
     fill_shapes(nbatchdims, shapes, shapes_i, shapes_j, shapes_p,  {red_formula.tagJ}, indsi, indsj, indsp);
     
-    // Actual for-for loop -----------------------------------------------------
-
-    {param_loc.declare()}
-    {varloader.load_vars("p", param_loc, args)}  // If nbatchdims == 0, the parameters are fixed once and for all
-    
     // Set the output to zero, as the ranges may not cover the full output -----
     {acctmp.declare()} // __TYPEACC__ acctmp[DIMRED];
     for (int i = 0; i < nx; i++) {{
         {red_formula.InitializeReduction(acctmp)}
-        {red_formula.FinalizeOutput(acctmp, outi, i)}
+        {red_formula.FinalizeOutputIndices(acctmp, outi, self.outindi, i)}
     }}
     
     
@@ -156,17 +163,57 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
     int* slices_x = {red_formula.tagJ} ? ranges[1] : ranges[4];
     int* ranges_y = {red_formula.tagJ} ? ranges[2] : ranges[5];
 
-    int indices_i[sizei], indices_j[sizej], indices_p[sizep];  // Buffers for the "broadcasted indices"
-    for (int k = 0; k < sizei; k++) {{ indices_i[k] = 0; }}  // Fill the "offsets" with zeroes,
-    for (int k = 0; k < sizej; k++) {{ indices_j[k] = 0; }}  // the default value when nbatchdims == 0.
-    for (int k = 0; k < sizep; k++) {{ indices_p[k] = 0; }}
-    
-    
+    // Work items --------------------------------------------------------------
+    //
+    // Block-sparse reductions typically involve many small ranges, and batch reductions
+    // a few large ones. Hence we split the ranges of "i" rows into chunks of at most
+    // chunk_size rows, and process all these chunks in parallel with a dynamic schedule,
+    // in decreasing order of their number of (i,j) pairs to balance the load between threads.
+    int nthreads = 1;
+#ifdef _OPENMP
+    nthreads = omp_get_max_threads();
+#endif
+    int chunk_size = (nx + 8 * nthreads - 1) / (8 * nthreads);
+    if (chunk_size < 1) {{ chunk_size = 1; }}
+
+    std::vector< int > work_range, work_start, work_end;
+    std::vector< long > work_cost;
     for (int range_index = 0; range_index < nranges; range_index++) {{
         int start_x = ranges_x[2 * range_index];
         int end_x = ranges_x[2 * range_index + 1];
         int start_slice = (range_index < 1) ? 0 : slices_x[range_index - 1];
         int end_slice = slices_x[range_index];
+        long npairs = 0;  // number of "j" indices per "i" row of the range
+        for (int slice = start_slice; slice < end_slice; slice++) {{
+            npairs += ranges_y[2 * slice + 1] - ranges_y[2 * slice];
+        }}
+        for (int start = start_x; start < end_x; start += chunk_size) {{
+            int end = (end_x - start < chunk_size) ? end_x : start + chunk_size;
+            work_range.push_back(range_index);
+            work_start.push_back(start);
+            work_end.push_back(end);
+            work_cost.push_back((npairs + 1) * (end - start));
+        }}
+    }}
+    int nwork = work_range.size();
+    std::vector< int > work_order(nwork);
+    for (int w = 0; w < nwork; w++) {{ work_order[w] = w; }}
+    std::stable_sort(work_order.begin(), work_order.end(),
+                     [&work_cost](int a, int b) {{ return work_cost[a] > work_cost[b]; }});
+
+    // Actual for-for loop -----------------------------------------------------
+
+    #pragma omp parallel for schedule(dynamic, 1)
+    for (int w = 0; w < nwork; w++) {{
+        int range_index = work_range[work_order[w]];
+        int start_x = ranges_x[2 * range_index];
+        int start_slice = (range_index < 1) ? 0 : slices_x[range_index - 1];
+        int end_slice = slices_x[range_index];
+
+        int indices_i[sizei], indices_j[sizej], indices_p[sizep];  // Buffers for the "broadcasted indices"
+        for (int k = 0; k < sizei; k++) {{ indices_i[k] = 0; }}  // Fill the "offsets" with zeroes,
+        for (int k = 0; k < sizej; k++) {{ indices_j[k] = 0; }}  // the default value when nbatchdims == 0.
+        for (int k = 0; k < sizep; k++) {{ indices_p[k] = 0; }}
 
         // If needed, compute the "true" start indices of the range, turning
         // the "abstract" index start_x into an array of actual "pointers/offsets" stored in indices_i:
@@ -174,11 +221,11 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
             vect_broadcast_index(start_x, nbatchdims, sizei, shapes, shapes_i, indices_i);
             // And for the parameters, too:
             vect_broadcast_index(range_index, nbatchdims, sizep, shapes, shapes_p, indices_p);
-            {varloader.load_vars("p", param_loc, args, offsets=indices_p)}  // Load the paramaters, once per tile
         }}
-    
-        #pragma omp parallel for   
-        for (int i = start_x; i < end_x; i++) {{
+        {param_loc.declare()}
+        {varloader.load_vars("p", param_loc, args, offsets=indices_p)}  // Load the paramaters, once per work item
+
+        for (int i = work_start[work_order[w]]; i < work_end[work_order[w]]; i++) {{
             {xi.declare()}
             {yj.declare()}
             {fout.declare()}
@@ -191,6 +238,8 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
             }}
             {red_formula.InitializeReduction(acc)}
             {sum_scheme.initialize_temporary_accumulator()}
+            {"".join(arr.declare() for f, arr in hoisted)}
+            {"".join(f(arr, table) for f, arr in hoisted)}
             for (int slice = start_slice; slice < end_slice; slice++) {{
                  int start_y = ranges_y[2 * slice];
                  int end_y = ranges_y[2 * slice + 1];
@@ -203,19 +252,19 @@ int CpuConv_ranges_{self.gencode_filename}(int nx, int ny,
                 if (nbatchdims == 0) {{
                     for (int j = start_y; j < end_y; j++) {{
                         {varloader.load_vars("j", yj, args, row_index=j)}
-                        {red_formula.formula(fout,table)}
+                        {red_formula.formula(fout, table, precomputed=hoisted)}
                         {sum_scheme.accumulate_result(acc, fout, j)}
                     }}
                 }} else {{
                     for (int j = start_y; j < end_y; j++) {{
                         {varloader.load_vars("j", yj, args, row_index=jmstarty, offsets=indices_j)}
-                        {red_formula.formula(fout,table)}
+                        {red_formula.formula(fout, table, precomputed=hoisted)}
                         {sum_scheme.accumulate_result(acc, fout, jmstarty)}
                     }}
                 }}
             }}
             {sum_scheme.final_operation(acc)}
-            {red_formula.FinalizeOutput(acc, outi, i)}
+            {red_formula.FinalizeOutputIndices(acc, outi, self.outindi, i)}
         }}
     }}
     return 0;
@@ -235,7 +284,7 @@ int launch_keops_{self.gencode_filename}(int nx, int ny,
                                          int dimout,
                                          std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                          int **ranges, 
-                                         TYPE *out, int nargs, TYPE** arg,
+                                         TYPE *out, int64_t *outind, int nargs, TYPE** arg, int64_t *argstrides,
                                          std::vector<std::vector< int >> argshape) {{
     
     Sizes< TYPE > SS (nargs, arg, argshape, nx, ny,tagI, use_half,
@@ -271,7 +320,7 @@ int launch_keops_{self.gencode_filename}(int nx, int ny,
     return CpuConv_ranges_{self.gencode_filename}< TYPE> (nx, ny, SS.nbatchdims, SS.shapes,
                                                           indsi, indsj, indsp,
                                                           RR.nranges_x, RR.nranges_y, RR.castedranges,
-                                                          out, arg);
+                                                          out, outind, arg, argstrides);
 }}
 
 template < typename TYPE >
@@ -287,8 +336,9 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                              int dimout,
                                              std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
                                              int **ranges,
-                                             std::vector< int > shapeout, TYPE *out,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *outind,
                                              TYPE **arg,
+                                             int64_t *argstrides,
                                              std::vector< std::vector< int > > argshape) {{
     
 
@@ -303,9 +353,11 @@ int launch_keops_cpu_{self.gencode_filename}(int dimY,
                                                         dimout,
                                                         dimsx, dimsy, dimsp,
                                                         ranges,
-                                                        out, 
+                                                        out,
+                                                        outind,
                                                         argshape.size(), 
                                                         arg, 
+                                                        argstrides,
                                                         argshape);
 }}
                         
@@ -0,0 +1,259 @@
+from keopscore import debug_ops_at_exec, cpu_tile_size, cpu_block_size
+from keopscore.binders.cpp.Cpu_link_compile import Cpu_link_compile
+from keopscore.formulas.reductions import Sum_Reduction, Max_SumShiftExpWeight_Reduction
+from keopscore.mapreduce.cpu.CpuAssignZero import CpuAssignZero
+from keopscore.mapreduce.MapReduce import MapReduce
+from keopscore.utils.code_gen_utils import (
+    c_array,
+    c_include,
+    sizeof,
+)
+import keopscore
+
+
+class CpuReduc_tiled(MapReduce, Cpu_link_compile):
+    """
+    class for generating the final C++ code, Cpu version with cache blocking.
+    Each thread processes a block of i rows against tiles of j rows which are
+    first copied into a small contiguous local buffer, so that the j-indexed
+    data is read from L1 cache and reused for all i rows of the block.
+    """
+
+    AssignZero = CpuAssignZero
+
+    index_output = True
+
+    def __init__(self, *args):
+        MapReduce.__init__(self, *args)
+        Cpu_link_compile.__init__(self)
+        self.dimy = self.varloader.dimy
+
+    def get_tile_sizes(self, dimhi=0, dimhj=0):
+        # number of j rows in a tile : the tile of j-indexed variables
+        # (and of the dimhj values of hoisted subformulas) should fit in cpu_tile_size bytes.
+        dimy = self.varloader.dimy + dimhj
+        size_j = cpu_tile_size // (max(dimy, 1) * sizeof(self.dtype))
+        # number of i rows in a block : the local copies of i-indexed variables, hoisted
+        # subformulas and accumulators should roughly fit in the same amount of memory.
+        dimi = self.varloader.dimx + dimhi + 2 * self.red_formula.dimred
+        size_i = cpu_tile_size // (max(dimi, 1) * sizeof(self.dtype))
+        return max(1, min(size_i, cpu_block_size)), max(1, size_j)
+
+    def hoisted_views(self, subformulas, buffer, row, dimrow):
+        # returns the list of (subformula, c_array) pairs, where the c_arrays are views
+        # on the values of the subformulas for the current row in the local buffer
+        res, k = [], 0
+        for f in subformulas:
+            res.append(
+                (f, c_array(self.dtype, f.dim, f"({buffer} + {row} * {dimrow} + {k})"))
+            )
+            k += f.dim
+        return res
+
+    def use_lanes(self):
+        # the rows of a block are processed as SIMD lanes for these reductions, whose
+        # accumulation step is cheap and branch free (or nearly so).
+        return isinstance(
+            self.red_formula, (Sum_Reduction, Max_SumShiftExpWeight_Reduction)
+        )
+
+    def tile_reduction_code(self, fout, acc, table, precomputed):
+        # returns the code of the reduction of the current tile of j rows for the i rows of the block
+        sum_scheme = self.sum_scheme
+        formula_code = self.red_formula.formula(fout, table, precomputed=precomputed)
+        if not self.use_lanes():
+            return f"""
+            // reduce the tile for each i row of the block
+            for (int ii = 0; ii < nrows; ii++) {{
+                {sum_scheme.initialize_temporary_accumulator_block_init()}
+                {fout.declare()}
+                for (int jrel = 0; jrel < ncols; jrel++) {{
+                    int j = jstart + jrel;
+                    {formula_code}
+                    {sum_scheme.accumulate_result(acc, fout, self.j)}
+                }}
+                {sum_scheme.final_operation(acc)}
+            }}
+            """
+        # the i rows of the block are independent : the loop over the i rows is the inner loop,
+        # which is vectorized, each lane having its own output of the formula and accumulator.
+        # For each i row, the j rows are still accumulated in the same order.
+        return f"""
+            for (int ii = 0; ii < nrows; ii++) {{
+                {sum_scheme.initialize_temporary_accumulator_block_init()}
+            }}
+            for (int jrel = 0; jrel < ncols; jrel++) {{
+                int j = jstart + jrel;
+                #pragma omp simd
+                for (int ii = 0; ii < nrows; ii++) {{
+                    {fout.declare()}
+                    {formula_code}
+                    {sum_scheme.accumulate_result(acc, fout, self.j)}
+                }}
+            }}
+            for (int ii = 0; ii < nrows; ii++) {{
+                {sum_scheme.final_operation(acc)}
+            }}
+            """
+
+    def get_code(self):
+        super().get_code()
+
+        i = self.i
+        j = self.j
+        dtype = self.dtype
+        dtypeacc = self.dtypeacc
+        red_formula = self.red_formula
+        dimred = red_formula.dimred
+        fout = self.fout
+        outi = self.outi
+        arg = self.arg
+        args = self.args
+        varloader = self.varloader
+        dimx, dimy = varloader.dimx, varloader.dimy
+        sum_scheme = self.sum_scheme
+        param_loc = self.param_loc
+
+        # subformulas which do not depend on j are evaluated once per i row of the block,
+        # and subformulas which do not depend on i are evaluated once per j row of the tile.
+        hoisted_i, hoisted_j = self.get_hoisted_subformulas(hoist_j=True)
+        dimhi = sum(f.dim for f in hoisted_i)
+        dimhj = sum(f.dim for f in hoisted_j)
+
+        block_i, tile_j = self.get_tile_sizes(dimhi, dimhj)
+
+        # local buffers for the current block of i rows and the current tile of j rows
+        xi_block = c_array(dtype, block_i * dimx, "xi_block")
+        hi_block = c_array(dtype, block_i * dimhi, "hi_block")
+        acc_block = c_array(dtypeacc, block_i * dimred, "acc_block")
+        yj_tile = c_array(dtype, tile_j * dimy, "yj_tile")
+        hj_tile = c_array(dtype, tile_j * dimhj, "hj_tile")
+
+        # views on these buffers for the i row of index ii in the block
+        # and the j row of index jrel in the tile
+        xi = c_array(dtype, dimx, f"(xi_block + ii * {dimx})")
+        acc = c_array(dtypeacc, dimred, f"(acc_block + ii * {dimred})")
+        yjrel = c_array(dtype, dimy, f"(yj_tile + jrel * {dimy})")
+        table = varloader.table(xi, yjrel, param_loc)
+        hoisted_i = self.hoisted_views(hoisted_i, "hi_block", "ii", dimhi)
+        hoisted_j = self.hoisted_views(hoisted_j, "hj_tile", "jrel", dimhj)
+
+        # temporary accumulators of the summation scheme must also be stored per i row
+        if hasattr(sum_scheme, "tmp_acc"):
+            dimtmp = sum_scheme.tmp_acc.dim
+            tmp_block = c_array(sum_scheme.tmp_acc.dtype, block_i * dimtmp, "tmp_block")
+            sum_scheme.tmp_acc = c_array(
+                sum_scheme.tmp_acc.dtype, dimtmp, f"(tmp_block + ii * {dimtmp})"
+            )
+            tmp_block_decl = tmp_block.declare()
+        else:
+            tmp_block_decl = ""
+
+        headers = ["cmath", "stdlib.h", "cstdint"]
+        if keopscore.config.config.use_OpenMP:
+            headers.append("omp.h")
+        if debug_ops_at_exec:
+            headers.append("iostream")
+        self.headers += c_include(*headers)
+
+        self.code = f"""
+{self.headers}
+
+#define BLOCK_SIZE_I {block_i}
+#define TILE_SIZE_J {tile_j}
+
+template < typename TYPE >
+int CpuConv_tiled_{self.gencode_filename}(int nx, int ny, TYPE* out, int64_t* outind, TYPE **{arg.id}, int64_t *argstrides) {{
+
+    // load parameters variables once and for all
+    {param_loc.declare()}
+    {varloader.load_vars("p", param_loc, args)}
+
+    int nblocks = (nx + BLOCK_SIZE_I - 1) / BLOCK_SIZE_I;
+
+    #pragma omp parallel for schedule(static)
+    for (int block = 0; block < nblocks; block++) {{
+        int istart = block * BLOCK_SIZE_I;
+        int nrows = (nx - istart < BLOCK_SIZE_I) ? (nx - istart) : BLOCK_SIZE_I;
+
+        {xi_block.declare()}
+        {hi_block.declare()}
+        {acc_block.declare()}
+        {tmp_block_decl}
+        {yj_tile.declare()}
+        {hj_tile.declare()}
+
+        // load the i rows of the block and initialize their accumulators
+        for (int ii = 0; ii < nrows; ii++) {{
+            int i = istart + ii;
+            {varloader.load_vars("i", xi, args, row_index=i)}
+            {"".join(f(arr, table) for f, arr in hoisted_i)}
+            {red_formula.InitializeReduction(acc)}
+            {sum_scheme.initialize_temporary_accumulator_first_init()}
+        }}
+
+        for (int jstart = 0; jstart < ny; jstart += TILE_SIZE_J) {{
+            int ncols = (ny - jstart < TILE_SIZE_J) ? (ny - jstart) : TILE_SIZE_J;
+
+            // copy the current tile of j rows into the local contiguous buffer
+            for (int jrel = 0; jrel < ncols; jrel++) {{
+                int j = jstart + jrel;
+                {varloader.load_vars("j", yjrel, args, row_index=j)}
+                {"".join(f(arr, table) for f, arr in hoisted_j)}
+            }}
+
+            {self.tile_reduction_code(fout, acc, table, hoisted_i + hoisted_j)}
+        }}
+
+        for (int ii = 0; ii < nrows; ii++) {{
+            int i = istart + ii;
+            {red_formula.FinalizeOutputIndices(acc, outi, self.outindi, i)}
+        }}
+    }}
+    return 0;
+}}
+                    """
+
+        self.code += self.get_launch_code(f"CpuConv_tiled_{self.gencode_filename}")
+
+    def get_launch_code(self, conv):
+        # returns the code of the launch functions, which call the templated function conv
+        return f"""
+#include "stdarg.h"
+#include <vector>
+
+template < typename TYPE >
+int launch_keops_{self.gencode_filename}(int nx, int ny, int tagI, TYPE *out, int64_t *outind, TYPE **arg, int64_t *argstrides) {{
+
+    if (tagI==1) {{
+        int tmp = ny;
+        ny = nx;
+        nx = tmp;
+    }}
+
+    return {conv}< TYPE >(nx, ny, out, outind, arg, argstrides);
+
+}}
+template < typename TYPE >
+int launch_keops_cpu_{self.gencode_filename}(int dimY,
+                                             int nx,
+                                             int ny,
+                                             int tagI,
+                                             int tagZero,
+                                             int use_half,
+                                             int dimred,
+                                             int use_chunk_mode,
+                                             std::vector< int > indsi, std::vector< int > indsj, std::vector< int > indsp,
+                                             int dimout,
+                                             std::vector< int > dimsx, std::vector< int > dimsy, std::vector< int > dimsp,
+                                             int **ranges,
+                                             std::vector< int > shapeout, TYPE *out, int64_t *outind,
+                                             TYPE **arg,
+                                             int64_t *argstrides,
+                                             std::vector< std::vector< int > > argshape) {{
+
+
+    return launch_keops_{self.gencode_filename} < TYPE >(nx, ny, tagI, out, outind, arg, argstrides);
+
+}}
+                """
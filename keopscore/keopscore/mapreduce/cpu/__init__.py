@@ -1,3 +1,5 @@
 from .CpuReduc_ranges import CpuReduc_ranges
 from .CpuReduc import CpuReduc
+from .CpuReduc_tiled import CpuReduc_tiled
 from .CpuAssignZero import CpuAssignZero
+from .CpuReduc_KMin import CpuReduc_KMin
@@ -1,85 +1,255 @@
 import os
 import pickle
+import re
+import time
+from hashlib import sha256
+
 import keopscore
+from keopscore.utils.misc_utils import KeOps_atomic_write, KeOps_FileLock
 
-# global configuration parameter to be added for the lookup :
-env_param = keopscore.config.config.cpp_flags
+# version of the format of cache entries ; entries saved with another version
+# of the format, or of KeOps, are ignored.
+cache_format_version = 2
 
 
 class Cache:
-    def __init__(self, fun, use_cache_file=False, save_folder="."):
+    """
+    Caches the results of calls to fun, in memory and, if use_cache_file is True,
+    on disk in the folder save_folder/cache/<name of fun>, with one small file per
+    entry. Entries are written atomically as soon as they are computed, and looked up
+    lazily, so that several processes can share the same cache folder.
+    - check_value is an optional function, used to check if a value read from
+      disk is still valid (e.g. if the compiled files it refers to still exist).
+    """
+
+    def __init__(self, fun, use_cache_file=False, save_folder=".", check_value=None):
         self.fun = fun
+        self.name = fun.__name__
         self.library = {}
+        self.times = {}
         self.use_cache_file = use_cache_file
+        self.check_value = check_value
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "time_saved": 0.0}
         if use_cache_file:
-            self.cache_file = os.path.join(save_folder, fun.__name__ + "_cache.pkl")
-            if os.path.isfile(self.cache_file) and os.path.getsize(self.cache_file) > 0:
-                f = open(self.cache_file, "rb")
-                self.library = pickle.load(f)
-                f.close()
-            import atexit
+            self.cache_folder = os.path.join(save_folder, "cache", self.name)
+            # removes the whole-dict cache file used by previous versions of KeOps
+            try:
+                os.remove(os.path.join(save_folder, self.name + "_cache.pkl"))
+            except OSError:
+                pass
+
+    def get_key(self, *args):
+        # the global compilation flags and options are added to the key for the lookup
+        return (
+            repr(args)
+            + repr(keopscore.config.config.cpp_flags)
+            + repr(keopscore.use_cpu_kmin_scheme)
+        )
+
+    def entry_file(self, key):
+        return os.path.join(
+            self.cache_folder, sha256(key.encode("utf-8")).hexdigest()[:32] + ".pkl"
+        )
 
-            atexit.register(self.save_cache)
+    def load_entry(self, key):
+        # returns the entry saved on disk for key, or None if there is no valid entry
+        filename = self.entry_file(key)
+        try:
+            with open(filename, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # the entry is corrupted, e.g. if it was written by an incompatible version
+            return None
+        if (
+            not isinstance(entry, dict)
+            or entry.get("format") != cache_format_version
+            or entry.get("version") != keopscore.__version__
+            or entry.get("key") != key
+        ):
+            return None
+        if self.check_value is not None and not self.check_value(entry["value"]):
+            return None
+        # updates the modification time of the entry, for least recently used eviction
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        return entry
+
+    def save_entry(self, key, value, elapsed):
+        entry = {
+            "format": cache_format_version,
+            "version": keopscore.__version__,
+            "key": key,
+            "value": value,
+            "time": elapsed,
+        }
+        os.makedirs(self.cache_folder, exist_ok=True)
+        KeOps_atomic_write(self.entry_file(key), pickle.dumps(entry), mode="wb")
+
+    def is_valid(self, value):
+        # checks a value found in memory, e.g. if its compiled files were removed
+        # by clean_cache since it was computed.
+        return self.check_value is None or self.check_value(value)
 
     def __call__(self, *args):
-        str_id = "".join(list(str(arg) for arg in args)) + str(env_param)
-        if not str_id in self.library:
-            self.library[str_id] = self.fun(*args)
-        return self.library[str_id]
+        key = self.get_key(*args)
+        if key in self.library:
+            if self.is_valid(self.library[key]):
+                # N.B. the compilation time is saved once, when the entry is found
+                # on disk, so it is not counted again here.
+                self.stats["hits"] += 1
+                return self.library[key]
+            del self.library[key], self.times[key]
+        entry = self.load_entry(key) if self.use_cache_file else None
+        if entry is not None:
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            self.stats["time_saved"] += entry["time"]
+            value, elapsed = self.load_value(entry["value"]), entry["time"]
+        else:
+            self.stats["misses"] += 1
+            start = time.perf_counter()
+            value, saved_value = self.compute_value(*args)
+            elapsed = time.perf_counter() - start
+            if self.use_cache_file:
+                self.save_entry(key, saved_value, elapsed)
+        self.library[key] = value
+        self.times[key] = elapsed
+        return value
+
+    def compute_value(self, *args):
+        # returns the value for args, and the value to be saved on disk
+        value = self.fun(*args)
+        return value, value
+
+    def load_value(self, saved_value):
+        # returns the value corresponding to a value saved on disk
+        return saved_value
 
     def reset(self, new_save_folder=None):
         self.library = {}
+        self.times = {}
         if new_save_folder:
             self.save_folder = new_save_folder
-
-    def save_cache(self):
-        f = open(self.cache_file, "wb")
-        pickle.dump(self.library, f)
-        f.close()
+            if self.use_cache_file:
+                self.cache_folder = os.path.join(new_save_folder, "cache", self.name)
 
 
-class Cache_partial:
-    """ """
+class Cache_partial(Cache):
+    """
+    Same as Cache, for caching instances of a class cls. Only the params
+    attribute of the instances is saved on disk, and instances are re-created
+    from it with cls(params, fast_init=True).
+    """
 
-    def __init__(self, cls, use_cache_file=False, save_folder="."):
+    def __init__(self, cls, use_cache_file=False, save_folder=".", check_value=None):
         self.cls = cls
-        self.library = {}
-        self.use_cache_file = use_cache_file
-        if self.use_cache_file:
-            self.cache_file = os.path.join(save_folder, cls.__name__ + "_cache.pkl")
-            if os.path.isfile(self.cache_file):
-                f = open(self.cache_file, "rb")
-                self.library_params = pickle.load(f)
-                f.close()
-            else:
-                self.library_params = {}
-            import atexit
-
-            atexit.register(self.save_cache)
+        super().__init__(
+            cls,
+            use_cache_file=use_cache_file,
+            save_folder=save_folder,
+            check_value=check_value,
+        )
 
-    def __call__(self, *args):
-        str_id = "".join(list(str(arg) for arg in args)) + str(env_param)
-        if not str_id in self.library:
-            if self.use_cache_file:
-                if str_id in self.library_params:
-                    params = self.library_params[str_id]
-                    self.library[str_id] = self.cls(params, fast_init=True)
-                else:
-                    obj = self.cls(*args)
-                    self.library_params[str_id] = obj.params
-                    self.library[str_id] = obj
-            else:
-                self.library[str_id] = self.cls(*args)
-        return self.library[str_id]
+    def compute_value(self, *args):
+        obj = self.cls(*args)
+        return obj, obj.params
 
-    def reset(self, new_save_folder=None):
-        self.library = {}
-        if self.use_cache_file:
-            self.library_params = {}
-        if new_save_folder:
-            self.save_folder = new_save_folder
+    def load_value(self, params):
+        return self.cls(params, fast_init=True)
+
+    def is_valid(self, obj):
+        # instances keep their compiled library loaded, even if its file was removed
+        return True
+
+
+def get_cached_files(build_folder):
+    # returns the files produced by the compilation of formulas in build_folder,
+    # grouped by hash name (e.g. 7b9a611f7e.cpp, 7b9a611f7e.so, 7b9a611f7e.nfo, etc.).
+    # Lock files and temporary files of compilations in progress are not listed.
+    groups = {}
+    for f in os.scandir(build_folder):
+        match = re.match(
+            "^(?:([0-9a-f]{10})\\.(?:so|cpp|cu|nfo)|(?:cubin|ptx)_([0-9a-f]{10}))$",
+            f.name,
+        )
+        if match and f.is_file():
+            groups.setdefault(match.group(1) or match.group(2), []).append(f)
+    return groups
+
+
+def is_compiled(files):
+    # a formula is completely compiled if its info file and its binary file exist
+    # (see keopscore.binders.LinkCompile.get_dll_and_params)
+    exts = [os.path.splitext(f.name)[1] for f in files]
+    return ".nfo" in exts and any(ext in ("", ".so") for ext in exts)
+
+
+def clean_cache(max_size, build_folder=None, keep=()):
+    """
+    Removes the least recently used compiled formulas from the build folder,
+    until the total size of compiled files is lower than max_size (in bytes).
+    Formulas whose hash name is in keep, and formulas which are being compiled
+    or looked up by another process, are never removed.
+    """
+    if build_folder is None:
+        build_folder = keopscore.get_build_folder()
+    groups = []
+    total_size = 0
+    for tag, files in get_cached_files(build_folder).items():
+        try:
+            stats = [f.stat() for f in files]
+        except FileNotFoundError:
+            continue
+        size = sum(s.st_size for s in stats)
+        total_size += size
+        if tag not in keep and is_compiled(files):
+            groups.append((max(s.st_mtime for s in stats), size, tag, files))
+    groups.sort(key=lambda group: group[0])
+    for _, size, tag, files in groups:
+        if total_size <= max_size:
+            break
+        # the lock of the formula is held by processes which compile it or check
+        # that it is compiled : we skip it rather than waiting.
+        lock = KeOps_FileLock(os.path.join(build_folder, tag + ".lock"), blocking=False)
+        with lock:
+            if not lock.locked:
+                continue
+            # the info file is removed first, so that the formula is seen as not compiled
+            for f in sorted(files, key=lambda f: not f.name.endswith(".nfo")):
+                try:
+                    os.remove(f.path)
+                except FileNotFoundError:
+                    pass
+        total_size -= size
+    return total_size
+
+
+def cache_stats():
+    """
+    Returns a dictionary with statistics about the cache of compiled formulas :
+    number of hits (in memory or on disk), of disk hits, of misses (i.e. compilations),
+    compilation time saved by the entries found on disk (in seconds), number of compiled formulas
+    and total size of compiled files in the build folder (in bytes).
+    """
+    from keopscore.get_keops_dll import get_keops_dll
 
-    def save_cache(self):
-        f = open(self.cache_file, "wb")
-        pickle.dump(self.library_params, f)
-        f.close()
+    groups = get_cached_files(keopscore.get_build_folder())
+    size = 0
+    for files in groups.values():
+        for f in files:
+            try:
+                size += f.stat().st_size
+            except FileNotFoundError:
+                pass
+    return {
+        "hits": get_keops_dll.stats["hits"],
+        "disk_hits": get_keops_dll.stats["disk_hits"],
+        "misses": get_keops_dll.stats["misses"],
+        "compile_time_saved": get_keops_dll.stats["time_saved"],
+        "num_formulas": len(groups),
+        "size": size,
+    }
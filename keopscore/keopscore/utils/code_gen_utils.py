@@ -1,4 +1,6 @@
 import os
+import shutil
+import threading
 from hashlib import sha256
 
 from keopscore.config.config import disable_pragma_unrolls
@@ -30,6 +32,8 @@ def sizeof(dtype):
 class new_c_varname:
     # class to generate unique names for variables in C++ code, to avoid conflicts
     dict_instances = {}
+    # the counters are shared by the threads which generate code at the same time
+    lock = threading.Lock()
 
     def __new__(self, template_string_id, num=1, as_list=False):
         # - template_string_id is a string, the base name for c_variable
@@ -38,11 +42,12 @@ class new_c_varname:
         # will return "x_1", the second call will return "x_2", etc.
         if num > 1 or as_list:
             return list(new_c_varname(template_string_id) for k in range(num))
-        if template_string_id in new_c_varname.dict_instances:
-            cnt = new_c_varname.dict_instances[template_string_id] + 1
-        else:
-            cnt = 0
-        new_c_varname.dict_instances[template_string_id] = cnt
+        with new_c_varname.lock:
+            if template_string_id in new_c_varname.dict_instances:
+                cnt = new_c_varname.dict_instances[template_string_id] + 1
+            else:
+                cnt = 0
+            new_c_varname.dict_instances[template_string_id] = cnt
         string_id = template_string_id + "_" + str(cnt)
         return string_id
 
@@ -110,7 +115,13 @@ class c_variable:
             dtype = "int" if type(other) == int else "float"
             return python_op(self, c_variable(dtype, str(other)))
         elif type(other) == c_variable:
-            if self.dtype != other.dtype:
+            # N.B. comparisons of float and double values are allowed, e.g. for
+            # Min type reductions with double precision accumulators
+            mixed_comparison = name == "comparison" and {self.dtype, other.dtype} == {
+                "float",
+                "double",
+            }
+            if self.dtype != other.dtype and not mixed_comparison:
                 KeOps_Error(
                     f"{name} of two c_variable is only possible with same dtype"
                 )
@@ -250,7 +261,7 @@ def infinity(dtype):
 
 def cast_to(dtype, var):
     # returns C++ code string to do a cast ; e.g. "(float)" if dtype is "float" for example
-    simple_dtypes = ["float", "double", "int", "bool"]
+    simple_dtypes = ["float", "double", "int", "int64_t", "bool"]
     if (dtype in simple_dtypes) and (var.dtype in simple_dtypes):
         return f"({dtype})({var.id})"
     elif dtype == "half2" and var.dtype == "float":
@@ -496,7 +507,7 @@ def GetInds(Vars):
 
 
 class Var_loader:
-    def __init__(self, red_formula):
+    def __init__(self, red_formula, use_int64_index=False, use_strides=False):
         formula = red_formula.formula
         tagI, tagJ = red_formula.tagI, red_formula.tagJ
 
@@ -530,6 +541,15 @@ class Var_loader:
         self.inds = GetInds(formula.Vars_)
         self.nminargs = max(self.inds) + 1 if len(self.inds) > 0 else 0
 
+        # if True, the offsets of the rows in the input arrays are computed with 64 bits integers
+        self.use_int64_index = use_int64_index
+
+        # if use_strides is True, the input arrays are read with the (row, column) strides
+        # given in the argstrides array of the generated code
+        self.strides = (
+            c_variable(pointer("int64_t"), "argstrides") if use_strides else None
+        )
+
     def table(self, xi, yj, pp):
         return table(
             self.nminargs,
@@ -556,6 +576,7 @@ class Var_loader:
             args,
             i,
             j,
+            self.use_int64_index,
         )
 
     def load_vars(self, cat, *args, **kwargs):
@@ -565,7 +586,14 @@ class Var_loader:
             dims, inds = self.dimsy, self.indsj
         elif cat == "p":
             dims, inds = self.dimsp, self.indsp
-        return load_vars(dims, inds, *args, **kwargs)
+        return load_vars(
+            dims,
+            inds,
+            *args,
+            use_int64_index=self.use_int64_index,
+            strides=self.strides,
+            **kwargs,
+        )
 
 
 def table(nminargs, dimsx, dimsy, dimsp, indsi, indsj, indsp, xi, yj, pp):
@@ -582,17 +610,30 @@ def table(nminargs, dimsx, dimsy, dimsp, indsi, indsj, indsp, xi, yj, pp):
     return res
 
 
-def direct_table(nminargs, dimsx, dimsy, dimsp, indsi, indsj, indsp, args, i, j):
+def direct_table(
+    nminargs,
+    dimsx,
+    dimsy,
+    dimsp,
+    indsi,
+    indsj,
+    indsp,
+    args,
+    i,
+    j,
+    use_int64_index=False,
+):
     res = [None] * nminargs
     for dims, inds, row_index in (
         (dimsx, indsi, i),
         (dimsy, indsj, j),
         (dimsp, indsp, c_zero_int),
     ):
+        row = int64_index(row_index.id) if use_int64_index else row_index.id
         for u in range(len(dims)):
             arg = args[inds[u]]
             res[inds[u]] = c_array(
-                value(arg.dtype), dims[u], f"({arg.id}+{row_index.id}*{dims[u]})"
+                value(arg.dtype), dims[u], f"({arg.id}+{row}*{dims[u]})"
             )
     return res
 
@@ -627,7 +668,79 @@ def table4(
     return res
 
 
-def load_vars(dims, inds, xloc, args, row_index=c_zero_int, offsets=None, indsref=None):
+# storage types of the Cpu map-reduce schemes : float16 and bfloat16 values are stored as 16 bits
+# integers in memory, and converted to float by the keops_load functions when they are loaded
+# (see load_vars), so that computations are performed in float.
+storage_types = {"half": "keops_half", "bfloat16": "keops_bfloat16"}
+
+storage_types_code = """
+#include <cstdint>
+#include <cstring>
+
+struct keops_half {
+    uint16_t bits;
+};
+
+struct keops_bfloat16 {
+    uint16_t bits;
+};
+
+// bfloat16 values are the 16 most significant bits of float values
+inline float keops_load(keops_bfloat16 x) {
+    uint32_t u = ((uint32_t) x.bits) << 16;
+    float res;
+    std::memcpy(&res, &u, sizeof(float));
+    return res;
+}
+
+// conversion of IEEE 754 half precision values to single precision
+inline float keops_load(keops_half x) {
+    uint32_t sign = ((uint32_t) (x.bits & 0x8000)) << 16;
+    uint32_t exponent = (x.bits >> 10) & 0x1f;
+    uint32_t mantissa = x.bits & 0x3ff;
+    uint32_t u;
+    if (exponent == 0x1f) {
+        // infinities and NaNs
+        u = sign | 0x7f800000 | (mantissa << 13);
+    } else if (exponent != 0) {
+        // normal numbers
+        u = sign | ((exponent + 112) << 23) | (mantissa << 13);
+    } else if (mantissa == 0) {
+        // zeros
+        u = sign;
+    } else {
+        // subnormal numbers are normalized
+        exponent = 113;
+        while (!(mantissa & 0x400)) {
+            mantissa <<= 1;
+            exponent--;
+        }
+        u = sign | (exponent << 23) | ((mantissa & 0x3ff) << 13);
+    }
+    float res;
+    std::memcpy(&res, &u, sizeof(float));
+    return res;
+}
+"""
+
+
+def int64_index(row_index):
+    # returns the code of a row index cast to a 64 bits integer, so that the offset
+    # of the row in an array with more than 2^31-1 elements does not overflow
+    return f"((int64_t){row_index})"
+
+
+def load_vars(
+    dims,
+    inds,
+    xloc,
+    args,
+    row_index=c_zero_int,
+    offsets=None,
+    indsref=None,
+    use_int64_index=False,
+    strides=None,
+):
     # returns a c++ code used to create a local copy of slices of the input tensors, for evaluating a formula
     # - dims is a list of integers giving dimensions of variables
     # - dims is a list of integers giving indices of variables
@@ -636,6 +749,11 @@ def load_vars(dims, inds, xloc, args, row_index=c_zero_int, offsets=None, indsre
     # - row_index is a c_variable (of dtype="int"), specifying which row of the matrix should be loaded
     # - offsets is an optional c_array (of dtype="int"), specifying variable-dependent offsets (used when broadcasting batch dimensions)
     # - indsref is an optional list of integers, giving index mapping for offsets
+    # - use_int64_index is an optional boolean : if True, the offsets of the rows are computed
+    #   with 64 bits integers, e.g. arg7[((int64_t)5)*2+0], for arrays with more than 2^31-1 elements.
+    # - strides is an optional c_variable (of dtype="int64_t*"), giving the row and column strides
+    #   of the k-th input tensor at positions 2*k and 2*k+1, e.g. arg7[5*strides[14]+v*strides[15]],
+    #   for strided views of arrays.
     #
     # Example: assuming i=c_variable("int", "5"), xloc=c_variable("float", "xi") and px=c_variable("float**", "px"), then
     # if dims = [2,2,3] and inds = [7,9,8], the call to
@@ -687,11 +805,19 @@ def load_vars(dims, inds, xloc, args, row_index=c_zero_int, offsets=None, indsre
             row_index_str = (
                 f"({row_index.id}+{offsets.id}[{l}])" if offsets else row_index.id
             )
+            if use_int64_index:
+                row_index_str = int64_index(row_index_str)
             string += use_pragma_unroll()
             string += f"for(int v=0; v<{dims[u]}; v++) {{\n"
-            string += (
-                f"    {xloc.id}[a] = {args[inds[u]].id}[{row_index_str}*{dims[u]}+v];\n"
-            )
+            if strides is not None:
+                k = inds[u]
+                src = f"{args[k].id}[{row_index_str}*{strides.id}[{2*k}]+v*{strides.id}[{2*k+1}]]"
+            else:
+                src = f"{args[inds[u]].id}[{row_index_str}*{dims[u]}+v]"
+            if value(args[inds[u]].dtype) in storage_types.values():
+                # 16 bits values are converted to float when they are loaded
+                src = f"keops_load({src})"
+            string += f"    {xloc.id}[a] = {src};\n"
             string += "     a++;\n"
             string += "}\n"
         string += "}\n"
@@ -806,7 +932,9 @@ def clean_keops(recompile_jit_binary=True, verbose=True):
     else:
         jit_binary = None
     for f in os.scandir(build_path):
-        if recompile_jit_binary or f.path != jit_binary:
+        if f.is_dir():
+            shutil.rmtree(f.path)
+        elif recompile_jit_binary or f.path != jit_binary:
             os.remove(f.path)
     if verbose:
         KeOps_Message(f"{build_path} has been cleaned.")
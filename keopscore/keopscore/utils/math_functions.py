@@ -69,7 +69,18 @@ keops_exp = math_function(cpu_code="exp", gpu_half2_code="h2exp")
 keops_floor = math_function(cpu_code="floor")
 keops_log = math_function(cpu_code="log")
 keops_xlogx = math_function(cpu_code=lambda x: f"({x} ? {x} * log({x}) : 0.0f)")
-keops_fma = math_function(cpu_code="fma")
+# without hardware support, fma is a call to the math library which prevents the
+# vectorization of the loops of the Cpu code : we use a plain multiply-add instead.
+keops_fma = math_function(
+    cpu_code=lambda x, y, z: f"""
+                        #ifdef __FMA__
+                        fma({x},{y},{z})
+                        #else
+                        ({x}*{y}+{z})
+                        #endif
+                        """,
+    gpu_code="fma",
+)
 keops_pow = math_function(
     cpu_code="pow",
     gpu_code="powf",
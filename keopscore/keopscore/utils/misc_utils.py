@@ -2,6 +2,8 @@
 # .  Warnings, Errors, etc.
 #######################################################################
 
+import threading
+
 import keopscore
 
 
@@ -54,6 +56,68 @@ def KeOps_OS_Run(command):
         os.system(command)
 
 
+# The generation of the code of formulas relies on global state (e.g. the options of the chunk
+# modes, or the counters of the names of C++ variables) : when the code of several formulas is
+# generated by different threads of the same process, this lock serializes the generation of
+# the code, while the compilations run concurrently.
+code_generation_lock = threading.Lock()
+
+
+class KeOps_FileLock:
+    """
+    Inter-process lock based on a lock file, used as a context manager to
+    prevent several processes sharing the same build folder from compiling
+    the same formula at the same time. On systems without fcntl, this is a no-op.
+    If blocking is False, the lock is not waited for : the locked attribute tells
+    if it was acquired.
+    """
+
+    def __init__(self, filename, blocking=True):
+        self.filename = filename
+        self.blocking = blocking
+        self.fd = None
+        self.locked = False
+
+    def __enter__(self):
+        try:
+            import fcntl
+        except ImportError:
+            self.locked = True
+            return self
+        self.fd = open(self.filename, "a")
+        try:
+            fcntl.flock(
+                self.fd,
+                fcntl.LOCK_EX if self.blocking else fcntl.LOCK_EX | fcntl.LOCK_NB,
+            )
+        except BlockingIOError:
+            self.fd.close()
+            self.fd = None
+            return self
+        self.locked = True
+        return self
+
+    def __exit__(self, *args):
+        if self.fd is not None:
+            import fcntl
+
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.fd.close()
+            self.fd = None
+        self.locked = False
+
+
+def KeOps_atomic_write(filename, content, mode="w"):
+    # write content to a temporary file, then move it to its final location,
+    # so that concurrent readers never see a partially written file.
+    import os
+
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, mode) as f:
+        f.write(content)
+    os.replace(tmp_filename, filename)
+
+
 def find_library_abspath(lib):
     """
     wrapper around ctypes find_library that returns the full path
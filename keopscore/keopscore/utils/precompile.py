@@ -0,0 +1,158 @@
+"""
+Ahead-of-time compilation of a list of formulas, using a pool of worker processes.
+
+Each formula is described by a "spec", which gives the arguments of get_keops_dll
+(see the docstring of keopscore.get_keops_dll), either :
+  - as a tuple or list of positional arguments,
+  - as a dict, where missing keys take the default values given in precompile_default_spec,
+    and "nargs" defaults to the number of aliases.
+
+Workers share the build folder of the calling process. Compilations of the same formula
+are serialized through lock files in the build folder (see LinkCompile.get_dll_and_params),
+so that several jobs may safely precompile formulas at the same time.
+
+It can be used as a Python function or as a standalone Python script, taking as input
+a json file containing the list of specs :
+  - example (as Python function) :
+      keopscore.precompile([{"red_formula_string": "Sum_Reduction(Exp(-Sum(Square(x-y))),0)", "aliases": ["x=Var(0,3,0)", "y=Var(1,3,1)"]}], workers=4)
+  - example (as Python script) :
+      python -m keopscore.utils.precompile specs.json --workers 4
+"""
+
+import os
+
+from keopscore.utils.misc_utils import KeOps_Error, KeOps_Message
+
+precompile_default_spec = {
+    "map_reduce_id": "CpuReduc_tiled",
+    "red_formula_string": None,
+    "enable_chunks": 1,
+    "enable_finalchunks": -1,
+    "mul_var_highdim": 0,
+    "aliases": [],
+    "nargs": None,
+    "dtype": "float",
+    "dtypeacc": "float",
+    "sum_scheme_string": "block_sum",
+    "tagHostDevice": 0,
+    "tagCPUGPU": 0,
+    "tag1D2D": 0,
+    "use_half": 0,
+    "device_id": -1,
+    "use_int64_index": 0,
+    "use_strides": 0,
+}
+
+
+def spec_to_args(spec):
+    # converts a formula spec into the list of positional arguments of get_keops_dll
+    if isinstance(spec, (tuple, list)):
+        if len(spec) != len(precompile_default_spec):
+            KeOps_Error(
+                f"Invalid formula spec {spec}. There should be {len(precompile_default_spec)} arguments corresponding to:\n{list(precompile_default_spec.keys())}"
+            )
+        return list(spec)
+    if not isinstance(spec, dict):
+        KeOps_Error(f"Invalid formula spec {spec}, should be a tuple, list or dict.")
+    unknown = set(spec.keys()) - set(precompile_default_spec.keys())
+    if unknown:
+        KeOps_Error(f"Invalid keys {sorted(unknown)} in formula spec {spec}.")
+    res = dict(precompile_default_spec, **spec)
+    if res["red_formula_string"] is None:
+        KeOps_Error(f"Missing key red_formula_string in formula spec {spec}.")
+    if res["nargs"] is None:
+        res["nargs"] = len(res["aliases"])
+    return list(res.values())
+
+
+def _init_worker(build_folder):
+    # workers must use the same build folder as the calling process
+    from keopscore.config.config import set_build_folder
+
+    set_build_folder(build_folder, write_save_file=False)
+
+
+def _build_formula(spec):
+    from keopscore.get_keops_dll import get_keops_dll
+
+    return get_keops_dll(*spec_to_args(spec))[0]
+
+
+def precompile(
+    specs, workers=None, build_function=_build_formula, init_function=_init_worker
+):
+    """
+    Compiles a list of formulas in parallel, and returns the list of their hash names.
+
+    - specs : list of formula specs (see the docstring of this module),
+    - workers : number of worker processes ; if None, uses the number of cpus. If workers=0,
+      formulas are compiled sequentially in the calling process,
+    - build_function : function applied to each spec, which performs the compilation and
+      returns the hash name. It must be defined at the top level of a module, so that it can
+      be sent to worker processes. Default is to call get_keops_dll with the arguments of the spec,
+    - init_function : function called at the start of each worker process with the build folder
+      of the calling process as argument. It must also be defined at the top level of a module.
+    """
+    from keopscore.config.config import get_build_folder
+
+    specs = list(specs)
+    if build_function is _build_formula:
+        # check the specs before launching the workers
+        for spec in specs:
+            spec_to_args(spec)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(specs))
+    KeOps_Message(
+        f"Precompiling {len(specs)} formulas with {max(workers, 1)} process(es)."
+    )
+    if workers == 0:
+        return [build_function(spec) for spec in specs]
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # we use "spawn" start method to avoid forking a process that may hold
+    # OpenMP or Cuda resources.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_function,
+        initargs=(get_build_folder(),),
+    ) as executor:
+        return list(executor.map(build_function, specs))
+
+
+def precompile_main(precompile_fun=precompile, description=None):
+    # command line interface, shared with the pykeops script
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("specs", help="json file containing the list of formula specs")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of cpus)",
+    )
+    parser.add_argument(
+        "--build-folder", default=None, help="build folder to use (default: current)"
+    )
+    args = parser.parse_args()
+
+    if args.build_folder:
+        from keopscore.config.config import set_build_folder
+
+        set_build_folder(args.build_folder)
+
+    with open(args.specs, "r") as f:
+        specs = json.load(f)
+
+    for tag in precompile_fun(specs, workers=args.workers):
+        print(tag)
+
+
+if __name__ == "__main__":
+    precompile_main(description="Precompile KeOps formulas in parallel.")
@@ -35,12 +35,6 @@ with open(
 
 default_device_id = 0  # default Gpu device number
 
-if keopscore.config.config.use_cuda:
-    if not os.path.exists(pykeopsconfig.pykeops_nvrtc_name(type="target")):
-        from .common.keops_io.LoadKeOps_nvrtc import compile_jit_binary
-
-        compile_jit_binary()
-
 
 def clean_pykeops(recompile_jit_binaries=True):
     import pykeops
@@ -49,7 +43,7 @@ def clean_pykeops(recompile_jit_binaries=True):
     keops_binder = pykeops.common.keops_io.keops_binder
     for key in keops_binder:
         keops_binder[key].reset()
-    if recompile_jit_binaries and keopscore.config.config.use_cuda:
+    if recompile_jit_binaries and "nvrtc" in keops_binder:
         pykeops.common.keops_io.LoadKeOps_nvrtc.compile_jit_binary()
 
 
@@ -60,7 +54,7 @@ def set_build_folder(path=None):
     keops_binder = pykeops.common.keops_io.keops_binder
     for key in keops_binder:
         keops_binder[key].reset(new_save_folder=get_build_folder())
-    if keopscore.config.config.use_cuda and not os.path.exists(
+    if "nvrtc" in keops_binder and not os.path.exists(
         pykeops.config.pykeops_nvrtc_name(type="target")
     ):
         pykeops.common.keops_io.LoadKeOps_nvrtc.compile_jit_binary()
@@ -70,11 +64,79 @@ def get_build_folder():
     return keops_get_build_folder()
 
 
+def precompile(specs, workers=None):
+    """
+    Compiles a list of reductions in parallel, see pykeops.common.precompile
+    """
+    from .common.precompile import precompile
+
+    return precompile(specs, workers=workers)
+
+
+def set_sharded_workers(workers=None):
+    """
+    Sets the number of worker processes of the "CPU_sharded" backend (by default,
+    one per NUMA node), see pykeops.common.sharded
+    """
+    from .common.sharded import set_workers
+
+    set_workers(workers)
+
+
+def shared_empty(shape, dtype="float32"):
+    """
+    Returns a numpy array allocated in shared memory, which the "CPU_sharded" backend
+    reads and writes in place, see pykeops.common.sharded
+    """
+    from .common.sharded import shared_empty
+
+    return shared_empty(shape, dtype)
+
+
+def set_num_threads(num_threads=None):
+    """
+    Sets the number of OpenMP threads of the Cpu routines, for the calls which do
+    not specify a num_threads argument (None restores the OpenMP default),
+    see pykeops.common.threads
+    """
+    from .common.threads import set_num_threads
+
+    set_num_threads(num_threads)
+
+
+def get_num_threads():
+    """
+    Returns the number of OpenMP threads of the Cpu routines launched by the current
+    thread (0 means the OpenMP default), see pykeops.common.threads
+    """
+    from .common.threads import get_num_threads
+
+    return get_num_threads()
+
+
+# N.B. the test functions import numpy and torch, which is slow, so they
+# are only imported when they are called.
 if pykeopsconfig.numpy_found:
-    from .numpy.test_install import test_numpy_bindings
+
+    def test_numpy_bindings():
+        """
+        Checks that the numpy bindings of KeOps work, see pykeops.numpy.test_install
+        """
+        from .numpy.test_install import test_numpy_bindings
+
+        return test_numpy_bindings()
+
 
 if pykeopsconfig.torch_found:
-    from .torch.test_install import test_torch_bindings
 
-# next line is to ensure that cache file for formulas is loaded at import
+    def test_torch_bindings():
+        """
+        Checks that the torch bindings of KeOps work, see pykeops.torch.test_install
+        """
+        from .torch.test_install import test_torch_bindings
+
+        return test_torch_bindings()
+
+
+# N.B. this does not load the Cuda binder, which is loaded on first use
 from .common import keops_io
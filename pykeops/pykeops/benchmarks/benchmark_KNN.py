@@ -333,13 +333,16 @@ def KNN_JAX_batch_loop(K, metric="euclidean", **kwargs):
 # Note that we could also rely on the simpler ``LazyTensor`` syntax,
 # at the cost of a small overhead that is negligible in most settings.
 
+import keopscore
 from pykeops.torch import Vi, Vj
 
 
-def KNN_KeOps(K, metric="euclidean", **kwargs):
+def KNN_KeOps(K, metric="euclidean", backend="auto", kmin_scheme=True, **kwargs):
     def fit(x_train):
         # Setup the K-NN estimator:
         x_train = tensor(x_train)
+        if backend == "CPU":
+            x_train = x_train.cpu()
         start = timer()
 
         # Encoding as KeOps LazyTensors:
@@ -367,10 +370,16 @@ def KNN_KeOps(K, metric="euclidean", **kwargs):
 
         def f(x_test):
             x_test = tensor(x_test)
+            if backend == "CPU":
+                x_test = x_test.cpu()
             start = timer()
 
             # Actual K-NN query:
-            indices = KNN_fun(x_test, x_train)
+            keopscore.use_cpu_kmin_scheme = kmin_scheme
+            try:
+                indices = KNN_fun(x_test, x_train, backend=backend)
+            finally:
+                keopscore.use_cpu_kmin_scheme = True
 
             elapsed = timer() - start
 
@@ -382,6 +391,18 @@ def KNN_KeOps(K, metric="euclidean", **kwargs):
     return fit
 
 
+##############################################################
+# On the CPU, K-min reductions such as ``argKmin`` rely on a special
+# implementation, which keeps the K smallest distances found so far
+# in a sorted list (or in a buffer, for large values of K) and rejects
+# most candidates with a single comparison to the largest of them.
+# It can be disabled with the ``keopscore.use_cpu_kmin_scheme`` flag,
+# to compare it with the generic implementation of the reduction:
+
+KNN_KeOps_CPU = partial(KNN_KeOps, backend="CPU")
+KNN_KeOps_CPU_generic = partial(KNN_KeOps, backend="CPU", kmin_scheme=False)
+
+
 ################################################################################
 # SciKit-Learn tree-based and bruteforce methods
 # -----------------------------------------------------
@@ -831,4 +852,32 @@ run_KNN_benchmark("GloVe25")
 
 run_KNN_benchmark("GloVe100")
 
+
+########################################
+# KeOps on the CPU
+# --------------------------------------------------------
+#
+# Finally, we compare the special implementation of K-min reductions
+# on the CPU with the generic one and with the bruteforce method of SciKit-Learn,
+# on the small dataset of 10k points in dimension 3.
+# The gap between the two KeOps implementations increases with K:
+
+full_benchmark(
+    "K-NN search on the CPU, with the KeOps engine",
+    [
+        (KNN_KeOps_CPU, "KeOps (CPU)", {}),
+        (KNN_KeOps_CPU_generic, "KeOps (CPU, generic K-min reduction)", {}),
+        (KNN_sklearn_brute, "sklearn, bruteforce", {}),
+    ],
+    generate_samples("R^D a"),
+    min_time=1e-4,
+    max_time=10,
+    loops=[1],
+    problem_sizes=Ks,
+    xlabel="Number of neighbours K",
+    frequency=True,
+    ylabel="Queries per second (Hz = 1/s)",
+    legend_location="upper right",
+)
+
 plt.show()
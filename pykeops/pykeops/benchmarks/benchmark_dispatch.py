@@ -0,0 +1,102 @@
+"""
+Per-call overhead of LazyTensor reductions
+=========================================
+
+Iterative algorithms (K-means, Sinkhorn, conjugate gradients...) perform the
+same KeOps reductions on new tensors with the same shapes, over and over again.
+The formulas and the routines of these reductions are stored in a cache
+indexed by their structure, so that the calls which follow the first one
+go straight to the compiled routine.
+
+We measure the time per call of small reductions, whose run time is
+dominated by the Python overhead, with and without this cache.
+"""
+
+##############################################
+# Setup
+# ---------------------
+
+import time
+
+import numpy as np
+
+from pykeops.common.lazy_tensor import GenericLazyTensor
+
+nruns = 1000
+
+
+def kmeans_step(LazyTensor, x, c):
+    # assignment step of the K-means algorithm
+    x_i = LazyTensor(x[:, None, :])
+    c_j = LazyTensor(c[None, :, :])
+    return ((x_i - c_j) ** 2).sum(-1).argmin(dim=1)
+
+
+def gaussian_conv(LazyTensor, x, b):
+    # Gaussian kernel product, as in a conjugate gradient or Sinkhorn loop
+    x_i = LazyTensor(x[:, None, :])
+    x_j = LazyTensor(x[None, :, :])
+    b_j = LazyTensor(b[None, :, :])
+    return ((-((x_i - x_j) ** 2).sum(-1)).exp() * b_j).sum(dim=1)
+
+
+def prebuilt_reduction(LazyTensor, x, c):
+    # the symbolic expression is built once, and only the reduction is timed
+    D_ij = ((LazyTensor(x[:, None, :]) - LazyTensor(c[None, :, :])) ** 2).sum(-1)
+    return lambda: D_ij.argmin(dim=1)
+
+
+def time_per_call(fun, args, use_cache):
+    # returns the median time per call of fun(*args), in microseconds
+    fun(*args)  # compilation of the formula
+    times = []
+    for _ in range(nruns):
+        if not use_cache:
+            GenericLazyTensor.dispatch_cache.clear()
+        start = time.perf_counter()
+        fun(*args)
+        times.append(time.perf_counter() - start)
+    return 1e6 * np.median(times)
+
+
+def bindings():
+    # the (name, LazyTensor class, array constructor) of the available bindings
+    from pykeops.numpy import LazyTensor as LazyTensor_np
+
+    res = [("numpy", LazyTensor_np, lambda x: x)]
+    try:
+        import torch
+        from pykeops.torch import LazyTensor as LazyTensor_torch
+
+        res.append(("torch", LazyTensor_torch, torch.from_numpy))
+    except ImportError:
+        pass
+    return res
+
+
+##############################################
+# Benchmark
+# ---------------------
+
+if __name__ == "__main__":
+    x = np.random.rand(100, 3).astype("float32")
+    c = np.random.rand(10, 3).astype("float32")
+    b = np.random.rand(100, 1).astype("float32")
+    for name, LazyTensor, array in bindings():
+        for fun, args in [
+            (kmeans_step, (array(x), array(c))),
+            (gaussian_conv, (array(x), array(b))),
+        ]:
+            t_nocache = time_per_call(fun, (LazyTensor,) + args, False)
+            t_cache = time_per_call(fun, (LazyTensor,) + args, True)
+            print(
+                f"{name:>6} {fun.__name__:>18} : {t_nocache:8.1f} us without cache, "
+                f"{t_cache:8.1f} us with cache"
+            )
+        reduction = prebuilt_reduction(LazyTensor, array(x), array(c))
+        t_nocache = time_per_call(reduction, (), False)
+        t_cache = time_per_call(reduction, (), True)
+        print(
+            f"{name:>6} {'reduction only':>18} : {t_nocache:8.1f} us without cache, "
+            f"{t_cache:8.1f} us with cache"
+        )
@@ -0,0 +1,70 @@
+"""
+Import time
+=========================================
+
+We measure the time needed to import the KeOps modules in a fresh
+Python interpreter. Importing :mod:`pykeops` does not probe the
+system for Cuda or OpenMP libraries, and does not import NumPy or PyTorch
+bindings that are not used: this is done on the first call to a KeOps routine.
+The time of this first call (with an already compiled formula) is reported too.
+"""
+
+##############################################
+# Setup
+# ---------------------
+#
+# Each measurement is done in a new subprocess, so that
+# no module is already loaded:
+
+import subprocess
+import sys
+
+import numpy as np
+
+nruns = 5
+
+statements = {
+    "import keopscore": "import keopscore",
+    "import pykeops": "import pykeops",
+    "import pykeops.numpy": "import pykeops.numpy",
+    "import pykeops.torch": "import pykeops.torch",
+    "first Genred call": """
+import numpy as np
+import pykeops.numpy as pknp
+x = np.random.rand(10, 3)
+start = time.perf_counter()
+pknp.Genred("SqDist(x,y)", ["x = Vi(3)", "y = Vj(3)"], axis=1)(x, x)
+""",
+}
+
+
+def run(statement):
+    # returns the time in seconds taken by statement in a new interpreter
+    script = f"""
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+    out = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.split()[-1])
+
+
+##############################################
+# Benchmark
+# ---------------------
+#
+# We first run each statement once, e.g. to compile the formula
+# of the Genred call, and then report the median of a few runs:
+
+if __name__ == "__main__":
+    for name, statement in statements.items():
+        try:
+            run(statement)
+        except subprocess.CalledProcessError:
+            print(f"{name:>25} : not available")
+            continue
+        times = [run(statement) for _ in range(nruns)]
+        print(f"{name:>25} : {1000 * np.median(times):8.1f} ms")
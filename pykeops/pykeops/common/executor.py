@@ -0,0 +1,20 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# thread pool of the asynchronous KeOps calls, created on first use
+executor = None
+executor_lock = threading.Lock()
+
+
+def submit(fun, *args, **kwargs):
+    r"""
+    Schedules the call ``fun(*args, **kwargs)`` in the thread pool of pykeops, and returns
+    a :class:`concurrent.futures.Future` of its output. KeOps routines release the GIL
+    during the computations, so that several reductions, and other Python threads,
+    run concurrently.
+    """
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(thread_name_prefix="pykeops")
+    return executor.submit(fun, *args, **kwargs)
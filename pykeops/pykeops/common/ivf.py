@@ -0,0 +1,161 @@
+class GenericIVF:
+    r"""Inverted file (IVF) index for approximate K-nearest neighbors search.
+
+    The points of the dataset are partitioned in clusters with the K-means algorithm,
+    and sorted so that the clusters are stored contiguously in memory.
+    Queries are assigned to their closest centroid, and compared only with the points
+    of the **nprobe** clusters whose centroids are the closest to this centroid:
+    the search is performed by a single block-sparse KeOps reduction
+    (see the **ranges** argument of :class:`Genred <pykeops.torch.Genred>`).
+
+    This class is not meant to be used directly: use
+    :class:`pykeops.numpy.knn.IVF` or :class:`pykeops.torch.knn.IVF` instead.
+    """
+
+    metrics = ["euclidean", "manhattan", "angular"]
+
+    def __init__(self, metric="euclidean"):
+        if not callable(metric) and metric not in self.metrics:
+            raise ValueError(
+                f"Unknown metric '{metric}' for IVF index: it should be one of "
+                f"{self.metrics}, or a function of two LazyTensors."
+            )
+        self.metric = metric
+        self.centroids = None
+
+    def distance(self, x_i, y_j):
+        r"""Returns the symbolic matrix of distances between LazyTensors **x_i** and **y_j**."""
+        if callable(self.metric):
+            return self.metric(x_i, y_j)
+        elif self.metric == "euclidean":
+            return ((x_i - y_j) ** 2).sum(-1)
+        elif self.metric == "manhattan":
+            return (x_i - y_j).abs().sum(-1)
+        elif self.metric == "angular":
+            return -(x_i | y_j)
+
+    def _check_fitted(self):
+        if self.centroids is None:
+            raise ValueError("The IVF index must be fitted before being used.")
+
+    def _assign(self, x, c, backend):
+        # returns the label of the closest centroid c_j for each point x_i
+        x_i = self.LazyTensor(x[:, None, :])
+        c_j = self.LazyTensor(c[None, :, :])
+        labels = self.distance(x_i, c_j).argmin(dim=1, backend=backend)
+        return self.tools.long(self.tools.view(labels, (-1,)))
+
+    def _kmeans(self, x, clusters, Niter, backend):
+        # Lloyd's algorithm, initialized with randomly chosen points ;
+        # empty clusters keep their previous centroid.
+        c = x[self._random_indices(x.shape[0], clusters)]
+        for _ in range(Niter):
+            labels = self._assign(x, c, backend)
+            c = self._update_centroids(x, labels, c)
+            if self.metric == "angular":
+                c = self._normalize(c)
+        return c
+
+    def fit(self, x, clusters=50, Niter=10, backend="auto"):
+        r"""Builds the index for the dataset **x**.
+
+        Args:
+            x ((N,D) array): The points :math:`x_i \in \mathbb{R}^D` of the dataset.
+
+        Keyword Args:
+            clusters (int, default=50): The number :math:`C` of clusters of the partition.
+                A reasonable default is :math:`C \simeq \sqrt{N}`.
+            Niter (int, default=10): The number of iterations of the K-means algorithm.
+            backend (string, default="auto"): The backend of the KeOps reductions.
+
+        Returns:
+            The fitted index.
+        """
+        if len(x.shape) != 2:
+            raise ValueError("The dataset of an IVF index should be a 2d array.")
+        if not 0 < clusters <= x.shape[0]:
+            raise ValueError(
+                f"The number of clusters ({clusters}) should be between 1 and the number of points ({x.shape[0]})."
+            )
+        x = self.tools.contiguous(x)
+        self.centroids = self._kmeans(x, clusters, Niter, backend)
+        labels = self._assign(x, self.centroids, backend)
+        labels, self.perm = self._sort(labels)
+        self.x = self.tools.contiguous(x[self.perm])
+        self.ranges = self._ranges(labels, clusters)
+        return self
+
+    def kneighbors(self, q, K=5, nprobe=1, return_distance=False, backend="auto"):
+        r"""Finds the approximate **K** nearest neighbors of the queries **q** in the dataset.
+
+        Args:
+            q ((M,D) array): The query points :math:`q_i \in \mathbb{R}^D`.
+
+        Keyword Args:
+            K (int, default=5): The number of neighbors.
+            nprobe (int, default=1): The number of clusters which are compared with each query.
+            return_distance (bool, default=False): If True, the distances to the neighbors
+                are returned too.
+            backend (string, default="auto"): The backend of the KeOps reductions.
+
+        Returns:
+            (M,K) integer array (and (M,K) array if **return_distance** is True):
+            the indices of the neighbors in the dataset (and their distances), sorted by
+            increasing distance. If the clusters which are compared with a query have less
+            than **K** points, the missing indices are set to -1, and their distances to
+            infinity.
+        """
+        self._check_fitted()
+        clusters = self.centroids.shape[0]
+        if not 0 < nprobe <= clusters:
+            raise ValueError(
+                f"nprobe ({nprobe}) should be between 1 and the number of clusters ({clusters})."
+            )
+        q = self.tools.contiguous(q)
+
+        # the queries are sorted according to their closest centroid
+        q_labels, q_perm = self._sort(self._assign(q, self.centroids, backend))
+        q = self.tools.contiguous(q[q_perm])
+        q_ranges = self._ranges(q_labels, clusters)
+
+        # each cluster of queries is compared with the nprobe closest clusters of points
+        c_i = self.LazyTensor(self.centroids[:, None, :])
+        c_j = self.LazyTensor(self.centroids[None, :, :])
+        probes = self.distance(c_i, c_j).argKmin(nprobe, dim=1, backend=backend)
+        keep = self._keep_matrix(self.tools.long(probes), clusters)
+        ranges = self.from_matrix(q_ranges, self.ranges, keep)
+
+        q_i = self.LazyTensor(q[:, None, :])
+        x_j = self.LazyTensor(self.x[None, :, :])
+        dist, ind = self.distance(q_i, x_j).Kmin_argKmin(
+            K, dim=1, ranges=ranges, backend=backend
+        )
+        ind = self.tools.long(ind)
+        missing = dist == float("inf")
+        ind = self.perm[ind]
+        ind[missing] = -1
+
+        ind = self._unsort(ind, q_perm)
+        if return_distance:
+            return self._unsort(dist, q_perm), ind
+        return ind
+
+    def _state(self):
+        # the arrays which describe a fitted index
+        if callable(self.metric):
+            raise ValueError("IVF indices with a custom metric cannot be saved.")
+        self._check_fitted()
+        return {
+            "metric": self.metric,
+            "centroids": self.centroids,
+            "x": self.x,
+            "perm": self.perm,
+            "ranges": self.ranges,
+        }
+
+    def _set_state(self, state):
+        self.centroids = state["centroids"]
+        self.x = state["x"]
+        self.perm = state["perm"]
+        self.ranges = state["ranges"]
+        return self
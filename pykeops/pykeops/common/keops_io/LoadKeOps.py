@@ -5,6 +5,7 @@ import numpy as np
 
 from keopscore.get_keops_dll import get_keops_dll
 from pykeops.common.parse_type import parse_dtype_acc
+from pykeops.common.strides import row_strides
 
 
 class LoadKeOps:
@@ -70,13 +71,23 @@ class LoadKeOps:
         self.params.red_formula_string = formula
         self.params.dtype = dtype
         dtype_acc = optional_flags["dtype_acc"]
-        dtype_acc = parse_dtype_acc(dtype_acc, dtype)
+        if tagCPUGPU == 0 and dtype in ("float16", "bfloat16"):
+            # in Cpu mode, float16 and bfloat16 data is converted to float32 when it is
+            # loaded, and the reductions are accumulated in float32 (or float64).
+            dtype_acc = parse_dtype_acc(
+                "float32" if dtype_acc == "auto" else dtype_acc, "float32"
+            )
+        else:
+            dtype_acc = parse_dtype_acc(dtype_acc, dtype)
 
         self.params.c_dtype_acc = dtype_acc
         self.params.sum_scheme = optional_flags["sum_scheme"]
         self.params.enable_chunks = optional_flags["enable_chunks"]
         self.params.enable_final_chunks = -1
         self.params.mult_var_highdim = optional_flags["multVar_highdim"]
+        self.params.use_int64_index = optional_flags["use_int64_index"]
+        self.params.use_strides = optional_flags["use_strides"]
+        self.params.use_tiles = optional_flags["use_tiles"]
         self.params.tagHostDevice = tagHostDevice
 
         if dtype == "float32":
@@ -85,9 +96,15 @@ class LoadKeOps:
         elif dtype == "float64":
             self.params.c_dtype = "double"
             self.params.use_half = False
+        elif dtype == "float16" and tagCPUGPU == 0:
+            self.params.c_dtype = "half"
+            self.params.use_half = False
         elif dtype == "float16":
             self.params.c_dtype = "half2"
             self.params.use_half = True
+        elif dtype == "bfloat16" and tagCPUGPU == 0:
+            self.params.c_dtype = "bfloat16"
+            self.params.use_half = False
         else:
             raise ValueError("not implemented")
 
@@ -95,7 +112,17 @@ class LoadKeOps:
             self.params.c_dtype_acc = self.params.c_dtype
 
         if tagCPUGPU == 0:
-            map_reduce_id = "CpuReduc"
+            # dense Cpu reductions use the cache-blocked map-reduce scheme for large data
+            # (see pykeops.common.parse_type.use_tiles) ; it is also the only dense scheme
+            # which reads 16 bits data and strided arrays.
+            use_tiles = (
+                self.params.use_tiles
+                or self.params.c_dtype in ("half", "bfloat16")
+                or self.params.use_strides
+            )
+            map_reduce_id = (
+                "CpuReduc_tiled" if use_tiles and not use_ranges else "CpuReduc"
+            )
         else:
             map_reduce_id = "GpuReduc"
             map_reduce_id += "1D" if tag1D2D == 0 else "2D"
@@ -115,6 +142,7 @@ class LoadKeOps:
             self.params.tag1D2D,
             self.params.dimred,
             self.params.dim,
+            self.params.dimind,
             self.params.dimy,
             indsi,
             indsj,
@@ -138,6 +166,8 @@ class LoadKeOps:
             tag1D2D,
             self.params.use_half,
             device_id_request,
+            self.params.use_int64_index,
+            self.params.use_strides,
         )
 
         # now we switch indsi, indsj and dimsx, dimsy in case tagI=1.
@@ -188,28 +218,41 @@ class LoadKeOps:
                 args, self.params.aliases_old, self.params.axis, ranges, nx, ny
             )
 
+        # N.B. the pointers and shapes of a call are local variables, so that a routine
+        # may be called concurrently from several threads.
+
         # get ranges argument
         if not ranges:
-            self.ranges_ptr_new = self.empty_ranges_new
+            ranges_ptr = self.empty_ranges_new
         else:
             ranges_shapes = self.tools.array(
                 [r.shape[0] for r in ranges], dtype="int32", device="cpu"
             )
             ranges = [*ranges, ranges_shapes]
-            self.ranges_ptr_new = tuple([self.tools.get_pointer(r) for r in ranges])
+            ranges_ptr = tuple([self.tools.get_pointer(r) for r in ranges])
 
-        self.args_ptr_new = tuple([self.tools.get_pointer(arg) for arg in args])
+        args_ptr = tuple([self.tools.get_pointer(arg) for arg in args])
 
         # get all shapes of arguments
-        self.argshapes_new = tuple([arg.shape for arg in args])
+        argshapes = tuple([arg.shape for arg in args])
+
+        # strided arrays are read in place by the Cpu routines compiled with use_strides
+        if self.params.use_strides:
+            argstrides = tuple(
+                row_strides(arg.shape, self.tools.strides(arg)) for arg in args
+            )
+        else:
+            argstrides = None
 
-        # initialize output array
+        # initialize output array ; if dimind>0, the indices computed by the reduction
+        # are written in a second output array of integers (see keopscore.get_keops_dll)
 
         M = nx if self.params.tagI == 0 else ny
 
         if self.params.use_half:
             M += M % 2
 
+        dimind = self.params.dimind
         if nbatchdims:
             batchdims_shapes = []
             for arg in args:
@@ -217,29 +260,105 @@ class LoadKeOps:
             tmp = reduce(
                 np.maximum, batchdims_shapes
             )  # this is faster than np.max(..., axis=0)
-            shapeout = tuple(tmp) + (M, self.params.dim)
+            batchdims = tuple(tmp)
+        else:
+            batchdims = ()
+        shapeout = batchdims + (M, self.params.dim - dimind)
+
+        storage_out = None
+        if self.params.c_dtype in ("half", "bfloat16"):
+            # the Cpu routines convert 16 bits data to float32, and write their output
+            # in float32 ; it is cast to the dtype of the inputs after post-processing
+            # (see pykeops.common.operations.postprocess), or copied in the output
+            # array if one is given.
+            storage_out, out = out, None
+            out_dtype = self.tools.float32
         else:
-            shapeout = (M, self.params.dim)
+            out_dtype = args[0].dtype
+            if dimind:
+                # the output array given by the user is filled after the call (see fill_out)
+                storage_out, out = out, None
 
         if out is None:
-            out = self.tools.empty(shapeout, dtype=args[0].dtype, device=device_args)
-        self.out_ptr = self.tools.get_pointer(out)
-
-        self.outshape = out.shape
-
-        self.call_keops(nx, ny)
+            out = self.tools.empty(shapeout, dtype=out_dtype, device=device_args)
+        out_ptr = self.tools.get_pointer(out)
+
+        if dimind:
+            shapeind = batchdims + (M, dimind)
+            if (
+                storage_out is not None
+                and dimind == self.params.dim
+                and storage_out.dtype == self.tools.int64
+                and tuple(storage_out.shape) == shapeind
+            ):
+                # the int64 output array of an ArgMin, ArgMax or ArgKMin reduction
+                # directly receives the indices
+                outind, storage_out = storage_out, None
+            else:
+                outind = self.tools.empty_long(shapeind, device=device_args)
+            outind_ptr = self.tools.get_pointer(outind)
+        else:
+            outind_ptr = 0
+
+        self.call_keops(
+            nx,
+            ny,
+            ranges_ptr,
+            out.shape,
+            out_ptr,
+            outind_ptr,
+            args_ptr,
+            argshapes,
+            argstrides,
+        )
 
-        if self.params.dtype == "float16":
+        if self.params.use_half:
             from pykeops.torch.half2_convert import postprocess_half2
 
             out = postprocess_half2(out, tag_dummy, self.params.reduction_op, N)
 
+        if storage_out is not None and dimind:
+            self.fill_out(storage_out, out, outind)
+        elif storage_out is not None:
+            storage_out[...] = out
+            out = storage_out
+
+        if dimind:
+            return out, outind
         return out
 
+    def fill_out(self, out, vals, inds):
+        # Copies the values and indices computed by a reduction with dimind>0 in the output
+        # array given by the user, with the layout of the outputs of the Gpu routines where
+        # indices are cast to the dtype of the array (see pykeops.common.operations.postprocess):
+        # indices only for ArgMin, ArgMax and ArgKMin, (values,indices) pairs for Min_ArgMin
+        # and Max_ArgMax, and K such pairs for KMin_ArgKMin.
+        if vals.shape[-1] == 0:
+            out[...] = inds
+            return
+        if self.params.reduction_op == "KMin_ArgKMin_Reduction":
+            K = int(self.params.red_formula_string.rsplit(",", 2)[1])
+        else:
+            K = 1
+        tmp = self.tools.view(out, tuple(out.shape[:-1]) + (K, 2, -1))
+        tmp[..., 0, :] = self.tools.view(vals, tuple(vals.shape[:-1]) + (K, -1))
+        tmp[..., 1, :] = self.tools.view(inds, tuple(inds.shape[:-1]) + (K, -1))
+
     genred_pytorch = genred
     genred_numpy = genred
 
-    def call_keops(self):
+    def call_keops(
+        self,
+        nx,
+        ny,
+        ranges_ptr,
+        outshape,
+        out_ptr,
+        outind_ptr,
+        args_ptr,
+        argshapes,
+        argstrides,
+    ):
         pass
 
     def import_module(self):
@@ -1,192 +1,152 @@
 import os
-import sysconfig
+from ctypes import CDLL, POINTER, c_int, c_int64, c_void_p
 
-import keopscore.config.config
 from keopscore.config.config import get_build_folder
 from keopscore.utils.Cache import Cache_partial
 from pykeops.common.keops_io.LoadKeOps import LoadKeOps
-from pykeops.common.utils import pyKeOps_Message
-from keopscore.utils.misc_utils import KeOps_OS_Run
-from pykeops.config import pykeops_cpp_name, python_includes
+from pykeops.common.parse_type import max_int32_size
+from pykeops.common.threads import get_num_threads
 
 
-class LoadKeOps_cpp_class(LoadKeOps):
-    def __init__(self, *args, fast_init=False):
-        super().__init__(*args, fast_init=fast_init)
+def c_int_array(values):
+    return (c_int * len(values))(*values)
 
-    def init_phase1(self):
-        srcname = pykeops_cpp_name(tag=self.params.tag, extension=".cpp")
 
-        dllname = pykeops_cpp_name(
-            tag=self.params.tag, extension=sysconfig.get_config_var("EXT_SUFFIX")
-        )
+class LaunchPlan:
+    """
+    Arguments of the launch_keops_cpu function for inputs of given shapes and strides.
+    All the arguments which do not depend on the data (indices and dimensions of
+    the variables, sizes, shapes and strides of the inputs and of the output) are converted
+    once and for all to C integers and arrays, so that a call only converts the
+    pointers to the data.
+    """
 
-        if not os.path.exists(dllname):
-            f = open(srcname, "w")
-            f.write(self.get_pybind11_code())
-            f.close()
-            compile_command = f"{keopscore.config.config.cxx_compiler} {keopscore.config.config.cpp_flags} {python_includes} {srcname} -o {dllname}"
-            pyKeOps_Message(
-                "Compiling pykeops cpp " + self.params.tag + " module ... ",
-                flush=True,
-                end="",
+    def __init__(self, launch, params, nx, ny, outshape, argshapes, argstrides):
+        if max(nx, ny) > max_int32_size:
+            # the numbers of rows are passed to the routines as 32 bits integers
+            raise ValueError(
+                f"[KeOps] The Cpu routines support at most {max_int32_size} rows, got {max(nx, ny)}."
             )
-            KeOps_OS_Run(compile_command)
-            pyKeOps_Message("OK", use_tag=False, flush=True)
-
-    def init_phase2(self):
-        import importlib
-
-        mylib = importlib.import_module(
-            os.path.basename(pykeops_cpp_name(tag=self.params.tag))
+        self.launch = launch
+        nargs = len(argshapes)
+        self.nargs = nargs
+        self.args_type = c_void_p * nargs
+        self.ranges_type = c_void_p * 7
+        # the arrays of the shapes of the arguments are referenced by argshapes_ptr,
+        # so that they must be kept alive as long as the plan.
+        self.argshapes = [c_int_array(shape) for shape in argshapes]
+        self.head = (
+            c_int(params.dimy),
+            c_int(nx),
+            c_int(ny),
+            c_int(params.tagI),
+            c_int(params.tagZero),
+            c_int(params.use_half),
+            c_int(params.dimred),
+            c_int(params.use_chunk_mode),
+            c_int(len(params.indsi)),
+            c_int_array(params.indsi),
+            c_int(len(params.indsj)),
+            c_int_array(params.indsj),
+            c_int(len(params.indsp)),
+            c_int_array(params.indsp),
+            c_int(params.dim),
+            c_int_array(params.dimsx),
+            c_int_array(params.dimsy),
+            c_int_array(params.dimsp),
+        )
+        self.shapeout = (c_int(len(outshape)), c_int_array(outshape))
+        # (row, column) strides of the arguments, for the routines compiled with use_strides
+        if argstrides is None:
+            self.argstrides = None
+        else:
+            self.argstrides = (c_int64 * (2 * nargs))(
+                *[stride for strides in argstrides for stride in strides]
+            )
+        self.tail = (
+            c_int_array([len(shape) for shape in argshapes]),
+            (POINTER(c_int) * nargs)(*self.argshapes),
         )
 
-        self.launch_keops_cpu = mylib.launch_pykeops_cpu
-
-    def call_keops(self, nx, ny):
-        self.launch_keops_cpu(
-            self.params.dimy,
-            nx,
-            ny,
-            self.params.tagI,
-            self.params.tagZero,
-            self.params.use_half,
-            self.params.dimred,
-            self.params.use_chunk_mode,
-            self.params.indsi,
-            self.params.indsj,
-            self.params.indsp,
-            self.params.dim,
-            self.params.dimsx,
-            self.params.dimsy,
-            self.params.dimsp,
-            self.ranges_ptr_new,
-            self.outshape,
-            self.out_ptr,
-            self.args_ptr_new,
-            self.argshapes_new,
+    def __call__(self, num_threads, ranges_ptr, out_ptr, outind_ptr, args_ptr):
+        return self.launch(
+            num_threads,
+            *self.head,
+            self.ranges_type(*ranges_ptr),
+            *self.shapeout,
+            out_ptr,
+            outind_ptr,
+            self.nargs,
+            self.args_type(*args_ptr),
+            self.argstrides,
+            *self.tail,
         )
 
-    def get_pybind11_code(self):
-        return f"""
-#include "{self.params.source_name}"
-
-#include <pybind11/pybind11.h>
-namespace py = pybind11;
-
-template < typename TYPE >
-int launch_pykeops_{self.params.tag}_cpu(int dimY, int nx, int ny,
-                                         int tagI, int tagZero, int use_half,
-                                         int dimred,
-                                         int use_chunk_mode,
-                                         py::tuple py_indsi, py::tuple py_indsj, py::tuple py_indsp,
-                                         int dimout,
-                                         py::tuple py_dimsx, py::tuple py_dimsy, py::tuple py_dimsp,
-                                         py::tuple py_ranges,
-                                         py::tuple py_shapeout,
-                                         long out_void,
-                                         py::tuple py_arg,
-                                         py::tuple py_argshape){{
-
-    /*------------------------------------*/
-    /*         Cast input args            */
-    /*------------------------------------*/
-
-    std::vector< int > indsi_v(py_indsi.size());
-    for (auto i = 0; i < py_indsi.size(); i++)
-        indsi_v[i] = py::cast< int >(py_indsi[i]);
-
-
-    std::vector< int > indsj_v(py_indsj.size());
-    for (auto i = 0; i < py_indsj.size(); i++)
-        indsj_v[i] = py::cast< int >(py_indsj[i]);
-
-
-    std::vector< int > indsp_v(py_indsp.size());
-    for (auto i = 0; i < py_indsp.size(); i++)
-        indsp_v[i] = py::cast< int >(py_indsp[i]);
-
-
-    std::vector< int > dimsx_v(py_dimsx.size());
-    for (auto i = 0; i < py_dimsx.size(); i++)
-        dimsx_v[i] = py::cast< int >(py_dimsx[i]);
-
-
-    std::vector< int > dimsy_v(py_dimsy.size());
-    for (auto i = 0; i < py_dimsy.size(); i++)
-        dimsy_v[i] = py::cast< int >(py_dimsy[i]);
-        
-    
-    std::vector< int > dimsp_v(py_dimsp.size());
-    for (auto i = 0; i < py_dimsp.size(); i++)
-        dimsp_v[i] = py::cast< int >(py_dimsp[i]);
-
-
-    // Cast the ranges arrays
-    std::vector< int* > ranges_v(py_ranges.size());
-    for (int i = 0; i < py_ranges.size(); i++)
-        ranges_v[i] = (int*) py::cast< long >(py_ranges[i]);
-    int **ranges = (int**) ranges_v.data();
-    
-    std::vector< int > shapeout_v(py_shapeout.size());
-    for (auto i = 0; i < py_shapeout.size(); i++)
-        shapeout_v[i] = py::cast< int >(py_shapeout[i]);
-    
-    TYPE *out = (TYPE*) out_void;
-    // std::cout << "out_ptr : " << (long) out << std::endl;
-    
-    std::vector< TYPE* > arg_v(py_arg.size());
-    for (int i = 0; i < py_arg.size(); i++)
-        arg_v[i] = (TYPE*) py::cast< long >(py_arg[i]);
-    TYPE **arg = (TYPE**) arg_v.data();
-    
-    std::vector< std::vector< int > > argshape_v(py_argshape.size());
-    for (auto i = 0; i < py_argshape.size(); i++){{
-        py::tuple tmp = py_argshape[i];
-        std::vector< int > tmp_v(tmp.size());
-        for (auto j =0; j < tmp.size(); j++)
-            tmp_v[j] = py::cast< int >(tmp[j]);
-        argshape_v[i] = tmp_v;
-    }}
-
-
-    return launch_keops_cpu_{self.params.tag}< TYPE >(dimY,
-                                                      nx,
-                                                      ny,
-                                                      tagI,
-                                                      tagZero,
-                                                      use_half,
-                                                      dimred,
-                                                      use_chunk_mode,
-                                                      indsi_v,
-                                                      indsj_v,
-                                                      indsp_v,
-                                                      dimout,
-                                                      dimsx_v,
-                                                      dimsy_v,
-                                                      dimsp_v,
-                                                      ranges,
-                                                      shapeout_v,
-                                                      out,
-                                                      arg,
-                                                      argshape_v);
-
-}}
-
-PYBIND11_MODULE(pykeops_cpp_{self.params.tag}, m) {{
-    m.doc() = "pyKeOps: KeOps for pytorch through pybind11 (pytorch flavour).";
-    m.def("launch_pykeops_cpu", &launch_pykeops_{self.params.tag}_cpu < {cpp_dtype[self.params.dtype]} >, "Entry point to keops.");
-}}                     
-            """
+
+class LoadKeOps_cpp_class(LoadKeOps):
+    # maximal number of launch plans of a routine
+    max_launch_plans = 64
+
+    def __init__(self, *args, fast_init=False):
+        super().__init__(*args, fast_init=fast_init)
+
+    def init_phase2(self):
+        # the formula has been compiled by keopscore into a single shared library
+        # (see keopscore.binders.cpp.Cpu_link_compile), that we load with ctypes.
+        # N.B. ctypes releases the GIL during the calls to the functions of a CDLL,
+        # so that other Python threads run while a reduction is computed.
+        mylib = CDLL(self.params.source_name)
+
+        self.launch_keops_cpu = mylib.launch_keops_cpu
+        self.launch_keops_cpu.argtypes = (
+            [c_int] * 9
+            + [c_int, POINTER(c_int)] * 3
+            + [c_int]
+            + [POINTER(c_int)] * 3
+            + [POINTER(c_void_p)]
+            + [c_int, POINTER(c_int)]
+            + [c_void_p, c_void_p]
+            + [c_int, POINTER(c_void_p), POINTER(c_int64)]
+            + [POINTER(c_int), POINTER(POINTER(c_int))]
+        )
+        self.launch_keops_cpu.restype = c_int
+
+        # launch plans, indexed by the sizes and shapes of the inputs and of the output
+        self.launch_plans = {}
+
+    def call_keops(
+        self,
+        nx,
+        ny,
+        ranges_ptr,
+        outshape,
+        out_ptr,
+        outind_ptr,
+        args_ptr,
+        argshapes,
+        argstrides,
+    ):
+        key = (nx, ny, tuple(outshape), argshapes, argstrides)
+        plan = self.launch_plans.get(key)
+        if plan is None:
+            if len(self.launch_plans) >= self.max_launch_plans:
+                self.launch_plans.clear()
+            plan = LaunchPlan(
+                self.launch_keops_cpu,
+                self.params,
+                nx,
+                ny,
+                outshape,
+                argshapes,
+                argstrides,
+            )
+            self.launch_plans[key] = plan
+        plan(get_num_threads(), ranges_ptr, out_ptr, outind_ptr, args_ptr)
 
 
 LoadKeOps_cpp = Cache_partial(
-    LoadKeOps_cpp_class, use_cache_file=True, save_folder=get_build_folder()
+    LoadKeOps_cpp_class,
+    use_cache_file=True,
+    save_folder=get_build_folder(),
+    check_value=lambda params: os.path.exists(params.source_name),
 )
-
-cpp_dtype = {
-    "float": "float",
-    "float32": "float",
-    "double": "double",
-    "float64": "double",
-}
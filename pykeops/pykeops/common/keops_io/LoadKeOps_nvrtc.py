@@ -38,7 +38,18 @@ class LoadKeOps_nvrtc_class(LoadKeOps):
                 self.params.low_level_code_file,
             )
 
-    def call_keops(self, nx, ny):
+    def call_keops(
+        self,
+        nx,
+        ny,
+        ranges_ptr,
+        outshape,
+        out_ptr,
+        outind_ptr,
+        args_ptr,
+        argshapes,
+        argstrides,
+    ):
         self.launch_keops(
             self.params.tagHostDevice,
             self.params.dimy,
@@ -58,11 +69,11 @@ class LoadKeOps_nvrtc_class(LoadKeOps):
             self.params.dimsx,
             self.params.dimsy,
             self.params.dimsp,
-            self.ranges_ptr_new,
-            self.outshape,
-            self.out_ptr,
-            self.args_ptr_new,
-            self.argshapes_new,
+            ranges_ptr,
+            outshape,
+            out_ptr,
+            args_ptr,
+            argshapes,
         )
 
     def import_module(self):
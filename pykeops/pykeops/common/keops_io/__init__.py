@@ -1,13 +1,26 @@
+import os
+
 import keopscore.config
+from . import LoadKeOps_cpp
+
+
+class KeOps_binders(dict):
+    """
+    Dictionary of the available binders, indexed by "cpp" and "nvrtc".
+    The nvrtc binder is loaded on first use, so that importing pykeops
+    does not probe the system for Cuda libraries.
+    """
+
+    def __missing__(self, key):
+        if key == "nvrtc" and keopscore.config.config.use_cuda:
+            import pykeops.config
+            from . import LoadKeOps_nvrtc
 
-if keopscore.config.config.use_cuda:
-    from . import LoadKeOps_nvrtc, LoadKeOps_cpp
+            if not os.path.exists(pykeops.config.pykeops_nvrtc_name(type="target")):
+                LoadKeOps_nvrtc.compile_jit_binary()
+            self[key] = LoadKeOps_nvrtc.LoadKeOps_nvrtc
+            return self[key]
+        raise KeyError(key)
 
-    keops_binder = {
-        "nvrtc": LoadKeOps_nvrtc.LoadKeOps_nvrtc,
-        "cpp": LoadKeOps_cpp.LoadKeOps_cpp,
-    }
-else:
-    from . import LoadKeOps_cpp
 
-    keops_binder = {"cpp": LoadKeOps_cpp.LoadKeOps_cpp}
+keops_binder = KeOps_binders(cpp=LoadKeOps_cpp.LoadKeOps_cpp)
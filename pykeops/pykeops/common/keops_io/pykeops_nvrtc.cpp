@@ -100,6 +100,10 @@ public:
 //            for (auto j : i)
 //                std::cout << j << " " ;
 
+        // the arguments have been converted: the GIL is released during the computation,
+        // so that other Python threads may run.
+        py::gil_scoped_release release;
+
         return KeOps_module< TYPE >::launch_kernel(tagHostDevice,
                                                    dimY,
                                                    nx,
@@ -6,6 +6,7 @@ import math
 import numpy as np
 
 from keopscore.utils.misc_utils import KeOps_Error
+from pykeops.common.executor import submit
 from pykeops.common.utils import check_broadcasting
 
 
@@ -59,9 +60,14 @@ class GenericLazyTensor:
     axis = None
     ranges = None  # Block-sparsity pattern
     backend = None  # "CPU", "GPU", "GPU_2D", etc.
+    asynchronous = False  # if True, calls return futures
     _dtype = None
     is_complex = False
 
+    # Formulas and Genred routines of the reductions, indexed by their structural signature (see set_callfun)
+    dispatch_cache = {}
+    max_dispatch_cache = 1024
+
     def __init__(self, x=None, axis=None):
         r"""Creates a KeOps symbolic variable.
 
@@ -164,6 +170,9 @@ class GenericLazyTensor:
                 self._dtype = self.tools.dtypename(self.tools.dtype(x))
 
         typex = type(x)
+        if isinstance(x, self.tools.arraytype):
+            # e.g. numpy.memmap arrays, which are streamed by Genred
+            typex = self.tools.arraytype
 
         if (
             typex
@@ -270,30 +279,27 @@ class GenericLazyTensor:
         return 0 if len(sv) == 0 else 1 + max(v[0] for v in sv)
 
     def fixvariables(self):
-        r"""If needed, assigns final labels to each variable and pads their batch dimensions prior to a :mod:`Genred()` call."""
-        newvars = ()
+        r"""If needed, assigns final labels to each variable and pads their batch dimensions prior to a :mod:`Genred()` call.
+
+        Returns the list of the pairs ``(k, dims_to_pad)``, where ``k`` is the position of a variable of the
+        formula in the original list of variables, and ``dims_to_pad`` the number of dummy dimensions
+        which are added to it (see :meth:`set_variables`).
+        """
+        plan = []
         if self.formula2 is None:
             self.formula2 = ""  # We don't want to get regexp errors...
-        device = None  # Useful to load lists (and float constants) on the proper device
-        for v in self.variables:
-            device = self.tools.device(v)
-            if device is not None:
-                break
         i = self.new_variable_index()
         # So let's loop over our tensors, and give them labels:
-        for v in self.variables:
+        for k, v in enumerate(self.variables):
             idv = id(v)
-            if type(v) == list and self._dtype is not None:
-                v = self.tools.array(v, self._dtype, device)
 
             # Replace "Var(idv," by "Var(i," and increment 'i' :
             tag = "Var({},".format(idv)
             if tag in self.formula + self.formula2:
                 self.formula = self.formula.replace(tag, "Var({},".format(i))
                 self.formula2 = self.formula2.replace(tag, "Var({},".format(i))
-                if hasattr(
-                    v, "shape"
-                ):  # (because v might still be a Python list of floats)
+                if hasattr(v, "shape") or self._dtype is not None:
+                    # (v might still be a Python list of floats, which is converted to an array if the dtype is known)
                     # here we add dummy dims to v ( i.e. replace v by v[None,..,None,...])
                     # if needed.
                     # First we detect if v is meant to be used as a variable or as a parameter:
@@ -301,11 +307,11 @@ class GenericLazyTensor:
                         r"Var\({},\d+,([012])\)".format(i), self.formula + self.formula2
                     ).group(1)
                     is_variable = 1 if str_cat_v in ("0", "1") else 0
-                    dims_to_pad = self.nbatchdims + 1 + is_variable - len(v.shape)
-                    padded_v = self.tools.view(v, (1,) * dims_to_pad + v.shape)
-                    newvars += (padded_v,)
+                    ndim_v = len(v.shape) if hasattr(v, "shape") else 1
+                    dims_to_pad = self.nbatchdims + 1 + is_variable - ndim_v
+                    plan.append((k, dims_to_pad))
                 else:
-                    newvars += (v,)
+                    plan.append((k, None))
                 if (
                     hasattr(self, "rec_multVar_highdim")
                     and self.rec_multVar_highdim == idv
@@ -323,8 +329,102 @@ class GenericLazyTensor:
         )  # actual "Var" symbols
         if self.formula2 == "":
             self.formula2 = None  # The pre-processing step is now over
+        self.set_variables(plan)
+        return plan
+
+    def set_variables(self, plan):
+        r"""Replaces the list of variables by the variables of the formula, as specified by the output of :meth:`fixvariables`."""
+        device = None  # Useful to load lists (and float constants) on the proper device
+        newvars = ()
+        for k, dims_to_pad in plan:
+            v = self.variables[k]
+            if type(v) == list and self._dtype is not None:
+                if device is None:
+                    for w in self.variables:
+                        device = self.tools.device(w)
+                        if device is not None:
+                            break
+                v = self.tools.array(v, self._dtype, device)
+            if dims_to_pad:
+                v = self.tools.view(v, (1,) * dims_to_pad + v.shape)
+            newvars += (v,)
         self.variables = newvars
 
+    def dispatch_key(self, kwargs_init):
+        r"""Returns the structural signature of a reduction, which does not depend on the values of its variables.
+
+        The signature is made of the formulas, in which the ids of the variables are replaced by their positions in the
+        list of variables, the numbers of dimensions of the variables, and the options of the reduction.
+        """
+        formula, formula2 = self.formula, self.formula2
+        for k, v in enumerate(self.variables):
+            tag, label = "Var({},".format(id(v)), "Var(#{},".format(k)
+            formula = formula.replace(tag, label)
+            if formula2 is not None:
+                formula2 = formula2.replace(tag, label)
+        rec_multVar_highdim = None
+        if self.rec_multVar_highdim is not None:
+            for k, v in enumerate(self.variables):
+                if id(v) == self.rec_multVar_highdim:
+                    rec_multVar_highdim = k
+        ndims = tuple(
+            len(v.shape) if hasattr(v, "shape") else None for v in self.variables
+        )
+        return (
+            type(self),
+            formula,
+            formula2,
+            self.reduction_op,
+            self.axis,
+            self.opt_arg,
+            self.nbatchdims,
+            self._dtype,
+            rec_multVar_highdim,
+            ndims,
+            tuple(sorted((key, repr(val)) for key, val in kwargs_init.items())),
+        )
+
+    def set_callfun(self, kwargs_init):
+        r"""Sets the final labels of the variables and the :mod:`Genred()` routine of a reduction.
+
+        Iterative algorithms (K-means, Sinkhorn, conjugate gradients...) usually perform the same reductions
+        on new tensors with the same shapes, over and over again. The labels and routines are thus stored in a cache,
+        indexed by the :meth:`dispatch_key` of the reduction, so that later calls do not process the formulas again.
+        """
+        key = self.dispatch_key(kwargs_init)
+        entry = GenericLazyTensor.dispatch_cache.get(key)
+        if entry is None:
+            # Turn the "id(x)" numbers into consecutive labels:
+            plan = self.fixvariables()
+            self.callfun = self.Genred(
+                self.formula,
+                [],
+                reduction_op=self.reduction_op,
+                axis=self.axis,
+                opt_arg=self.opt_arg,
+                formula2=self.formula2,
+                **kwargs_init,
+                rec_multVar_highdim=self.rec_multVar_highdim,
+            )
+            if len(GenericLazyTensor.dispatch_cache) >= self.max_dispatch_cache:
+                GenericLazyTensor.dispatch_cache.clear()
+            GenericLazyTensor.dispatch_cache[key] = (
+                self.formula,
+                self.formula2,
+                self.rec_multVar_highdim,
+                plan,
+                self.callfun,
+            )
+        else:
+            (
+                self.formula,
+                self.formula2,
+                self.rec_multVar_highdim,
+                plan,
+                self.callfun,
+            ) = entry
+            self.set_variables(plan)
+
     def separate_kwargs(self, kwargs):
         # separating keyword arguments for Genred init vs Genred call...
         # Currently the only four additional optional keyword arguments that are passed to Genred init
@@ -669,6 +769,11 @@ class GenericLazyTensor:
             Otherwise, we simply return a callable :class:`LazyTensor` that may be used
             as a :mod:`pykeops.numpy.Genred` or :mod:`pykeops.torch.Genred` function
             on arbitrary tensor data.
+          asynchronous (bool, default False): If **True**, the reduction is computed in a
+            background thread, and we return a :class:`concurrent.futures.Future`
+            of its output (see the **submit** method of :mod:`Genred <pykeops.torch.Genred>`).
+          num_threads (int, default None): Number of OpenMP threads used by the Cpu backends
+            for this reduction ; if None, we use the value set with :func:`pykeops.set_num_threads`.
           backend (string): Specifies the map-reduce scheme,
             as detailed in the documentation of the :mod:`Genred <pykeops.torch.Genred>` module.
           device_id (int, default=-1): Specifies the GPU that should be used
@@ -731,6 +836,7 @@ class GenericLazyTensor:
         res.reduction_op = reduction_op
         res.axis = axis - self.nbatchdims
         res.opt_arg = opt_arg
+        res.asynchronous = kwargs.pop("asynchronous", False)
 
         kwargs_init, kwargs_call = self.separate_kwargs(kwargs)
 
@@ -743,28 +849,21 @@ class GenericLazyTensor:
                 # the user requires a sum reduction over the opposite index (or any index if V is a parameter):
                 # for example sum_i V_j k(x_i,y_j) = V_j sum_i k(x_i,y_j), so we will use KeOps reduction for the kernel
                 # k(x_i,y_j) only, then multiply the result with V.
-                return (
-                    self.rec_multVar_highdim[0].sum(axis=axis)
-                    * self.rec_multVar_highdim[1].variables[0]
-                )
+                def factorized_sum():
+                    return (
+                        self.rec_multVar_highdim[0].sum(axis=axis)
+                        * self.rec_multVar_highdim[1].variables[0]
+                    )
+
+                return submit(factorized_sum) if res.asynchronous else factorized_sum()
             else:
                 # here we are in the case where we may use the "finalchunk" mode
                 res.rec_multVar_highdim = id(self.rec_multVar_highdim[1].variables[0])
         else:
             res.rec_multVar_highdim = None
         if res._dtype is not None:
-            res.fixvariables()  # Turn the "id(x)" numbers into consecutive labels
             # "res" now becomes a callable object:
-            res.callfun = res.Genred(
-                res.formula,
-                [],
-                reduction_op=res.reduction_op,
-                axis=res.axis,
-                opt_arg=res.opt_arg,
-                formula2=res.formula2,
-                **kwargs_init,
-                rec_multVar_highdim=res.rec_multVar_highdim,
-            )
+            res.set_callfun(kwargs_init)
         if call and len(res.symbolic_variables) == 0 and res._dtype is not None:
             return res()
         else:
@@ -803,6 +902,18 @@ class GenericLazyTensor:
             as detailed in the documentation of the :mod:`Genred <pykeops.torch.Genred>` module.
             If **None** (default), we simply use a **dense Kernel matrix**
             as we loop over all indices :math:`i\in[0,M)` and :math:`j\in[0,N)`.
+          eps (float, default=1e-6): Tolerance of the conjugate gradient solver,
+            which is applied to each column of **other** separately.
+          x0 (array, default=None): Initial guess for the solution, e.g. the solution
+            of a previous, similar system. If **None** (default), the solver starts from zero.
+          callback (function, default=None): Function which is called with a copy of the
+            current solution after each iteration of the solver.
+          stats (dict, default=None): If not **None**, the number of iterations of the solver
+            and the norms of the residuals of the columns at each iteration are stored
+            in ``stats["iterations"]`` and ``stats["residuals"]``.
+          precond (function, default=None): Function which applies the inverse of a symmetric,
+            positive definite preconditioner of the system, e.g. one built
+            with :mod:`pykeops.torch.approx`.
           dtype_acc (string, default ``"auto"``): type for accumulator of reduction, before casting to dtype.
             It improves the accuracy of results in case of large sized data, but is slower.
             Default value "auto" will set this option to the value of dtype. The supported values are:
@@ -900,6 +1011,7 @@ class GenericLazyTensor:
                 "A LazyTensor object may be called only if it corresponds to the output of a reduction operation or solve operation."
             )
 
+        asynchronous = kwargs.pop("asynchronous", self.asynchronous)
         self.kwargs.update(kwargs)
 
         if self.ranges is not None and "ranges" not in self.kwargs:
@@ -948,6 +1060,10 @@ class GenericLazyTensor:
             # we replace by other
             args = (self.other.variables[0],)
 
+        if asynchronous:
+            if self.reduction_op == "Solve":
+                return submit(self.callfun, *args, *self.variables, **self.kwargs)
+            return self.callfun.submit(*args, *self.variables, **self.kwargs)
         return self.callfun(*args, *self.variables, **self.kwargs)
 
     def __str__(self):
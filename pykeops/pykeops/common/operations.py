@@ -30,13 +30,19 @@ def preprocess(reduction_op, formula2):
 
 def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
     tools = get_tools(binding)
+    # In Cpu mode, the indices computed by Arg type reductions are written
+    # in a separate array of integers (see keopscore.get_keops_dll)
+    if isinstance(out, tuple):
+        out, out_ind = out
+    else:
+        out_ind = None
     # Post-processing of the output:
     if reduction_op == "SumSoftMaxWeight" or reduction_op == "SoftMax":
         # we compute sum_j exp(f_ij) g_ij / sum_j exp(f_ij) from sum_j exp(m_i-f_ij) [1,g_ij]
         out = out[..., 2:] / out[..., 1][..., None]
     elif reduction_op == "ArgMin" or reduction_op == "ArgMax":
         # outputs are encoded as floats but correspond to indices, so we cast to integers
-        out = tools.long(out)
+        out = tools.long(out) if out_ind is None else out_ind
     elif (
         reduction_op == "Min_ArgMin"
         or reduction_op == "MinArgMin"
@@ -45,11 +51,14 @@ def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
     ):
         # output is one array of size N x 2D, giving min and argmin value for each dimension.
         # We convert to one array of floats of size NxD giving mins, and one array of size NxD giving argmins (casted to integers)
-        shape_out = out.shape
-        tmp = tools.view(out, shape_out[:-1] + (2, -1))
-        vals = tmp[..., 0, :]
-        indices = tmp[..., 1, :]
-        out = (vals, tools.long(indices))
+        if out_ind is None:
+            shape_out = out.shape
+            tmp = tools.view(out, shape_out[:-1] + (2, -1))
+            vals = tmp[..., 0, :]
+            indices = tools.long(tmp[..., 1, :])
+        else:
+            vals, indices = out, out_ind
+        out = (vals, indices)
     elif reduction_op == "KMin":
         # output is of size N x KD giving K minimal values for each dim. We convert to array of size N x K x D
         shape_out = out.shape
@@ -59,16 +68,23 @@ def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
     elif reduction_op == "ArgKMin":
         # output is of size N x KD giving K minimal values for each dim. We convert to array of size N x K x D
         # and cast to integers
+        out = tools.long(out) if out_ind is None else out_ind
         shape_out = out.shape
-        out = tools.view(tools.long(out), shape_out[:-1] + (opt_arg, -1))
+        out = tools.view(out, shape_out[:-1] + (opt_arg, -1))
         if out.shape[-1] == 1:
             out = out.squeeze(-1)
     elif reduction_op == "KMin_ArgKMin" or reduction_op == "KMinArgKMin":
         # output is of size N x 2KD giving K min and argmin for each dim. We convert to 2 arrays of size N x K x D
         # and cast to integers the second array
         shape_out = out.shape
-        out = tools.view(out, shape_out[:-1] + (opt_arg, 2, -1))
-        out = (out[..., 0, :], tools.long(out[..., 1, :]))
+        if out_ind is None:
+            out = tools.view(out, shape_out[:-1] + (opt_arg, 2, -1))
+            out = (out[..., 0, :], tools.long(out[..., 1, :]))
+        else:
+            out = (
+                tools.view(out, shape_out[:-1] + (opt_arg, -1)),
+                tools.view(out_ind, shape_out[:-1] + (opt_arg, -1)),
+            )
         if out[0].shape[-1] == 1:
             out = (out[0].squeeze(-1), out[1].squeeze(-1))
     elif reduction_op == "LogSumExp":
@@ -77,33 +93,81 @@ def postprocess(out, binding, reduction_op, nout, opt_arg, dtype):
             out = (out[..., 0] + tools.log(out[..., 1]))[..., None]
         else:  # here out.shape[-1]>2, means (m,s) with m scalar and s vectorial
             out = out[..., 0][..., None] + tools.log(out[..., 1:])
+    if dtype in ("float16", "bfloat16"):
+        # in Cpu mode, the outputs of the routines are float32 values (see LoadKeOps.genred),
+        # which are cast to the dtype of the inputs ; indices are left unchanged.
+        out = (
+            tuple(cast_float32(x, dtype, tools) for x in out)
+            if isinstance(out, tuple)
+            else cast_float32(out, dtype, tools)
+        )
     return out
 
 
-def ConjugateGradientSolver(binding, linop, b, eps=1e-6):
+def cast_float32(x, dtype, tools):
+    return tools.astype(x, dtype) if x.dtype == tools.float32 else x
+
+
+def ConjugateGradientSolver(
+    binding, linop, b, eps=1e-6, x0=None, callback=None, stats=None, precond=None
+):
     # Conjugate gradient algorithm to solve linear system of the form
     # Ma=b where linop is a linear operation corresponding
-    # to a symmetric and positive definite matrix
+    # to a symmetric and positive definite matrix.
+    # The columns of b (last axis) are independent right-hand sides, which share the
+    # evaluations of linop but have their own step sizes: each column stops
+    # iterating as soon as its mean squared residual is smaller than eps**2,
+    # and the algorithm stops when all columns have converged.
+    # x0 is an optional initial guess, callback is called with a copy of the current
+    # solution after each iteration, and the number of iterations and the norms
+    # of the residuals of the columns are stored in the dict stats, if given.
+    # precond is an optional linear operation corresponding to the inverse
+    # of a symmetric and positive definite preconditioner of M.
     tools = get_tools(binding)
-    delta = tools.size(b) * eps**2
-    a = 0
-    r = tools.copy(b)
-    nr2 = (r**2).sum()
-    if nr2 < delta:
-        return 0 * r
-    p = tools.copy(r)
+    delta = b.shape[-2] * eps**2
+
+    def colsum(x):
+        # sum over the rows, keeping one value per column
+        return x.sum(-2)[..., None, :]
+
+    if precond is None:
+        precond = tools.copy
+
+    if x0 is None:
+        a = 0 * b
+        r = tools.copy(b)
+    else:
+        a = tools.copy(x0)
+        r = b - linop(a)
+    nr2 = colsum(r**2)
+    if stats is not None:
+        stats["iterations"] = 0
+        stats["residuals"] = [nr2[..., 0, :] ** 0.5]
+    active = nr2 >= delta
+    z = precond(r)
+    rz = colsum(r * z)
+    p = z
     k = 0
-    while True:
+    while active.any():
         Mp = linop(p)
-        alp = nr2 / (p * Mp).sum()
+        # converged columns are frozen, with null step sizes
+        alp = tools.where(active, rz / colsum(p * Mp), 0 * rz)
         a += alp * p
         r -= alp * Mp
-        nr2new = (r**2).sum()
-        if nr2new < delta:
-            break
-        p = r + (nr2new / nr2) * p
-        nr2 = nr2new
+        nr2 = colsum(r**2)
         k += 1
+        if stats is not None:
+            stats["iterations"] = k
+            stats["residuals"].append(nr2[..., 0, :] ** 0.5)
+        if callback is not None:
+            callback(tools.copy(a))
+        active = nr2 >= delta
+        if not active.any():
+            break
+        z = precond(r)
+        rznew = colsum(r * z)
+        p = z + tools.where(active, rznew / rz, 0 * rz) * p
+        rz = rznew
     return a
 
 
@@ -113,30 +177,6 @@ def KernelLinearSolver(
     tools = get_tools(binding)
     dtype = tools.dtype(x)
 
-    def PreconditionedConjugateGradientSolver(linop, b, invprecondop, eps=1e-6):
-        # Preconditioned conjugate gradient algorithm to solve linear system of the form
-        # Ma=b where linop is a linear operation corresponding
-        # to a symmetric and positive definite matrix
-        # invprecondop is linear operation corresponding to the inverse of the preconditioner matrix
-        a = 0
-        r = tools.copy(b)
-        z = invprecondop(r)
-        p = tools.copy(z)
-        rz = (r * z).sum()
-        k = 0
-        while True:
-            alp = rz / (p * linop(p)).sum()
-            a += alp * p
-            r -= alp * linop(p)
-            if (r**2).sum() < eps**2:
-                break
-            z = invprecondop(r)
-            rznew = (r * z).sum()
-            p = z + (rznew / rz) * p
-            rz = rznew
-            k += 1
-        return a
-
     def NystromInversePreconditioner(K, Kspec, x, alpha):
         N, D = x.shape
         m = int(np.sqrt(N))
@@ -219,8 +259,12 @@ def KernelLinearSolver(
 
     if precond:
         invprecondop = NystromInversePreconditioner(K, precondKernel, x, alpha)
-        a = PreconditionedConjugateGradientSolver(KernelLinOp, b, invprecondop, eps)
+        # the preconditioned solver has always stopped when the squared norm of the residual
+        # is smaller than eps**2, while ConjugateGradientSolver compares the mean over the rows
+        # to eps**2 : we rescale eps to keep this absolute stopping criterion.
+        eps = eps / b.shape[-2] ** 0.5
     else:
-        a = ConjugateGradientSolver(binding, KernelLinOp, b, eps=eps)
+        invprecondop = None
+    a = ConjugateGradientSolver(binding, KernelLinOp, b, eps=eps, precond=invprecondop)
 
     return a
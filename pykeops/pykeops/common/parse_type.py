@@ -1,3 +1,4 @@
+import math
 import re
 from collections import OrderedDict
 
@@ -64,6 +65,34 @@ def get_sizes(aliases, *args):
     return nx, ny
 
 
+# largest number of elements of an input array whose rows are addressed with 32 bits integers
+max_int32_size = 2**31 - 1
+
+
+def use_int64_index(args):
+    # returns 1 if one of the input arrays has more than 2^31-1 elements, in which case
+    # the Cpu routines must compute the offsets of the rows with 64 bits integers.
+    return int(any(math.prod(arg.shape) > max_int32_size for arg in args))
+
+
+# size in bytes of the i-indexed or j-indexed variables of a dense Cpu reduction from which
+# the cache-blocked map-reduce scheme CpuReduc_tiled is used
+cpu_tiled_min_size = 2**19
+
+
+def use_tiles(aliases, args):
+    # returns 1 if the i-indexed or the j-indexed variables do not fit in the L2 cache, in which
+    # case reading the reduced variables tile by tile pays off (see keopscore.mapreduce.cpu.CpuReduc_tiled) ;
+    # for smaller data, the plain CpuReduc scheme is faster.
+    sizes = [0, 0, 0]
+    for k, alias in enumerate(aliases):
+        _, cat, _, pos = get_type(alias, position_in_list=k)
+        arg = args[pos]
+        # size of the variable for one batch
+        sizes[cat] += arg.nbytes // max(1, math.prod(arg.shape[:-2]))
+    return int(max(sizes[0], sizes[1]) >= cpu_tiled_min_size)
+
+
 def get_type(type_str, position_in_list=None):
     """
     Get the type of the variable declared in type_str.
@@ -196,6 +225,21 @@ def get_optional_flags(
     else:
         optional_flags["enable_chunks"] = 0
 
+    # 3. Option for 64 bits indexing, which is set for each call from the sizes of
+    # the input arrays (see use_int64_index)
+
+    optional_flags["use_int64_index"] = 0
+
+    # 4. Option for strided input arrays, which is also set for each call
+    # (see pykeops.common.strides)
+
+    optional_flags["use_strides"] = 0
+
+    # 5. Option for the cache-blocked scheme of dense Cpu reductions, which is also set
+    # for each call from the sizes of the input arrays (see use_tiles)
+
+    optional_flags["use_tiles"] = 1
+
     return optional_flags
 
 
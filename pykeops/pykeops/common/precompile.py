@@ -0,0 +1,133 @@
+"""
+Ahead-of-time compilation of a list of pykeops reductions, using a pool of worker processes.
+This is the pykeops counterpart of keopscore.precompile : besides generating the code of the
+formulas, it also compiles the python modules, so that subsequent calls do not compile anything.
+
+Each reduction is described by a dict, with the keys :
+  - "formula", "aliases" (required), "reduction_op", "axis", "opt_arg", "formula2", "dtype_acc",
+    "use_double_acc", "sum_scheme", "enable_chunks", "rec_multVar_highdim" : same as the arguments of Genred,
+  - "dtype" : "float32" (default) or "float64",
+  - "backend" : same as the argument of Genred.__call__, default is "CPU",
+  - "use_ranges" : set to True to compile the block-sparse or batched version (default False),
+  - "device_id" : Gpu device id, default is -1 (automatic setting).
+
+It can be used as a Python function or as a standalone Python script, taking as input
+a json file containing the list of specs :
+  - example (as Python function) :
+      pykeops.precompile([{"formula": "Exp(-SqDist(x,y))*b", "aliases": ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"], "axis": 1}], workers=4)
+  - example (as Python script) :
+      python -m pykeops.common.precompile specs.json --workers 4
+"""
+
+import numpy as np
+
+from keopscore.utils.precompile import precompile as keops_precompile
+from keopscore.utils.precompile import precompile_main
+
+genred_default_spec = {
+    "formula": None,
+    "aliases": None,
+    "reduction_op": "Sum",
+    "axis": 0,
+    "opt_arg": None,
+    "formula2": None,
+    "dtype_acc": "auto",
+    "use_double_acc": False,
+    "sum_scheme": "auto",
+    "enable_chunks": True,
+    "rec_multVar_highdim": False,
+    "dtype": "float32",
+    "backend": "CPU",
+    "use_ranges": False,
+    "device_id": -1,
+}
+
+
+def check_spec(spec):
+    if not isinstance(spec, dict):
+        raise ValueError(f"[pyKeOps] Invalid spec {spec}, should be a dict.")
+    unknown = set(spec.keys()) - set(genred_default_spec.keys())
+    if unknown:
+        raise ValueError(f"[pyKeOps] Invalid keys {sorted(unknown)} in spec {spec}.")
+    res = dict(genred_default_spec, **spec)
+    if res["formula"] is None or res["aliases"] is None:
+        raise ValueError(f"[pyKeOps] Missing formula or aliases in spec {spec}.")
+    return res
+
+
+def _init_worker(build_folder):
+    # workers must use the same build folder as the calling process
+    import pykeops
+
+    pykeops.set_build_folder(build_folder)
+
+
+def _build_genred(spec):
+    import pykeops
+    from pykeops.common.keops_io import keops_binder
+    from pykeops.common.get_options import get_tag_backend
+    from pykeops.numpy import Genred
+
+    spec = check_spec(spec)
+    routine = Genred(
+        spec["formula"],
+        spec["aliases"],
+        reduction_op=spec["reduction_op"],
+        axis=spec["axis"],
+        opt_arg=spec["opt_arg"],
+        formula2=spec["formula2"],
+        dtype_acc=spec["dtype_acc"],
+        use_double_acc=spec["use_double_acc"],
+        sum_scheme=spec["sum_scheme"],
+        enable_chunks=spec["enable_chunks"],
+        rec_multVar_highdim=spec["rec_multVar_highdim"],
+    )
+    # host arrays are assumed when the memory location is not given in the backend
+    tagCPUGPU, tag1D2D, tagHostDevice = get_tag_backend(spec["backend"], (np.empty(0),))
+    device_id = spec["device_id"]
+    if device_id == -1:
+        device_id = pykeops.default_device_id if tagCPUGPU == 1 else -1
+
+    # dense Cpu reductions use the plain or the cache-blocked scheme depending on the
+    # sizes of the inputs (see pykeops.common.parse_type.use_tiles) : both are compiled
+    flags = [routine.optional_flags]
+    if tagCPUGPU == 0 and not spec["use_ranges"]:
+        flags.insert(0, dict(routine.optional_flags, use_tiles=0))
+    for optional_flags in flags:
+        myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
+            tagCPUGPU,
+            tag1D2D,
+            tagHostDevice,
+            spec["use_ranges"],
+            device_id,
+            routine.formula,
+            routine.aliases,
+            len(routine.aliases),
+            spec["dtype"],
+            "numpy",
+            optional_flags,
+        )
+    return myconv.params.tag
+
+
+def precompile(specs, workers=None):
+    """
+    Compiles a list of reductions in parallel, and returns the list of their hash names.
+
+    - specs : list of dicts describing the reductions (see the docstring of this module),
+    - workers : number of worker processes ; if None, uses the number of cpus. If workers=0,
+      reductions are compiled sequentially in the calling process.
+
+    Several processes sharing the same build folder may precompile formulas at the same time :
+    compilations of the same formula are serialized through lock files.
+    """
+    specs = [check_spec(spec) for spec in specs]
+    return keops_precompile(
+        specs, workers=workers, build_function=_build_genred, init_function=_init_worker
+    )
+
+
+if __name__ == "__main__":
+    precompile_main(
+        precompile, description="Precompile pyKeOps reductions in parallel."
+    )
@@ -0,0 +1,157 @@
+from pykeops.common.operations import postprocess
+
+# The outputs of most reductions cannot be merged exactly: e.g. the minimal values
+# are needed to merge the results of two ArgMin reductions, and the maximal values
+# m_i are needed to merge the results of two LogSumExp reductions.
+# Partial results are thus computed with the reduction below, whose output (the "state"
+# of the reduction) keeps all the information needed by the merge.
+state_reductions = {
+    "Sum": "Sum",
+    "Max": "Max",
+    "Min": "Min",
+    "Max_ArgMax": "Max_ArgMax",
+    "MaxArgMax": "Max_ArgMax",
+    "ArgMax": "Max_ArgMax",
+    "Min_ArgMin": "Min_ArgMin",
+    "MinArgMin": "Min_ArgMin",
+    "ArgMin": "Min_ArgMin",
+    "KMin_ArgKMin": "KMin_ArgKMin",
+    "KMinArgKMin": "KMin_ArgKMin",
+    "KMin": "KMin_ArgKMin",
+    "ArgKMin": "KMin_ArgKMin",
+    "Max_SumShiftExp": "Max_SumShiftExp",
+    "Max_SumShiftExpWeight": "Max_SumShiftExpWeight",
+    "LogSumExp": "Max_SumShiftExp",
+    "SumSoftMaxWeight": "Max_SumShiftExpWeight",
+    "SoftMax": "Max_SumShiftExpWeight",
+}
+
+
+def state_reduction(reduction_op, formula2=None):
+    r"""
+    Returns the reduction (and its second formula) which computes the state of
+    the reduction **reduction_op**.
+    """
+    if reduction_op not in state_reductions:
+        raise ValueError(
+            f"The partial results of {reduction_op} reductions cannot be merged. "
+            f"Supported reductions are {list(state_reductions)}."
+        )
+    state_op = state_reductions[reduction_op]
+    if reduction_op in ("SumSoftMaxWeight", "SoftMax") and formula2 is not None:
+        # see pykeops.common.operations.preprocess
+        formula2 = "Concat(IntCst(1)," + formula2 + ")"
+    elif reduction_op == "LogSumExp" and formula2:
+        state_op = "Max_SumShiftExpWeight"
+    return state_op, formula2
+
+
+def get_state(out, state_op, nbatchdims=0):
+    r"""
+    Returns the state of a reduction from the output of a routine with reduction
+    **state_op**.
+
+    States of Min_ArgMin and Max_ArgMax reductions are pairs of (M,D) arrays of values and
+    indices, states of KMin_ArgKMin reductions are pairs of (M,K,D) arrays, and states of
+    other reductions are (M,D) arrays (with leading batch dimensions, if any).
+    """
+    if state_op == "KMin_ArgKMin":
+        vals, inds = out
+        if len(vals.shape) == nbatchdims + 2:
+            # see pykeops.common.operations.postprocess
+            vals, inds = vals[..., None], inds[..., None]
+        return vals, inds
+    return out
+
+
+def shift_state(state, state_op, offset):
+    r"""
+    Shifts the indices of a state by **offset**, e.g. if the reduction was applied
+    on a chunk of the variables which starts at line **offset**.
+    """
+    if offset and state_op in ("Min_ArgMin", "Max_ArgMax", "KMin_ArgKMin"):
+        return state[0], state[1] + offset
+    return state
+
+
+def merge_pair(state_op, a, b, tools):
+    # merges the states a and b of a reduction ; ties are resolved in favor of a,
+    # as in the ReducePair methods of the reductions of keopscore.
+    if state_op == "Sum":
+        return a + b
+    elif state_op == "Max":
+        return tools.where(b > a, b, a)
+    elif state_op == "Min":
+        return tools.where(b < a, b, a)
+    elif state_op in ("Max_ArgMax", "Min_ArgMin"):
+        take = b[0] > a[0] if state_op == "Max_ArgMax" else b[0] < a[0]
+        return tools.where(take, b[0], a[0]), tools.where(take, b[1], a[1])
+    elif state_op == "KMin_ArgKMin":
+        K = a[0].shape[-2]
+        vals = tools.concatenate((a[0], b[0]), -2)
+        inds = tools.concatenate((a[1], b[1]), -2)
+        order = tools.argsort(vals, -2)[..., :K, :]
+        return (
+            tools.take_along_axis(vals, order, -2),
+            tools.take_along_axis(inds, order, -2),
+        )
+    elif state_op in ("Max_SumShiftExp", "Max_SumShiftExpWeight"):
+        # (m,s) + (m',s') = (max(m,m'), exp(m-max(m,m'))*s + exp(m'-max(m,m'))*s')
+        ma, sa, mb, sb = a[..., :1], a[..., 1:], b[..., :1], b[..., 1:]
+        m = tools.where(mb > ma, mb, ma)
+        # empty reductions have m = -inf and s = 0
+        m_finite = tools.where(m == -float("inf"), 0 * sa[..., :1], m)
+        s = tools.exp(ma - m_finite) * sa + tools.exp(mb - m_finite) * sb
+        return tools.concatenate((m, s), -1)
+    raise ValueError(f"States of {state_op} reductions cannot be merged.")
+
+
+def finalize_state(state, reduction_op, binding):
+    r"""
+    Returns the output of the reduction **reduction_op** from its state.
+    """
+    if reduction_op in ("ArgMin", "ArgMax"):
+        return state[1]
+    elif reduction_op in ("KMin", "ArgKMin", "KMin_ArgKMin", "KMinArgKMin"):
+        vals, inds = state
+        if vals.shape[-1] == 1:
+            vals, inds = vals[..., 0], inds[..., 0]
+        if reduction_op == "KMin":
+            return vals
+        elif reduction_op == "ArgKMin":
+            return inds
+        return vals, inds
+    elif reduction_op in ("LogSumExp", "SumSoftMaxWeight", "SoftMax"):
+        return postprocess(state, binding, reduction_op, None, None, None)
+    return state
+
+
+def merge_states(
+    states, reduction_op, tools, binding, offsets=None, return_state=False
+):
+    r"""
+    Merges the states of a reduction computed on several chunks of the reduced
+    variables (see the **return_state** argument of :class:`Genred`), and returns the
+    output of the reduction on the union of the chunks, or its state if **return_state**
+    is True. If given, **offsets** are the positions of the first lines of the chunks,
+    which are added to the indices of Arg type reductions.
+    """
+    state_op, _ = state_reduction(reduction_op)
+    states = list(states)
+    if not states:
+        raise ValueError("merge_states requires at least one state.")
+    if offsets is not None:
+        if len(offsets) != len(states):
+            raise ValueError(
+                f"merge_states received {len(states)} states but {len(offsets)} offsets."
+            )
+        states = [
+            shift_state(state, state_op, offset)
+            for state, offset in zip(states, offsets)
+        ]
+    res = states[0]
+    for state in states[1:]:
+        res = merge_pair(state_op, res, state, tools)
+    if return_state:
+        return res
+    return finalize_state(res, reduction_op, binding)
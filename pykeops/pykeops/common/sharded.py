@@ -0,0 +1,318 @@
+import glob
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pykeops.common.parse_type import get_type
+from pykeops.common.threads import get_num_threads
+from pykeops.common.utils import axis2cat
+
+
+def parse_cpulist(cpulist):
+    # parses a list of cpus such as "0-3,8-11"
+    cpus = []
+    for item in cpulist.strip().split(","):
+        if "-" in item:
+            start, end = item.split("-")
+            cpus += range(int(start), int(end) + 1)
+        elif item:
+            cpus.append(int(item))
+    return cpus
+
+
+def numa_nodes():
+    r"""
+    Returns the lists of the cpus of the NUMA nodes of the machine which are available
+    to the current process.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        available = os.sched_getaffinity(0)
+    else:
+        # the affinity of processes can only be queried on Linux
+        available = set(range(os.cpu_count()))
+    nodes = []
+    for filename in sorted(glob.glob("/sys/devices/system/node/node*/cpulist")):
+        with open(filename) as f:
+            cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in available]
+        if cpus:
+            nodes.append(cpus)
+    return nodes if nodes else [sorted(available)]
+
+
+def init_worker(cpus, num_threads):
+    # pins the worker process to the cpus of its NUMA node ; the number of OpenMP threads
+    # must be set before the KeOps routines (and the OpenMP runtime) are loaded.
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+
+
+# numpy Genred routines of the current process, indexed by their arguments
+routines = {}
+
+
+def get_routine(routine_args):
+    key = repr(routine_args)
+    if key not in routines:
+        from pykeops.numpy import Genred
+
+        formula, aliases, reduction_op, formula2, kwargs = routine_args
+        routines[key] = Genred(
+            formula, aliases, reduction_op=reduction_op, formula2=formula2, **kwargs
+        )
+    return routines[key]
+
+
+def shared_array(desc, shm):
+    name, shape, dtype, offset, strides = desc
+    return np.ndarray(
+        shape, dtype=dtype, buffer=shm.buf, offset=offset, strides=strides
+    )
+
+
+def compute_shard(
+    routine_args, inputs, outputs, shms, positions, start, stop, num_threads
+):
+    args = [shared_array(desc, shm) for desc, shm in zip(inputs, shms)]
+    for pos in positions:
+        args[pos] = args[pos][start:stop]
+    res = get_routine(routine_args)(
+        *args, backend="CPU", num_threads=num_threads if num_threads else None
+    )
+    if not isinstance(res, tuple):
+        res = (res,)
+    for desc, shm, r in zip(outputs, shms[len(inputs) :], res):
+        shared_array(desc, shm)[start:stop] = r
+
+
+def run_shard(routine_args, inputs, outputs, positions, start, stop, num_threads=0):
+    r"""
+    Computes the lines **start** to **stop** of the output of a reduction, in a worker
+    process: inputs and outputs are arrays in shared memory, described by the names of
+    their blocks, their shapes, dtypes, offsets and strides, and **positions** are the positions of the variables which are
+    indexed by the output axis. If **num_threads** is 0, the worker uses the threads of
+    its node.
+    """
+    shms = [shared_memory.SharedMemory(name=desc[0]) for desc in inputs + outputs]
+    try:
+        compute_shard(
+            routine_args, inputs, outputs, shms, positions, start, stop, num_threads
+        )
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+class ShardedPool:
+    r"""
+    A pool of worker processes, which are spread over the NUMA nodes of the machine
+    and pinned to the cpus of their node, one executor per worker.
+    """
+
+    def __init__(self, workers=None):
+        nodes = numa_nodes()
+        if workers is None:
+            workers = len(nodes)
+        context = multiprocessing.get_context("spawn")
+        self.executors = []
+        for k in range(workers):
+            cpus = nodes[k % len(nodes)]
+            # workers which share a node share its cpus
+            shared = len(range(k % len(nodes), workers, len(nodes)))
+            self.executors.append(
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=context,
+                    initializer=init_worker,
+                    initargs=(cpus, max(1, len(cpus) // shared)),
+                )
+            )
+
+    def __len__(self):
+        return len(self.executors)
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.shutdown()
+
+
+pool = None
+pool_workers = None
+
+
+def set_workers(workers=None):
+    r"""
+    Sets the number of worker processes of the ``"CPU_sharded"`` backend ; by default,
+    one worker per NUMA node. The current workers are shut down.
+    """
+    global pool, pool_workers
+    if pool is not None:
+        pool.shutdown()
+    pool, pool_workers = None, workers
+
+
+def get_pool():
+    global pool
+    if pool is None:
+        pool = ShardedPool(pool_workers)
+    return pool
+
+
+# shared memory blocks of the arrays allocated by shared_empty which are alive,
+# indexed by name: (address, size in bytes)
+shared_blocks = {}
+
+
+class SharedBlock:
+    # exposes a shared memory block as a numpy array : the arrays created from it (and
+    # their views) keep it alive, and thus the SharedMemory object which maps the block.
+    def __init__(self, shm, shape, dtype):
+        self.shm = shm
+        buf = np.frombuffer(shm.buf, dtype=np.uint8)
+        self.address = buf.__array_interface__["data"][0]
+        # N.B. no reference to shm.buf is kept, so that shm can be closed by release_block
+        del buf
+        self.__array_interface__ = {
+            "shape": tuple(shape),
+            "typestr": np.dtype(dtype).str,
+            "data": (self.address, False),
+            "version": 3,
+        }
+
+
+def release_block(shm):
+    del shared_blocks[shm.name]
+    shm.close()
+    shm.unlink()
+
+
+def shared_empty(shape, dtype="float32"):
+    r"""
+    Returns a new numpy array of given shape and dtype, without initializing entries, which
+    is allocated in shared memory. The ``"CPU_sharded"`` backend reads such arrays (and their
+    views) in place, and writes its output directly in such an **out** array, while other
+    arrays are copied in shared memory for each call. The memory is released with the array.
+    """
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(
+        create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1)
+    )
+    block = SharedBlock(shm, shape, dtype)
+    shared_blocks[shm.name] = (block.address, shm.size)
+    # the block is released when the last array which uses it is deleted
+    weakref.finalize(block, release_block, shm)
+    return np.asarray(block)
+
+
+def shared_desc(x):
+    # returns the description (name, shape, dtype, offset, strides) of an array which lies
+    # in a shared memory block allocated by shared_empty, or None
+    start = end = x.__array_interface__["data"][0]
+    for n, stride in zip(x.shape, x.strides):
+        if stride < 0:
+            start += (n - 1) * stride
+        else:
+            end += (n - 1) * stride
+    end += x.itemsize
+    for name, (address, size) in shared_blocks.items():
+        if address <= start and end <= address + size:
+            offset = x.__array_interface__["data"][0] - address
+            return (name, x.shape, x.dtype.str, offset, x.strides)
+    return None
+
+
+def to_shared(x):
+    res = shared_empty(x.shape, x.dtype)
+    res[...] = x
+    return res
+
+
+def sharded_reduction(routine_args, axis, args, out=None):
+    r"""
+    Applies a reduction on numpy arrays with the ``"CPU_sharded"`` backend: the output axis
+    is split in contiguous shards, which are computed by the worker processes of the
+    pool with the ``"CPU"`` backend, and write their slices of the output in shared memory.
+    The arrays allocated with :func:`shared_empty` are used in place ; other input arrays
+    are copied once in shared memory, for each call. The output is returned in shared
+    memory, without copy, or written in **out**: directly if it was allocated with
+    :func:`shared_empty`, or with a copy otherwise. **out** is only supported for reductions
+    which return one array, and must have the shape and dtype of the result.
+    **routine_args** are the (formula, aliases, reduction_op, formula2, kwargs) arguments
+    of the :class:`pykeops.numpy.Genred` routine.
+    """
+    if any(len(arg.shape) > 2 for arg in args):
+        raise ValueError("The CPU_sharded backend does not support batch dimensions.")
+    out_cat = axis2cat(axis)
+    positions = []
+    for k, alias in enumerate(get_routine(routine_args).aliases):
+        _, cat, _, pos = get_type(alias, position_in_list=k)
+        if cat == out_cat:
+            positions.append(pos)
+    nout = args[positions[0]].shape[0] if positions else 0
+
+    # the routine is loaded (and compiled if needed) by the main process, and applied on
+    # the first line of the output to get the shapes and dtypes of the outputs.
+    sample = [arg[:1] if pos in positions else arg for pos, arg in enumerate(args)]
+    sample = get_routine(routine_args)(*sample, backend="CPU")
+    is_tuple = isinstance(sample, tuple)
+    if not is_tuple:
+        sample = (sample,)
+    if out is not None and (
+        is_tuple
+        or out.shape != (nout,) + sample[0].shape[1:]
+        or out.dtype != sample[0].dtype
+    ):
+        raise ValueError(
+            "With the CPU_sharded backend, out must be one array with the shape and dtype of the result."
+        )
+    if not positions:
+        res = get_routine(routine_args)(*args, backend="CPU")
+        if out is not None:
+            out[...] = res
+            return out
+        return res
+
+    pool = get_pool()
+    # arrays which are copied in shared memory for this call
+    copies = []
+
+    def desc(x):
+        res = shared_desc(x)
+        if res is None:
+            copies.append(to_shared(x))
+            res = shared_desc(copies[-1])
+        return res
+
+    inputs = [desc(arg) for arg in args]
+    if out is not None and shared_desc(out) is not None:
+        res = (out,)
+    else:
+        res = tuple(shared_empty((nout,) + r.shape[1:], r.dtype) for r in sample)
+    outputs = [shared_desc(r) for r in res]
+
+    bounds = np.linspace(0, nout, len(pool) + 1).astype(int)
+    num_threads = get_num_threads()
+    futures = [
+        executor.submit(
+            run_shard,
+            routine_args,
+            inputs,
+            outputs,
+            positions,
+            start,
+            stop,
+            num_threads,
+        )
+        for executor, start, stop in zip(pool.executors, bounds[:-1], bounds[1:])
+        if stop > start
+    ]
+    for future in futures:
+        future.result()
+    if out is not None and res[0] is not out:
+        out[...] = res[0]
+        res = (out,)
+    return res if is_tuple else res[0]
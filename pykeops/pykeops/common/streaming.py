@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pykeops.common.parse_type import get_type
+from pykeops.common.reduction_state import (
+    get_state,
+    shift_state,
+    merge_pair,
+    finalize_state,
+)
+from pykeops.common.utils import axis2cat
+
+# default size (in bytes) of the chunks of streamed variables
+default_chunk_bytes = 2**27
+
+
+def prefetch(iterator):
+    r"""
+    Iterates over **iterator** in a background thread, one item ahead: the next item
+    (e.g. the next chunk of a memory-mapped file) is loaded while the current one is
+    processed.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, iterator, None)
+        while True:
+            item = future.result()
+            if item is None:
+                return
+            future = executor.submit(next, iterator, None)
+            yield item
+
+
+class StreamedSide:
+    r"""
+    The variables of a category (``Vi`` or ``Vj``) of a streamed reduction, given
+    either as arrays, which are read by chunks of **chunk_size** lines, or as
+    iterables of chunks.
+    """
+
+    def __init__(self, args, positions, chunk_size, tools):
+        self.tools = tools
+        self.positions = positions
+        self.args = [args[pos] for pos in positions]
+        self.is_array = [isinstance(arg, tools.arraytype) for arg in self.args]
+        for arg, is_array in zip(self.args, self.is_array):
+            if is_array and len(arg.shape) != 2:
+                raise ValueError(
+                    "Streamed reductions do not support batch dimensions: "
+                    "Vi and Vj variables should be 2d arrays."
+                )
+        self.iterable = not all(self.is_array)
+        if self.iterable and any(self.is_array):
+            raise ValueError(
+                "The variables of a same category (Vi or Vj) should be given either "
+                "all as arrays or all as iterables of chunks."
+            )
+        if not self.iterable and positions:
+            if chunk_size is None:
+                row_bytes = sum(arg[0].nbytes for arg in self.args) if len(self) else 1
+                chunk_size = max(1, default_chunk_bytes // max(row_bytes, 1))
+            self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.args[0].shape[0]
+
+    def chunks(self):
+        # yields the (offset, chunk) pairs, where chunk is the list of the
+        # contiguous in-memory chunks of the variables
+        if not self.positions:
+            yield 0, []
+        elif self.iterable:
+            offset = 0
+            for chunk in zip(*self.args):
+                chunk = [self.tools.contiguous(x) for x in chunk]
+                n = chunk[0].shape[0]
+                if any(len(x.shape) != 2 or x.shape[0] != n for x in chunk):
+                    raise ValueError(
+                        "Chunks of streamed variables should be 2d arrays with the same number of lines."
+                    )
+                if n == 0:
+                    continue
+                yield offset, chunk
+                offset += n
+        else:
+            # chunks are copied, so that they are actually read (e.g. from a
+            # memory-mapped file) in the prefetching thread
+            for start in range(0, len(self), self.chunk_size):
+                stop = start + self.chunk_size
+                yield start, [
+                    self.tools.contiguous(self.tools.copy(x[start:stop]))
+                    for x in self.args
+                ]
+
+
+def stream_reduction(
+    routine, args, chunk_size, backend, device_id, tools, binding, return_state=False
+):
+    r"""
+    Applies the reduction **routine** (a :class:`Genred` object) on variables which are
+    streamed by chunks, e.g. because they do not fit in memory.
+
+    The partial results of the reduction for every pair of chunks are computed by the
+    companion routine which outputs the state of the reduction
+    (see :mod:`pykeops.common.reduction_state`), and merged. If **return_state** is True,
+    the merged state is returned instead of the output of the reduction.
+    """
+    out_cat = axis2cat(routine.axis)
+    positions = ([], [], [])
+    for k, alias in enumerate(routine.aliases):
+        _, cat, _, pos = get_type(alias, position_in_list=k)
+        positions[cat].append(pos)
+    params = {pos: tools.contiguous(args[pos]) for pos in positions[2]}
+    out_side = StreamedSide(args, positions[out_cat], chunk_size, tools)
+    red_side = StreamedSide(args, positions[1 - out_cat], chunk_size, tools)
+    if out_side.iterable and red_side.iterable:
+        raise ValueError(
+            "Vi and Vj variables cannot be both given as iterables of chunks: "
+            "the variables of one of the two categories should be given as arrays."
+        )
+
+    state_routine, state_op = routine.get_state_routine()
+
+    # each chunk of the reduced variables is read once, and if the output variables are
+    # given as arrays, they are read again for every chunk of the reduced variables.
+    if out_side.iterable:
+        outer, inner = out_side, red_side
+    else:
+        outer, inner = red_side, out_side
+
+    def blocks():
+        # yields the pairs of chunks of output and reduced variables, with their offsets
+        for outer_offset, outer_chunk in outer.chunks():
+            for inner_offset, inner_chunk in inner.chunks():
+                if outer is out_side:
+                    yield outer_offset, outer_chunk, inner_offset, inner_chunk
+                else:
+                    yield inner_offset, inner_chunk, outer_offset, outer_chunk
+
+    states = {}
+    for out_offset, out_chunk, red_offset, red_chunk in prefetch(blocks()):
+        chunk_args = dict(params)
+        chunk_args.update(zip(out_side.positions, out_chunk))
+        chunk_args.update(zip(red_side.positions, red_chunk))
+        out = state_routine(
+            *(chunk_args[pos] for pos in range(len(args))),
+            backend=backend,
+            device_id=device_id,
+        )
+        state = shift_state(get_state(out, state_op), state_op, red_offset)
+        if out_offset in states:
+            state = merge_pair(state_op, states[out_offset], state, tools)
+        states[out_offset] = state
+
+    res = [states[offset] for offset in sorted(states)]
+    if not return_state:
+        res = [finalize_state(state, routine.reduction_op, binding) for state in res]
+    if isinstance(res[0], tuple):
+        return tuple(tools.concatenate(r, 0) for r in zip(*res))
+    return tools.concatenate(res, 0)
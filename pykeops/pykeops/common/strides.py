@@ -0,0 +1,57 @@
+from pykeops.common.utils import pyKeOps_Warning
+
+
+def row_strides(shape, strides):
+    r"""
+    Returns the (row, column) strides, in number of elements, of an array seen as a matrix
+    whose columns are indexed by its last dimension and whose rows are indexed by all its
+    other dimensions (i.e. the batch dimensions and the dimension of the points),
+    or None if the rows of the array are not evenly spaced in memory.
+    """
+    *rowshape, dim = shape
+    *rowstrides, colstride = strides
+    if dim == 1:
+        colstride = 1
+    rowstride, nrows = dim * colstride, 1
+    for n, stride in zip(reversed(rowshape), reversed(rowstrides)):
+        if n == 1:
+            continue
+        if nrows == 1:
+            rowstride = stride
+        elif stride != rowstride * nrows:
+            return None
+        nrows *= n
+    return rowstride, colstride
+
+
+def is_contiguous(x, tools):
+    # contiguous arrays are read by all the routines, without strides
+    return row_strides(x.shape, tools.strides(x)) == (x.shape[-1], 1)
+
+
+def use_strides(args, tools, tagCPUGPU):
+    # returns 1 if the Cpu routine must read the input arrays with their strides
+    return int(tagCPUGPU == 0 and not all(is_contiguous(arg, tools) for arg in args))
+
+
+def check_strides(args, tools, tagCPUGPU):
+    r"""
+    Returns the input arrays of a routine, where the arrays which cannot be read in place are
+    replaced by contiguous copies. The Cpu routines read in place all the arrays whose rows
+    are evenly spaced in memory, e.g. slices of columns, transposed or expanded arrays
+    (see keopscore.utils.code_gen_utils.load_vars), while the Gpu routines expect
+    contiguous arrays.
+    """
+    res, copied = [], False
+    for arg in args:
+        if not is_contiguous(arg, tools) and (
+            tagCPUGPU != 0 or row_strides(arg.shape, tools.strides(arg)) is None
+        ):
+            arg, copied = tools.contiguous(arg), True
+        res.append(arg)
+    if copied:
+        pyKeOps_Warning(
+            "at least one of the input tensors is not contiguous. "
+            + "Consider using contiguous data arrays to avoid unnecessary copies."
+        )
+    return tuple(res)
@@ -0,0 +1,57 @@
+import threading
+from contextlib import contextmanager
+
+# number of OpenMP threads of the Cpu routines ; 0 means the OpenMP default
+# (i.e. OMP_NUM_THREADS, or the number of cores of the machine)
+default_num_threads = 0
+
+# number of threads requested by the current call of each Python thread
+local = threading.local()
+
+
+def check_num_threads(num_threads):
+    if not isinstance(num_threads, int) or num_threads < 0:
+        raise ValueError(
+            f"[KeOps] num_threads should be a nonnegative integer, got {num_threads}."
+        )
+
+
+def set_num_threads(num_threads=None):
+    r"""
+    Sets the number of OpenMP threads used by the Cpu routines, for the calls which do
+    not specify their own **num_threads** argument. **None** or 0 restores the OpenMP default.
+    """
+    global default_num_threads
+    num_threads = 0 if num_threads is None else num_threads
+    check_num_threads(num_threads)
+    default_num_threads = num_threads
+
+
+def get_num_threads():
+    r"""
+    Returns the number of OpenMP threads of the Cpu routines launched by the current
+    Python thread: the **num_threads** argument of the current call if any, or the
+    global setting (0 means the OpenMP default).
+    """
+    num_threads = getattr(local, "num_threads", None)
+    return default_num_threads if num_threads is None else num_threads
+
+
+@contextmanager
+def num_threads_scope(num_threads):
+    r"""
+    Context manager which sets the number of threads of the Cpu routines launched by
+    the current Python thread ; nothing is changed if **num_threads** is None.
+    The setting is thread-local, so that concurrent calls, e.g. submitted to a thread
+    pool, may use disjoint sets of cores.
+    """
+    if num_threads is None:
+        yield
+        return
+    check_num_threads(num_threads)
+    previous = getattr(local, "num_threads", None)
+    local.num_threads = num_threads
+    try:
+        yield
+    finally:
+        local.num_threads = previous
@@ -9,10 +9,21 @@ from os.path import join, dirname, realpath
 numpy_found = importlib.util.find_spec("numpy") is not None
 torch_found = importlib.util.find_spec("torch") is not None
 
-from keopscore.config.config import use_cuda as gpu_available
 from keopscore.config.config import get_build_folder
 
 
+def __getattr__(name):
+    # gpu_available is evaluated on first access, since it requires to probe
+    # the system for Cuda libraries (see keopscore.config.config.probe_cuda)
+    if name == "gpu_available":
+        global gpu_available
+        import keopscore.config.config
+
+        gpu_available = keopscore.config.config.use_cuda
+        return gpu_available
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def pykeops_nvrtc_name(type="src"):
     basename = "pykeops_nvrtc"
     extension = ".cpp" if type == "src" else sysconfig.get_config_var("EXT_SUFFIX")
@@ -2,7 +2,7 @@
 # Import pyKeOps routines
 
 
-from .generic.generic_red import Genred
+from .generic.generic_red import Genred, merge_states
 
 # from .generic.generic_red_R import GenredR # FIXME
 from .operations import KernelSolve
@@ -18,6 +18,7 @@ __all__ = sorted(
     [
         "Genred",
         "GenredR",
+        "merge_states",
         "generic_sum",
         "generic_logsumexp",
         "generic_argmin",
@@ -1,8 +1,22 @@
 import numpy as np
+import keopscore
 
 from pykeops.common.get_options import get_tag_backend
 from pykeops.common.operations import preprocess, postprocess
-from pykeops.common.parse_type import get_sizes, complete_aliases, get_optional_flags
+from pykeops.common.reduction_state import state_reduction, get_state
+from pykeops.common.reduction_state import merge_states as merge_states_generic
+from pykeops.common.streaming import stream_reduction
+from pykeops.common.sharded import sharded_reduction
+from pykeops.common.executor import submit
+from pykeops.common.threads import num_threads_scope
+from pykeops.common.strides import check_strides, use_strides
+from pykeops.common.parse_type import (
+    get_sizes,
+    complete_aliases,
+    get_optional_flags,
+    use_int64_index,
+    use_tiles,
+)
 from pykeops.common.utils import axis2cat
 from pykeops import default_device_id
 from pykeops.common.utils import pyKeOps_Warning
@@ -49,6 +63,9 @@ class Genred:
 
     """
 
+    # maximal number of entries of the launches dict of an instance
+    max_launches = 64
+
     def __init__(
         self,
         formula,
@@ -115,6 +132,11 @@ class Genred:
                   - **dtype_acc** = ``"float32"`` : allowed only if dtype is "float16" or "float32".
                   - **dtype_acc** = ``"float64"`` : allowed only if dtype is "float32" or "float64"..
 
+                In Cpu mode, float16 (and, with PyTorch, bfloat16) data is read directly from the input
+                arrays and converted to float32 when it is loaded: the computations are performed in float32,
+                the reductions are accumulated in float32 (default) or float64, and the output is cast back to
+                the dtype of the inputs.
+
             use_double_acc (bool, default False): same as setting dtype_acc="float64" (only one of the two options can be set)
                 If True, accumulate results of reduction in float64 variables, before casting to float32.
                 This can only be set to True when data is in float32 or float64.
@@ -146,6 +168,24 @@ class Genred:
                 "keyword argument cuda_type in Genred is deprecated ; argument is ignored."
             )
 
+        # arguments of the routine, used to build the routines of streamed,
+        # state and sharded reductions (see get_state_routine)
+        self.init_args = (
+            formula,
+            aliases,
+            formula2,
+            dict(
+                axis=axis,
+                opt_arg=opt_arg,
+                dtype_acc=dtype_acc,
+                use_double_acc=use_double_acc,
+                sum_scheme=sum_scheme,
+                enable_chunks=enable_chunks,
+                rec_multVar_highdim=rec_multVar_highdim,
+            ),
+        )
+        self.state_routine = None
+
         self.reduction_op = reduction_op
         reduction_op_internal, formula2 = preprocess(reduction_op, formula2)
 
@@ -180,7 +220,54 @@ class Genred:
         self.axis = axis
         self.opt_arg = opt_arg
 
-    def __call__(self, *args, backend="auto", device_id=-1, ranges=None, out=None):
+        # KeOps routines which were used by previous calls, indexed by the
+        # shapes and dtype of the inputs (see __call__)
+        self.launches = {}
+
+    def get_state_routine(self):
+        r"""
+        Returns the routine which computes the state of the reduction, i.e. partial
+        results which can be merged (see :mod:`pykeops.common.reduction_state`),
+        and the name of its reduction.
+        """
+        if self.state_routine is None:
+            formula, aliases, formula2, kwargs = self.init_args
+            state_op, formula2 = state_reduction(self.reduction_op, formula2)
+            if state_op == self.reduction_op:
+                self.state_routine = self
+            else:
+                self.state_routine = Genred(
+                    formula, aliases, reduction_op=state_op, formula2=formula2, **kwargs
+                )
+        return self.state_routine, self.state_routine.reduction_op
+
+    def submit(self, *args, **kwargs):
+        r"""
+        Schedules a call of the routine in a thread pool, and returns a
+        :class:`concurrent.futures.Future` of its output.
+
+        The arguments are those of :meth:`__call__`. KeOps routines release the GIL during
+        the computations, so that independent reductions overlap with each other and with
+        the Python code of other threads.
+
+        Example:
+            >>> future = my_conv.submit(x, y)
+            >>> ...  # other computations
+            >>> a = future.result()
+        """
+        return submit(self, *args, **kwargs)
+
+    def __call__(
+        self,
+        *args,
+        backend="auto",
+        device_id=-1,
+        ranges=None,
+        out=None,
+        chunk_size=None,
+        return_state=False,
+        num_threads=None,
+    ):
         r"""
         Apply the routine on arbitrary NumPy arrays.
 
@@ -202,12 +289,16 @@ class Genred:
                     - All ``Vj(Dim_k)`` variables are encoded as **2d-arrays** with ``Dim_k`` columns and the same number of lines :math:`N`.
                     - All ``Pm(Dim_k)`` variables are encoded as **1d-arrays** (vectors) of size ``Dim_k``.
 
+                In Cpu mode, non contiguous arrays whose lines are evenly spaced in memory, e.g. slices
+                of columns, transposed or broadcasted arrays, are read in place. The other ones are copied.
+
         Keyword Args:
             backend (string): Specifies the map-reduce scheme.
                 The supported values are:
 
                     - ``"auto"`` (default): let KeOps decide which backend is best suited to your data, based on the tensors' shapes. ``"GPU_1D"`` will be chosen in most cases.
                     - ``"CPU"``: use a simple C++ ``for`` loop on a single CPU core.
+                    - ``"CPU_sharded"``: split the output axis across a pool of worker processes, pinned to the NUMA nodes of the machine, which use the ``"CPU"`` scheme (see :func:`pykeops.set_sharded_workers`). Input arrays are copied in shared memory for each call, unless they were allocated with :func:`pykeops.shared_empty`. Batch dimensions and **ranges** are not supported, and **out** must have the shape of the result.
                     - ``"GPU_1D"``: use a `simple multithreading scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv1D.cu>`_ on the GPU - basically, one thread per value of the output index.
                     - ``"GPU_2D"``: use a more sophisticated `2D parallelization scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv2D.cu>`_ on the GPU.
                     - ``"GPU"``: let KeOps decide which one of the ``"GPU_1D"`` or the ``"GPU_2D"`` scheme will run faster on the given input.
@@ -275,6 +366,35 @@ class Genred:
                 If provided, the output array should all have the same ``dtype``, be **contiguous** and be stored on
                 the **same device** as the arguments. Moreover it should have the correct shape for the output.
 
+            chunk_size (int, None by default): If provided, the ``Vi(..)`` and ``Vj(..)`` variables are
+                streamed through the routine by chunks of **chunk_size** lines.
+
+            return_state (bool, default False): If True, returns the *state* of the reduction
+                instead of its output: partial results, computed e.g. on a shard of the reduced
+                variables, which can be merged exactly with :func:`merge_states`.
+                States of ``ArgMin``, ``ArgMax``, ``Min_ArgMin`` and ``Max_ArgMax`` reductions are pairs
+                of (M,D) arrays of values and indices, states of ``KMin``, ``ArgKMin`` and
+                ``KMin_ArgKMin`` reductions are pairs of (M,K,D) arrays of values and indices, and states
+                of ``LogSumExp`` and ``SumSoftMaxWeight`` reductions are the (M,1+D) arrays
+                of the maxima :math:`m_i` and of the sums :math:`s_i` of the underlying
+                ``Max_SumShiftExp`` reductions. States of other reductions are their outputs.
+
+            num_threads (int, None by default): Number of OpenMP threads used by the Cpu
+                backends for this call. If None, we use the value set with
+                :func:`pykeops.set_num_threads`, or the OpenMP default. With the ``"CPU_sharded"``
+                backend, this is the number of threads of each worker process.
+
+        Note:
+            ``Vi(..)`` and ``Vj(..)`` variables may also be given as memory-mapped arrays
+            (``numpy.memmap``), or as iterables of 2d-arrays that yield consecutive chunks
+            of lines of the variables: e.g. for datasets which do not fit in memory.
+            The variables are then streamed through the routine by chunks, with the next chunk
+            being read while the current one is processed, and the partial results are
+            merged exactly, as described in :mod:`pykeops.common.reduction_state`.
+            The variables of a same category should be all arrays or all iterables (with chunks
+            of the same lengths), and ``Vi(..)`` and ``Vj(..)`` variables cannot be both
+            iterables. Streamed reductions do not support batch dimensions, **ranges** or **out**.
+
         Returns:
             (M,D) or (N,D) array:
 
@@ -284,6 +404,81 @@ class Genred:
             that is inferred from the **formula**.
         """
 
+        if num_threads is not None:
+            with num_threads_scope(num_threads):
+                return self(
+                    *args,
+                    backend=backend,
+                    device_id=device_id,
+                    ranges=ranges,
+                    out=out,
+                    chunk_size=chunk_size,
+                    return_state=return_state,
+                )
+
+        if chunk_size is not None or any(
+            isinstance(arg, np.memmap) or not isinstance(arg, np.ndarray)
+            for arg in args
+        ):
+            if ranges is not None or out is not None:
+                raise ValueError(
+                    "Streamed reductions do not support the ranges and out arguments."
+                )
+            from pykeops.numpy.utils import numpytools
+
+            return stream_reduction(
+                self,
+                args,
+                chunk_size,
+                backend,
+                device_id,
+                numpytools,
+                "numpy",
+                return_state=return_state,
+            )
+
+        if return_state:
+            if out is not None:
+                raise ValueError("The out argument is not supported with return_state.")
+            state_routine, state_op = self.get_state_routine()
+            out = state_routine(
+                *args, backend=backend, device_id=device_id, ranges=ranges
+            )
+            return get_state(out, state_op, max(len(arg.shape) for arg in args) - 2)
+
+        if backend == "CPU_sharded":
+            if ranges is not None:
+                raise ValueError(
+                    "The CPU_sharded backend does not support the ranges argument."
+                )
+            formula, aliases, formula2, kwargs = self.init_args
+            return sharded_reduction(
+                (formula, aliases, self.reduction_op, formula2, kwargs),
+                self.axis,
+                args,
+                out=out,
+            )
+
+        # Once the KeOps routine has been loaded for inputs with given shapes and dtype,
+        # the next calls skip the checks below and go straight to the routine. The routine
+        # also depends on the global option keopscore.use_cpu_kmin_scheme.
+        launch_key = (
+            backend,
+            device_id,
+            bool(ranges),
+            args[0].dtype,
+            keopscore.use_cpu_kmin_scheme,
+        ) + tuple(arg.shape for arg in args)
+        launch = self.launches.get(launch_key)
+        if launch is not None and all(arg.flags["C_CONTIGUOUS"] for arg in args):
+            myconv, nx, ny, nbatchdims, nout, dtype = launch
+            if ranges:
+                ranges = tuple(np.ascontiguousarray(r) for r in ranges)
+            out = myconv.genred_numpy(-1, ranges, nx, ny, nbatchdims, out, *args)
+            return postprocess(
+                out, "numpy", self.reduction_op, nout, self.opt_arg, dtype
+            )
+
         # Get tags
         tagCPUGPU, tag1D2D, tagHostDevice = get_tag_backend(backend, args)
 
@@ -298,9 +493,15 @@ class Genred:
         if device_id == -1:
             device_id = default_device_id if tagCPUGPU == 1 else -1
 
+        # N.B.: the Cpu routines read strided arrays in place, while the Gpu routines
+        # expect contiguous data arrays (see pykeops.common.strides)
+        from pykeops.numpy.utils import numpytools
+
+        args = check_strides(args, numpytools, tagCPUGPU)
+
         from pykeops.common.keops_io import keops_binder
 
-        self.myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
+        myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
             tagCPUGPU,
             tag1D2D,
             tagHostDevice,
@@ -311,17 +512,16 @@ class Genred:
             len(args),
             dtype,
             "numpy",
-            self.optional_flags,
+            dict(
+                self.optional_flags,
+                use_int64_index=use_int64_index(args),
+                use_strides=use_strides(args, numpytools, tagCPUGPU),
+                use_tiles=use_tiles(self.aliases, args),
+            ),
         ).import_module()
-
-        # N.B.: KeOps C++ expects contiguous data arrays
-        test_contig = all(arg.flags["C_CONTIGUOUS"] for arg in args)
-        if not test_contig:
-            pyKeOps_Warning(
-                "at least one of the input tensors is not contiguous. "
-                + "Consider using contiguous data arrays to avoid unnecessary copies."
-            )
-            args = tuple(np.ascontiguousarray(arg) for arg in args)
+        # N.B. the routine is kept in a local variable, since the instance may be
+        # called concurrently from several threads (see submit)
+        self.myconv = myconv
 
         # N.B.: KeOps C++ expects contiguous integer arrays as ranges
         if ranges:
@@ -330,11 +530,12 @@ class Genred:
         nx, ny = get_sizes(self.aliases, *args)
         nout, nred = (nx, ny) if self.axis == 1 else (ny, nx)
 
-        if "Arg" in self.reduction_op:
-            # when using Arg type reductions,
+        if "Arg" in self.reduction_op and tagCPUGPU == 1:
+            # when using Arg type reductions in Gpu mode,
             # if nred is greater than 16 millions and dtype=float32, the result is not reliable
             # because we encode indices as floats, so we raise an exception ;
-            # same with float16 type and nred>2048
+            # same with float16 type and nred>2048.
+            # N.B. in Cpu mode, indices are written in a separate array of integers.
             if nred > 1.6e7 and dtype in ("float32", "float"):
                 raise ValueError(
                     "size of input array is too large for Arg type reduction with single precision. Use double precision."
@@ -344,6 +545,52 @@ class Genred:
                     "size of input array is too large for Arg type reduction with float16 dtype.."
                 )
 
-        out = self.myconv.genred_numpy(-1, ranges, nx, ny, nbatchdims, out, *args)
+        out = myconv.genred_numpy(-1, ranges, nx, ny, nbatchdims, out, *args)
+
+        # the calls on contiguous arrays go straight to the routine, which must not be
+        # the one compiled for strided arrays
+        if not myconv.params.use_strides:
+            if len(self.launches) >= self.max_launches:
+                self.launches.clear()
+            self.launches[launch_key] = (myconv, nx, ny, nbatchdims, nout, dtype)
 
         return postprocess(out, "numpy", self.reduction_op, nout, self.opt_arg, dtype)
+
+
+def merge_states(states, reduction_op="Sum", offsets=None, return_state=False):
+    r"""
+    Merges the states of a reduction computed on several shards of the reduced variables.
+
+    Example:
+        >>> my_conv = Genred('-SqDist(x,y)', ['x = Vi(3)', 'y = Vj(3)'],
+        ...                  reduction_op='ArgKMin', opt_arg=10, axis=1)
+        >>> x, y = np.random.randn(1000, 3), np.random.randn(20000, 3)
+        >>> states = [my_conv(x, y[:10000], return_state=True),
+        ...           my_conv(x, y[10000:], return_state=True)]
+        >>> ind = merge_states(states, 'ArgKMin', offsets=[0, 10000])
+        >>> np.array_equal(ind, my_conv(x, y))
+        True
+
+    Args:
+        states (list of arrays or pairs of arrays): The states of the reduction, as returned by
+            :meth:`Genred.__call__` with **return_state** = True.
+
+    Keyword Args:
+        reduction_op (string, default = ``"Sum"``): The reduction of the :class:`Genred` routine
+            which computed the states.
+        offsets (list of integers, default = None): The positions of the first lines of the shards
+            in the full arrays of reduced variables, which are added to the indices of the states
+            of Arg type reductions. By default, indices are left unchanged.
+        return_state (bool, default False): If True, returns the merged state instead of the
+            output of the reduction, e.g. to merge it again with other states.
+
+    Returns:
+        The output of the reduction (or its state) on the union of the shards.
+        Merging states is associative, and ties are resolved in favor of the first states,
+        as in KeOps reductions.
+    """
+    from pykeops.numpy.utils import numpytools
+
+    return merge_states_generic(
+        states, reduction_op, numpytools, "numpy", offsets, return_state
+    )
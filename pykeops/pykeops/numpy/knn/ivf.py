@@ -0,0 +1,88 @@
+import numpy as np
+
+from pykeops.common.ivf import GenericIVF
+from pykeops.numpy import LazyTensor
+from pykeops.numpy.cluster import from_matrix
+from pykeops.numpy.utils import numpytools
+
+
+class IVF(GenericIVF):
+    r"""Inverted file (IVF) index for approximate K-nearest neighbors search, with NumPy arrays.
+
+    Example:
+        >>> x = np.random.randn(100000, 3)
+        >>> index = IVF().fit(x, clusters=300)
+        >>> q = np.random.randn(1000, 3)
+        >>> indices = index.kneighbors(q, K=10, nprobe=5)  # (1000, 10) integer array
+        >>> index.save("index.npz")
+        >>> index = IVF.load("index.npz")
+
+    See :class:`pykeops.common.ivf.GenericIVF` for a description of the algorithm.
+
+    Args:
+        metric (string or function, default="euclidean"): The distance, either
+            ``"euclidean"`` (squared Euclidean distance), ``"manhattan"``,
+            ``"angular"`` (minus the scalar product), or a function of two
+            LazyTensors ``x_i`` and ``y_j`` which returns a symbolic matrix of distances.
+    """
+
+    LazyTensor = LazyTensor
+    from_matrix = staticmethod(from_matrix)
+    tools = numpytools
+
+    def save(self, path):
+        r"""Saves the fitted index in the file **path**, with ``numpy.savez``."""
+        np.savez(path, **self._state())
+
+    @classmethod
+    def load(cls, path):
+        r"""Loads an index saved with :meth:`save`."""
+        with np.load(path) as data:
+            state = {key: data[key] for key in data.files}
+        return cls(str(state["metric"]))._set_state(state)
+
+    @staticmethod
+    def _random_indices(N, n):
+        return np.random.permutation(N)[:n]
+
+    @staticmethod
+    def _sort(labels):
+        perm = np.argsort(labels, kind="stable")
+        return labels[perm], perm
+
+    @staticmethod
+    def _ranges(labels, clusters):
+        # [start,end) indices of the clusters in the sorted array of labels
+        pivots = np.concatenate(
+            ([0], np.cumsum(np.bincount(labels, minlength=clusters)))
+        )
+        return np.stack((pivots[:-1], pivots[1:]), axis=1).astype("int32")
+
+    @staticmethod
+    def _update_centroids(x, labels, c):
+        counts = np.bincount(labels, minlength=c.shape[0])
+        sums = np.stack(
+            [
+                np.bincount(labels, weights=x[:, d], minlength=c.shape[0])
+                for d in range(x.shape[1])
+            ],
+            axis=1,
+        )
+        new_c = (sums / np.maximum(counts, 1)[:, None]).astype(c.dtype)
+        return np.where(counts[:, None] > 0, new_c, c)
+
+    @staticmethod
+    def _normalize(c):
+        return c / np.maximum(np.linalg.norm(c, axis=1, keepdims=True), 1e-12)
+
+    @staticmethod
+    def _keep_matrix(probes, clusters):
+        keep = np.zeros((clusters, clusters), dtype=bool)
+        keep[np.arange(clusters)[:, None], probes] = True
+        return keep
+
+    @staticmethod
+    def _unsort(a, perm):
+        res = np.empty_like(a)
+        res[perm] = a
+        return res
@@ -3,7 +3,13 @@ import numpy as np
 from pykeops.common.get_options import get_tag_backend
 from pykeops.common.keops_io import keops_binder
 from pykeops.common.operations import ConjugateGradientSolver
-from pykeops.common.parse_type import get_sizes, complete_aliases, get_optional_flags
+from pykeops.common.parse_type import (
+    get_sizes,
+    complete_aliases,
+    get_optional_flags,
+    use_int64_index,
+    use_tiles,
+)
 from pykeops.common.utils import axis2cat
 from pykeops import default_device_id
 from pykeops.common.utils import pyKeOps_Warning
@@ -170,7 +176,17 @@ class KernelSolve:
         self.optional_flags = optional_flags
 
     def __call__(
-        self, *args, backend="auto", device_id=-1, alpha=1e-10, eps=1e-6, ranges=None
+        self,
+        *args,
+        backend="auto",
+        device_id=-1,
+        alpha=1e-10,
+        eps=1e-6,
+        ranges=None,
+        x0=None,
+        callback=None,
+        stats=None,
+        precond=None
     ):
         r"""
         To apply the routine on arbitrary NumPy arrays.
@@ -217,6 +233,31 @@ class KernelSolve:
                 as we loop over all indices
                 :math:`i\in[0,M)` and :math:`j\in[0,N)`.
 
+            eps (float, default=1e-6): Tolerance of the conjugate gradient solver.
+                The columns of the right-hand side are solved simultaneously
+                but with their own step sizes, and each column stops
+                being updated as soon as the mean squared value of its residual
+                is smaller than **eps** :math:`^2`.
+
+            x0 (array, default=None): An initial guess for the solution,
+                with the same shape as the right-hand side. If **None** (default),
+                the conjugate gradient descent starts from zero. When a sequence of
+                close systems is solved (e.g. during the training of a Gaussian process),
+                using the previous solution as initial guess saves iterations.
+
+            callback (function, default=None): A function which is called after each
+                iteration of the conjugate gradient solver, with a copy of the current
+                solution as argument.
+
+            stats (dict, default=None): If not **None**, the number of iterations of the
+                solver is stored in ``stats["iterations"]``, and ``stats["residuals"]``
+                is the list of the norms of the residuals of the columns,
+                at the beginning and after each iteration.
+
+            precond (function, default=None): A function which applies the inverse of a
+                symmetric, positive definite **preconditioner** of the linear system
+                to a (M,D) or (N,D) array, to speed up the convergence of the solver.
+
         Returns:
             (M,D) or (N,D) array:
 
@@ -250,7 +291,11 @@ class KernelSolve:
             len(args),
             dtype,
             "numpy",
-            self.optional_flags,
+            dict(
+                self.optional_flags,
+                use_int64_index=use_int64_index(args),
+                use_tiles=use_tiles(self.aliases, args),
+            ),
         ).import_module()
 
         varinv = args[self.varinvpos]
@@ -265,4 +310,13 @@ class KernelSolve:
                 res += alpha * var
             return res
 
-        return ConjugateGradientSolver("numpy", linop, varinv, eps=eps)
+        return ConjugateGradientSolver(
+            "numpy",
+            linop,
+            varinv,
+            eps=eps,
+            x0=x0,
+            callback=callback,
+            stats=stats,
+            precond=precond,
+        )
@@ -14,6 +14,8 @@ class numpytools:
     KernelSolve = KernelSolve
     swap_axes = np_swap_axes
     arraytype = np.ndarray
+    float32 = np.float32
+    int64 = np.int64
     float_types = [float, np.float16, np.float32, np.float64]
 
     @staticmethod
@@ -28,6 +30,26 @@ class numpytools:
     def eq(x, y):
         return np.equal(x, y)
 
+    @staticmethod
+    def where(cond, x, y):
+        return np.where(cond, x, y)
+
+    @staticmethod
+    def concatenate(x, axis):
+        return np.concatenate(x, axis=axis)
+
+    @staticmethod
+    def argsort(x, axis):
+        return np.argsort(x, axis=axis, kind="stable")
+
+    @staticmethod
+    def take_along_axis(x, ind, axis):
+        return np.take_along_axis(x, ind, axis=axis)
+
+    @staticmethod
+    def astype(x, dtype):
+        return x.astype(dtype)
+
     @staticmethod
     def transpose(x):
         return x.T
@@ -111,6 +133,10 @@ class numpytools:
     def empty(shape, dtype, device=None, requires_grad=None):
         return np.empty(shape, dtype=dtype)
 
+    @staticmethod
+    def empty_long(shape, device=None):
+        return np.empty(shape, dtype="int64")
+
     @staticmethod
     def eye(n, dtype):
         return np.eye(n).astype(dtype)
@@ -123,6 +149,11 @@ class numpytools:
     def get_pointer(x):
         return x.__array_interface__["data"][0]
 
+    @staticmethod
+    def strides(x):
+        # strides in number of elements
+        return tuple(stride // x.itemsize for stride in x.strides)
+
     @staticmethod
     def device(x):
         return "cpu"
@@ -0,0 +1,55 @@
+import pytest
+import torch
+
+from pykeops.torch import LazyTensor
+from pykeops.torch.approx import Nystrom, RandomFourierFeatures
+
+
+def gaussian(x_i, y_j):
+    return (-((x_i - y_j) ** 2).sum(-1) / 0.5**2).exp()
+
+
+def relative_error(a, b):
+    return ((a - b).norm() / b.norm()).item()
+
+
+class TestClass:
+    N, D, E = 500, 2, 2
+    torch.manual_seed(0)
+    x = torch.rand(N, D, dtype=torch.float64)
+    b = torch.randn(N, E, dtype=torch.float64)
+    K = gaussian(LazyTensor(x[:, None, :]), LazyTensor(x[None, :, :]))
+
+    @pytest.mark.parametrize("landmarks", ["uniform", "kmeans", "leverage"])
+    def test_nystrom(self, landmarks):
+        K_approx = Nystrom(gaussian, n_components=100, landmarks=landmarks).fit(self.x)
+        assert K_approx.phi.shape[0] == self.N
+        assert relative_error(K_approx @ self.b, self.K @ self.b) < 1e-2
+
+        # with all the points as landmarks, the approximation is exact
+        K_full = Nystrom(gaussian, n_components=self.N).fit(self.x)
+        assert relative_error(K_full @ self.b, self.K @ self.b) < 1e-6
+
+    @pytest.mark.parametrize("kernel", ["gaussian", "laplacian"])
+    def test_rff(self, kernel):
+        K_approx = RandomFourierFeatures(kernel, sigma=0.5, n_components=5000)
+        K_approx.fit(self.x)
+        K = K_approx.kernel_function(
+            LazyTensor(self.x[:, None, :]), LazyTensor(self.x[None, :, :])
+        )
+        assert relative_error(K_approx @ self.b, K @ self.b) < 0.1
+
+    def test_preconditioner(self):
+        alpha = 1e-3
+        stats, stats_precond = {}, {}
+        a = self.K.solve(LazyTensor(self.b[:, None, :]), alpha=alpha, stats=stats)
+
+        precond = Nystrom(gaussian, n_components=100).fit(self.x).preconditioner(alpha)
+        a_precond = self.K.solve(
+            LazyTensor(self.b[:, None, :]),
+            alpha=alpha,
+            precond=precond,
+            stats=stats_precond,
+        )
+        assert stats_precond["iterations"] < stats["iterations"] / 2
+        assert relative_error(a_precond, a) < 1e-3
@@ -0,0 +1,105 @@
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+
+from pykeops.numpy import Genred as Genred_numpy, LazyTensor as LazyTensor_numpy
+from pykeops.torch import Genred as Genred_torch, LazyTensor as LazyTensor_torch
+
+
+class TestClass:
+    M, N, D = 500, 2000, 3
+    x = np.random.randn(M, D).astype("float32")
+    y = np.random.randn(N, D).astype("float32")
+    b = np.random.rand(N, 1).astype("float32")
+
+    def test_submit_numpy(self):
+        my_routine = Genred_numpy(
+            "Exp(-SqDist(x,y))*b", ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"], axis=1
+        )
+        ref = my_routine(self.x, self.y, self.b)
+        futures = [my_routine.submit(self.x, self.y, self.b) for _ in range(4)]
+        for future in futures:
+            assert isinstance(future, Future)
+            assert np.allclose(future.result(), ref)
+
+    def test_submit_torch(self):
+        my_routine = Genred_torch(
+            "Exp(-SqDist(x,y))*b", ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"], axis=1
+        )
+        x = torch.from_numpy(self.x).requires_grad_()
+        y, b = torch.from_numpy(self.y), torch.from_numpy(self.b)
+        ref = my_routine(x, y, b)
+        res = my_routine.submit(x, y, b).result()
+        assert res.requires_grad and torch.allclose(res, ref)
+        with torch.no_grad():
+            assert not my_routine.submit(x, y, b).result().requires_grad
+
+    def test_async_lazytensor(self):
+        for LazyTensor, array in [
+            (LazyTensor_numpy, np.asarray),
+            (LazyTensor_torch, torch.from_numpy),
+        ]:
+            x_i = LazyTensor(array(self.x[:, None, :]))
+            y_j = LazyTensor(array(self.y[None, :, :]))
+            D_ij = ((x_i - y_j) ** 2).sum(-1)
+            future = D_ij.argmin(dim=1, asynchronous=True)
+            assert isinstance(future, Future)
+            assert (future.result() == D_ij.argmin(dim=1)).all()
+
+    def test_gil_released(self):
+        # a Python thread makes progress during a long reduction
+        M, N = 20000, 20000
+        my_routine = Genred_numpy("Exp(-SqDist(x,y))", ["x=Vi(3)", "y=Vj(3)"], axis=1)
+        x = np.random.randn(M, 3).astype("float32")
+        my_routine(x[:10], x[:10])
+        ticks = []
+        done = threading.Event()
+
+        def tick():
+            while not done.is_set():
+                ticks.append(time.perf_counter())
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=tick)
+        thread.start()
+        start = time.perf_counter()
+        my_routine(x, x)
+        stop = time.perf_counter()
+        done.set()
+        thread.join()
+        assert sum(start < t < stop for t in ticks) > 1
+
+    def test_submit_compilation(self):
+        # the first calls of routines which are not compiled yet generate their code and
+        # compile them in the threads of the pool
+        n = random.randrange(10**6)
+        routines = [
+            Genred_numpy(
+                f"Grad(Exp(-SqDist(x,y)*IntInv({n + k}))*b, x, e)",
+                ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)", "e=Vi(1)"],
+                axis=1,
+            )
+            for k in range(1, 7)
+        ]
+        e = np.random.rand(self.M, 1).astype("float32")
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            futures = [
+                routine.submit(self.x, self.y, self.b, e) for routine in routines
+            ]
+            results = [future.result() for future in futures]
+        finally:
+            sys.setswitchinterval(switch_interval)
+        D = ((self.x[:, None, :] - self.y[None, :, :]) ** 2).sum(-1)
+        for k, res in enumerate(results, start=1):
+            K = np.exp(-D / (n + k)) * self.b.T
+            ref = (-2 / (n + k)) * (
+                (K[:, :, None] * (self.x[:, None, :] - self.y[None, :, :])).sum(1) * e
+            )
+            assert np.allclose(res, ref, rtol=1e-4, atol=1e-6)
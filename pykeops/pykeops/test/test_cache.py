@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+
+import keopscore
+from keopscore.get_keops_dll import get_keops_dll
+from keopscore.utils.Cache import Cache, clean_cache
+from keopscore.utils.misc_utils import KeOps_FileLock
+
+args = (
+    "CpuReduc",
+    "Sum_Reduction(Exp(-Sum(Square(Var(0,3,0)-Var(1,3,1))))*Var(2,4,1),0)",
+    0,
+    0,
+    0,
+    [],
+    3,
+    "double",
+    "double",
+    "kahan_scheme",
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+)
+
+script = f"""
+import keopscore
+from keopscore.get_keops_dll import get_keops_dll
+get_keops_dll(*{args!r})
+stats = keopscore.cache_stats()
+print(stats["disk_hits"], stats["misses"])
+"""
+
+
+class TestClass:
+    def test_cache_stats(self):
+        tag = get_keops_dll(*args)[0]
+        stats = keopscore.cache_stats()
+        get_keops_dll(*args)
+        new_stats = keopscore.cache_stats()
+        assert new_stats["hits"] == stats["hits"] + 1
+        assert new_stats["misses"] == stats["misses"]
+        # the compilation time is saved when the entry is found on disk, not in memory
+        assert new_stats["compile_time_saved"] == stats["compile_time_saved"]
+        get_keops_dll.reset()
+        get_keops_dll(*args)
+        new_stats = keopscore.cache_stats()
+        assert new_stats["disk_hits"] == stats["disk_hits"] + 1
+        assert new_stats["compile_time_saved"] > stats["compile_time_saved"]
+        assert new_stats["num_formulas"] > 0 and new_stats["size"] > 0
+
+        # the entry is found on disk by another process
+        out = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True
+        )
+        assert out.stdout.split()[-2:] == ["1", "0"]
+
+        # corrupted entries are ignored, and the formula is compiled again
+        with open(get_keops_dll.entry_file(get_keops_dll.get_key(*args)), "w") as f:
+            f.write("corrupted")
+        get_keops_dll.reset()
+        assert get_keops_dll(*args)[0] == tag
+        assert keopscore.cache_stats()["misses"] == new_stats["misses"] + 1
+
+        # the formula is compiled again if its library was removed, e.g. by clean_cache
+        os.remove(get_keops_dll(*args)[1])
+        assert os.path.exists(get_keops_dll(*args)[1])
+        assert keopscore.cache_stats()["misses"] == new_stats["misses"] + 2
+
+    def test_clean_cache(self, tmp_path):
+        for k, tag in enumerate(["aaaaaaaaaa", "bbbbbbbbbb", "cccccccccc"]):
+            for ext in (".cpp", ".so", ".nfo"):
+                filename = os.path.join(tmp_path, tag + ext)
+                with open(filename, "w") as f:
+                    f.write("x" * 100)
+                os.utime(filename, (1000 * k, 1000 * k))
+        # the least recently used formula, which is not in keep, is removed
+        size = clean_cache(700, build_folder=tmp_path, keep=("aaaaaaaaaa",))
+        assert size == 600
+        files = sorted(f for f in os.listdir(tmp_path) if not f.endswith(".lock"))
+        assert files[:4] == [
+            "aaaaaaaaaa.cpp",
+            "aaaaaaaaaa.nfo",
+            "aaaaaaaaaa.so",
+            "cccccccccc.cpp",
+        ]
+        # lock files, temporary files and formulas which are being compiled or
+        # looked up by another process are kept
+        for name in ("bbbbbbbbbb.lock", "cccccccccc.so.123.tmp", "dddddddddd.cpp"):
+            with open(os.path.join(tmp_path, name), "w") as f:
+                f.write("x" * 100)
+        with KeOps_FileLock(os.path.join(tmp_path, "cccccccccc.lock")):
+            size = clean_cache(0, build_folder=tmp_path)
+        assert size == 400
+        assert sorted(os.listdir(tmp_path)) == [
+            "aaaaaaaaaa.lock",
+            "bbbbbbbbbb.lock",
+            "cccccccccc.cpp",
+            "cccccccccc.lock",
+            "cccccccccc.nfo",
+            "cccccccccc.so",
+            "cccccccccc.so.123.tmp",
+            "dddddddddd.cpp",
+        ]
+
+    def test_legacy_cache_file(self, tmp_path):
+        def fun(x):
+            return x
+
+        # the whole-dict cache file of previous versions is removed
+        legacy_file = os.path.join(tmp_path, "fun_cache.pkl")
+        with open(legacy_file, "wb") as f:
+            f.write(b"x")
+        cache = Cache(fun, use_cache_file=True, save_folder=tmp_path)
+        assert not os.path.exists(legacy_file)
+        assert cache(1) == 1
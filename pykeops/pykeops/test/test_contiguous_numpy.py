@@ -23,3 +23,37 @@ d2 = kernel2 @ c
 
 def test_contiguous_numpy():
     assert np.allclose(d2, d1)
+
+
+def test_strided_numpy():
+    from pykeops.numpy import Genred
+
+    # slices of columns, transposed and broadcasted arrays are read in place
+    table = np.random.rand(300, 8)
+    x = table[:, 2:5]
+    y = np.random.rand(3, 400).T
+    w = np.broadcast_to(np.random.rand(1, 1), (400, 1))
+    my_routine = Genred(
+        "Exp(-SqDist(x,y))*w", ["x=Vi(3)", "y=Vj(3)", "w=Vj(1)"], axis=1
+    )
+    res = my_routine(x, y, w)
+    assert my_routine.myconv.params.use_strides == 1
+    ref = my_routine(*(np.ascontiguousarray(arg) for arg in (x, y, w)))
+    assert my_routine.myconv.params.use_strides == 0
+    assert np.allclose(res, ref)
+
+    # K-min reductions, and rows in reverse order
+    my_routine = Genred(
+        "SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="ArgKMin", axis=1, opt_arg=4
+    )
+    res = my_routine(x[::-1], y)
+    assert np.array_equal(res, my_routine(np.ascontiguousarray(x[::-1]), y.copy()))
+
+
+def test_strided_batch_numpy():
+    # the rows of the batched slice x are evenly spaced in memory, but not those of y
+    table = np.random.rand(2, 100, 8)
+    x, y = table[:, :, :3], table[:, :50, 5:]
+    D_ij = ((LazyTensor(x[:, :, None]) - LazyTensor(y[:, None])) ** 2).sum(-1)
+    ref = ((x[:, :, None] - y[:, None]) ** 2).sum(-1)
+    assert np.allclose(D_ij.min(dim=2)[..., 0], ref.min(-1))
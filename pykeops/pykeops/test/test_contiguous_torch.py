@@ -25,3 +25,22 @@ d2 = kernel2 @ c
 
 def test_contiguous_torch():
     assert torch.allclose(d2, d1)
+
+
+def test_strided_torch():
+    from pykeops.torch import Genred
+
+    # slices of columns, transposed and expanded tensors are read in place
+    x = torch.rand(300, 8)[:, 2:5].requires_grad_()
+    y = torch.rand(3, 400).t()
+    w = torch.rand(1, 1).expand(400, 1)
+    my_routine = Genred(
+        "Exp(-SqDist(x,y))*w", ["x=Vi(3)", "y=Vj(3)", "w=Vj(1)"], axis=1
+    )
+    res = my_routine(x, y, w)
+    (g,) = torch.autograd.grad(res.sum(), [x])
+
+    x_ref = x.detach().contiguous().requires_grad_()
+    ref = my_routine(x_ref, y.contiguous(), w.contiguous())
+    (g_ref,) = torch.autograd.grad(ref.sum(), [x_ref])
+    assert torch.allclose(res, ref) and torch.allclose(g, g_ref)
@@ -43,3 +43,86 @@ class TestCase:
             out_g.append(torch.autograd.grad(self.out[k][0], [x])[0])
 
         assert torch.allclose(out_g[0], out_g[1])
+
+
+class TestCpu:
+    # in Cpu mode, float16 and bfloat16 data is converted to float32 when it is loaded
+    M, N, D = 300, 1000, 3
+    x = torch.randn(M, D)
+    y = torch.randn(N, D)
+    b = torch.rand(N, 2)
+    aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)"]
+
+    @pytest.mark.parametrize("dtype", [torch.float16, torch.bfloat16])
+    @pytest.mark.parametrize(
+        "reduction_op, formula2, opt_arg",
+        [
+            ("Sum", None, None),
+            ("Min_ArgMin", None, None),
+            ("ArgKMin", None, 4),
+            ("LogSumExp", None, None),
+            ("SumSoftMaxWeight", "b", None),
+        ],
+    )
+    def test_storage_cpu(self, dtype, reduction_op, formula2, opt_arg, monkeypatch):
+        import pykeops.common.parse_type
+        from pykeops.torch import Genred
+
+        my_routine = Genred(
+            "-SqDist(x,y)/10",
+            self.aliases,
+            reduction_op=reduction_op,
+            axis=1,
+            formula2=formula2,
+            opt_arg=opt_arg,
+        )
+        args = [arg.to(dtype) for arg in (self.x, self.y, self.b)]
+        res = my_routine(*args, backend="CPU")
+        # the reference is computed in float32 on the same (rounded) values, with the
+        # cache-blocked scheme which is always used for 16 bits data
+        monkeypatch.setattr(pykeops.common.parse_type, "cpu_tiled_min_size", 0)
+        ref = my_routine(*[arg.float() for arg in args], backend="CPU")
+        if not isinstance(ref, tuple):
+            res, ref = (res,), (ref,)
+        for r, s in zip(res, ref):
+            if s.is_floating_point():
+                assert r.dtype == dtype
+                assert torch.allclose(r.float(), s.to(dtype).float())
+            else:
+                assert torch.equal(r, s)
+
+    def test_storage_cpu_grad(self):
+        x = self.x.half().requires_grad_()
+        x_i, y_j = LazyTensor(x[:, None, :]), LazyTensor(self.y.half()[None, :, :])
+        res = (-((x_i - y_j) ** 2).sum(-1)).exp().sum(dim=1, backend="CPU")
+        [g] = torch.autograd.grad(res.sum(), [x])
+        x32 = x.detach().float().requires_grad_()
+        x_i, y_j = LazyTensor(x32[:, None, :]), LazyTensor(self.y.half().float()[None])
+        ref = (-((x_i - y_j) ** 2).sum(-1)).exp().sum(dim=1, backend="CPU")
+        [g_ref] = torch.autograd.grad(ref.sum(), [x32])
+        assert res.dtype == g.dtype == torch.float16
+        assert torch.allclose(res.float(), ref, rtol=1e-3)
+        assert torch.allclose(g.float(), g_ref, rtol=1e-2, atol=1e-2)
+
+    def test_storage_cpu_numpy(self):
+        import numpy as np
+        from pykeops.numpy import LazyTensor as LazyTensor_np
+
+        x, y = self.x.half().numpy(), self.y.half().numpy()
+        D_ij = ((LazyTensor_np(x[:, None, :]) - LazyTensor_np(y[None, :, :])) ** 2).sum(
+            -1
+        )
+        ind = D_ij.argmin(dim=1, backend="CPU").ravel()
+        d = (
+            (x[:, None, :].astype("float32") - y[None, :, :].astype("float32")) ** 2
+        ).sum(-1)
+        assert np.array_equal(ind, d.argmin(1))
+        # 16 bits values are converted exactly, including subnormal numbers and infinities
+        s = np.array(
+            [[0.0], [6e-8], [1e-5], [65504], [np.inf], [-2.5]], dtype="float16"
+        )
+        s_i, one_j = LazyTensor_np(s[:, None, :]), LazyTensor_np(
+            np.ones((1, 1, 1), "float16")
+        )
+        out = (s_i * one_j).sum(dim=1, backend="CPU")
+        assert out.dtype == np.float16 and np.array_equal(out, s)
@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+script = """
+import sys
+import pykeops
+import keopscore.config.config
+print("use_cuda" in vars(keopscore.config.config), "torch" in sys.modules)
+print(pykeops.config.gpu_available == keopscore.config.config.use_cuda)
+"""
+
+
+class TestClass:
+    def test_lazy_import(self):
+        # importing pykeops does not probe the system for Cuda, nor imports torch
+        out = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True
+        )
+        # N.B. a warning may be printed when Cuda is probed, between the two lines
+        lines = out.stdout.strip().split("\n")
+        assert lines[0] == "False False" and lines[-1] == "True"
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import torch
+
+import pykeops.common.parse_type
+from pykeops.numpy import Genred as Genred_numpy, LazyTensor
+from pykeops.torch import Genred as Genred_torch
+
+
+@pytest.fixture
+def int64_index(monkeypatch):
+    # the 64 bits indexing mode is selected for all the input arrays
+    monkeypatch.setattr(pykeops.common.parse_type, "max_int32_size", 0)
+
+
+class TestClass:
+    M, N, D = 301, 500, 3
+    x = np.random.randn(M, D).astype("float32")
+    y = np.random.randn(N, D).astype("float32")
+    b = np.random.randn(N, 2).astype("float32")
+
+    @pytest.mark.parametrize(
+        "reduction_op, opt_arg", [("Sum", None), ("ArgKMin", 3), ("Min_ArgMin", None)]
+    )
+    def test_int64_index_numpy(self, monkeypatch, int64_index, reduction_op, opt_arg):
+        formula = "Exp(-SqDist(x,y))*b" if reduction_op == "Sum" else "SqDist(x,y)"
+        aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)"]
+        my_routine = Genred_numpy(
+            formula, aliases, reduction_op=reduction_op, axis=1, opt_arg=opt_arg
+        )
+        res = my_routine(self.x, self.y, self.b)
+        assert my_routine.myconv.params.use_int64_index == 1
+
+        ref_routine = Genred_numpy(
+            formula, aliases, reduction_op=reduction_op, axis=1, opt_arg=opt_arg
+        )
+        monkeypatch.setattr(pykeops.common.parse_type, "max_int32_size", 2**31 - 1)
+        ref = ref_routine(self.x, self.y, self.b)
+        assert ref_routine.myconv.params.use_int64_index == 0
+        assert ref_routine.myconv.params.tag != my_routine.myconv.params.tag
+        for r, s in zip(res, ref) if isinstance(ref, tuple) else [(res, ref)]:
+            assert np.allclose(r, s, atol=1e-5)
+
+    def test_int64_index_batch(self, int64_index):
+        x, y = self.x[:300].reshape(3, 100, 1, 3), self.y.reshape(1, 1, 500, 3)
+        D_ij = ((LazyTensor(x) - LazyTensor(y)) ** 2).sum(-1)
+        res = (-D_ij).exp().sum(dim=2)
+        ref = np.exp(-((x - y) ** 2).sum(-1)).sum(-1)
+        assert np.allclose(res[..., 0], ref, atol=1e-4)
+
+    def test_int64_index_torch(self, int64_index):
+        my_routine = Genred_torch(
+            "Exp(-SqDist(x,y))*b", ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)"], axis=1
+        )
+        x = torch.from_numpy(self.x).requires_grad_()
+        y, b = torch.from_numpy(self.y), torch.from_numpy(self.b)
+        res = my_routine(x, y, b)
+        (g,) = torch.autograd.grad(res.sum(), [x])
+        x_ref = x.detach().clone().requires_grad_()
+        ref = (torch.exp(-((x_ref[:, None, :] - y[None]) ** 2).sum(-1)) @ b).sum()
+        (g_ref,) = torch.autograd.grad(ref, [x_ref])
+        assert torch.allclose(res.sum(), ref, rtol=1e-4)
+        assert torch.allclose(g, g_ref, atol=1e-4)
+
+    @pytest.mark.parametrize("use_ranges", [False, True])
+    def test_over_int32_limit(self, use_ranges):
+        # just over 2^31 elements : the offsets of the last rows overflow with 32 bits integers.
+        # The array is allocated with zeros, so that only the pages of its last rows are
+        # actually written in memory.
+        M, N = 2**31 // 64 + 2, 5
+        try:
+            x = np.zeros((M, 64), dtype="float16")
+        except MemoryError:
+            pytest.skip("not enough memory for an array of 2^31 elements")
+        x[-3:] = np.arange(3 * 64).reshape(3, 64) / 64
+        y = np.ones((N, 1), dtype="float16")
+
+        my_routine = Genred_numpy("Sum(x)*y", ["x=Vi(64)", "y=Vj(1)"], axis=1)
+        if use_ranges:
+            # only the last rows are computed
+            ranges_i = np.array([[M - 3, M]], dtype="int32")
+            ranges_j = np.array([[0, N]], dtype="int32")
+            slices = np.array([1], dtype="int32")
+            ranges = (ranges_i, slices, ranges_j, ranges_j, slices, ranges_i)
+            res = my_routine(x, y, ranges=ranges)
+        else:
+            res = my_routine(x, y)
+        assert my_routine.myconv.params.use_int64_index == 1
+        assert res.shape == (M, 1) and not res[:-3].any()
+        assert np.allclose(res[-3:, 0], N * x[-3:].astype("float32").sum(1))
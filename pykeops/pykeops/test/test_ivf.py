@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import torch
+
+from pykeops.numpy.knn import IVF as IVF_numpy
+from pykeops.torch.knn import IVF as IVF_torch
+
+
+def brute_force(x, q, K):
+    d = ((q[:, None, :] - x[None, :, :]) ** 2).sum(-1)
+    return np.argsort(d, axis=1, kind="stable")[:, :K]
+
+
+class TestClass:
+    N, M, D, K = 2000, 100, 3, 5
+    x = np.random.randn(N, D).astype("float32")
+    q = np.random.randn(M, D).astype("float32")
+
+    @pytest.mark.parametrize(
+        "IVF, array", [(IVF_numpy, np.asarray), (IVF_torch, torch.from_numpy)]
+    )
+    def test_ivf(self, IVF, array, tmp_path):
+        index = IVF().fit(array(self.x), clusters=20)
+
+        # when all clusters are probed, the search is exact
+        ind = np.asarray(index.kneighbors(array(self.q), K=self.K, nprobe=20))
+        assert np.array_equal(ind, brute_force(self.x, self.q, self.K))
+
+        # otherwise, most neighbors are found
+        ind = np.asarray(index.kneighbors(array(self.q), K=self.K, nprobe=5))
+        true_ind = brute_force(self.x, self.q, self.K)
+        recall = np.mean([len(set(a) & set(b)) for a, b in zip(ind, true_ind)])
+        assert recall > 0.8 * self.K
+
+        # the fitted index can be saved and loaded
+        filename = str(tmp_path / "index")
+        index.save(filename)
+        index2 = IVF.load(filename + (".npz" if IVF is IVF_numpy else ""))
+        ind2 = np.asarray(index2.kneighbors(array(self.q), K=self.K, nprobe=5))
+        assert np.array_equal(ind, ind2)
+
+        # missing neighbors are marked with -1
+        dist, ind = index.kneighbors(
+            array(self.q), K=self.N, nprobe=1, return_distance=True
+        )
+        dist, ind = np.asarray(dist), np.asarray(ind)
+        assert np.all((ind == -1) == np.isinf(dist))
+        assert np.all((ind >= 0).sum(1) < self.N)
@@ -0,0 +1,64 @@
+import numpy as np
+import torch
+
+from pykeops.common.lazy_tensor import GenericLazyTensor
+from pykeops.numpy import LazyTensor as LazyTensor_np
+from pykeops.torch import LazyTensor
+
+torch.manual_seed(0)
+
+
+def gaussian_conv(x, y, b, LazyTensor=LazyTensor):
+    x_i = LazyTensor(x[..., :, None, :])
+    y_j = LazyTensor(y[..., None, :, :])
+    b_j = LazyTensor(b[..., None, :, :])
+    K_ij = (-((x_i - y_j) ** 2).sum(-1)).exp()
+    return (K_ij * b_j).sum(dim=len(x.shape) - 1)
+
+
+def gaussian_conv_torch(x, y, b):
+    K = (-((x[..., :, None, :] - y[..., None, :, :]) ** 2).sum(-1)).exp()
+    return K @ b
+
+
+class TestCase:
+    def test_dispatch_cache_reuse(self):
+        GenericLazyTensor.dispatch_cache.clear()
+        for _ in range(3):
+            x, y, b = torch.randn(50, 3), torch.randn(40, 3), torch.randn(40, 2)
+            assert torch.allclose(
+                gaussian_conv(x, y, b), gaussian_conv_torch(x, y, b), atol=1e-5
+            )
+        # the three reductions share the same structure
+        assert len(GenericLazyTensor.dispatch_cache) == 1
+
+    def test_dispatch_cache_shapes(self):
+        # reductions with new sizes, batch dimensions or dtypes have correct results
+        for x, y, b in [
+            (torch.randn(50, 3), torch.randn(40, 3), torch.randn(40, 2)),
+            (torch.randn(30, 3), torch.randn(70, 3), torch.randn(70, 2)),
+            (torch.randn(2, 30, 3), torch.randn(2, 70, 3), torch.randn(2, 70, 2)),
+            (
+                torch.randn(30, 3).double(),
+                torch.randn(70, 3).double(),
+                torch.randn(70, 2).double(),
+            ),
+        ]:
+            assert torch.allclose(
+                gaussian_conv(x, y, b), gaussian_conv_torch(x, y, b), atol=1e-5
+            )
+
+    def test_dispatch_cache_grad(self):
+        # after a call without gradients, a call with gradients goes through autograd
+        x, y, b = torch.randn(50, 3), torch.randn(40, 3), torch.randn(40, 2)
+        gaussian_conv(x, y, b)
+        x.requires_grad = True
+        (g,) = torch.autograd.grad(gaussian_conv(x, y, b).sum(), [x])
+        (g_torch,) = torch.autograd.grad(gaussian_conv_torch(x, y, b).sum(), [x])
+        assert torch.allclose(g, g_torch, atol=1e-5)
+
+    def test_dispatch_cache_numpy(self):
+        for _ in range(2):
+            x, y, b = torch.randn(50, 3), torch.randn(40, 3), torch.randn(40, 2)
+            res = gaussian_conv(x.numpy(), y.numpy(), b.numpy(), LazyTensor_np)
+            assert np.allclose(res, gaussian_conv_torch(x, y, b).numpy(), atol=1e-5)
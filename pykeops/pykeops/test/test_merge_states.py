@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import torch
+
+from pykeops.numpy import Genred as Genred_numpy, merge_states as merge_states_numpy
+from pykeops.torch import Genred as Genred_torch, merge_states as merge_states_torch
+
+
+def to_numpy(x):
+    if isinstance(x, tuple):
+        return tuple(to_numpy(y) for y in x)
+    return x.numpy() if isinstance(x, torch.Tensor) else x
+
+
+def assert_same(res, ref):
+    if isinstance(ref, tuple):
+        for r, s in zip(res, ref):
+            assert_same(r, s)
+    else:
+        assert res.shape == ref.shape and res.dtype == ref.dtype
+        assert np.allclose(res, ref, atol=1e-5)
+
+
+class TestClass:
+    M, N, D = 200, 900, 3
+    x = np.random.randn(M, D).astype("float32")
+    y = np.random.randn(N, D).astype("float32")
+    b = np.random.rand(N, 2).astype("float32")
+    aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)"]
+    bindings = [
+        (Genred_numpy, merge_states_numpy, np.asarray),
+        (Genred_torch, merge_states_torch, torch.from_numpy),
+    ]
+
+    @pytest.mark.parametrize("Genred, merge_states, array", bindings)
+    @pytest.mark.parametrize(
+        "reduction_op, formula2, opt_arg",
+        [
+            ("Sum", None, None),
+            ("Max", None, None),
+            ("ArgMin", None, None),
+            ("Max_ArgMax", None, None),
+            ("ArgKMin", None, 4),
+            ("KMin_ArgKMin", None, 4),
+            ("LogSumExp", None, None),
+            ("LogSumExp", "b", None),
+            ("SumSoftMaxWeight", "b", None),
+        ],
+    )
+    def test_merge_states(
+        self, Genred, merge_states, array, reduction_op, formula2, opt_arg
+    ):
+        my_routine = Genred(
+            "-SqDist(x,y)",
+            self.aliases,
+            reduction_op=reduction_op,
+            axis=1,
+            formula2=formula2,
+            opt_arg=opt_arg,
+        )
+        x, y, b = array(self.x), array(self.y), array(self.b)
+        ref = to_numpy(my_routine(x, y, b))
+
+        # the j axis is split in three shards
+        bounds = [0, 100, 500, self.N]
+        states = [
+            my_routine(x, y[start:end], b[start:end], return_state=True)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        res = merge_states(states, reduction_op, offsets=bounds[:-1])
+        assert_same(to_numpy(res), ref)
+
+        # merging is associative
+        state = merge_states(
+            states[1:], reduction_op, offsets=bounds[1:-1], return_state=True
+        )
+        res = merge_states(
+            [states[0], state], reduction_op, offsets=[0, 0], return_state=False
+        )
+        assert_same(to_numpy(res), ref)
+
+        # the state of the whole reduction is the merge of the states
+        state = my_routine(x, y, b, return_state=True)
+        assert_same(
+            to_numpy(merge_states([state], reduction_op, return_state=True)),
+            to_numpy(state),
+        )
+
+    def test_merge_states_errors(self):
+        with pytest.raises(ValueError):
+            merge_states_numpy([], "Sum")
+        with pytest.raises(ValueError):
+            merge_states_numpy([self.x, self.x], "ArgMin", offsets=[0])
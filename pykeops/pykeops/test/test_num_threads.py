@@ -0,0 +1,76 @@
+import ctypes
+import ctypes.util
+import threading
+
+import numpy as np
+import pytest
+import torch
+
+import pykeops
+from pykeops.numpy import Genred as Genred_numpy, LazyTensor
+from pykeops.torch import Genred as Genred_torch
+
+
+class TestClass:
+    M, N, D = 300, 700, 3
+    x = np.random.randn(M, D).astype("float32")
+    y = np.random.randn(N, D).astype("float32")
+    aliases = ["x=Vi(3)", "y=Vj(3)"]
+
+    def test_num_threads_numpy(self):
+        my_routine = Genred_numpy("Exp(-SqDist(x,y))", self.aliases, axis=1)
+        ref = my_routine(self.x, self.y)
+        for num_threads in [1, 2, 0]:
+            res = my_routine(self.x, self.y, backend="CPU", num_threads=num_threads)
+            assert np.allclose(res, ref)
+        x_i = LazyTensor(self.x[:, None, :])
+        y_j = LazyTensor(self.y[None, :, :])
+        D_ij = ((x_i - y_j) ** 2).sum(-1)
+        assert np.array_equal(D_ij.argmin(dim=1, num_threads=1), D_ij.argmin(dim=1))
+        with pytest.raises(ValueError):
+            my_routine(self.x, self.y, num_threads=-1)
+
+    def test_num_threads_torch(self):
+        my_routine = Genred_torch("Exp(-SqDist(x,y))", self.aliases, axis=1)
+        x = torch.from_numpy(self.x).requires_grad_()
+        y = torch.from_numpy(self.y)
+        ref = my_routine(x, y)
+        [g_ref] = torch.autograd.grad(ref.sum(), [x])
+        res = my_routine(x, y, num_threads=1)
+        [g] = torch.autograd.grad(res.sum(), [x])
+        assert torch.allclose(res, ref) and torch.allclose(g, g_ref)
+
+    def test_set_num_threads(self):
+        try:
+            pykeops.set_num_threads(2)
+            assert pykeops.get_num_threads() == 2
+            # the per-call setting is local to the thread of the call
+            from pykeops.common.threads import num_threads_scope
+
+            counts = []
+            with num_threads_scope(1):
+                thread = threading.Thread(
+                    target=lambda: counts.append(pykeops.get_num_threads())
+                )
+                thread.start()
+                thread.join()
+                assert pykeops.get_num_threads() == 1
+            assert counts == [2] and pykeops.get_num_threads() == 2
+            with pytest.raises(ValueError):
+                pykeops.set_num_threads(1.5)
+        finally:
+            pykeops.set_num_threads(None)
+        assert pykeops.get_num_threads() == 0
+
+    def test_openmp_setting_restored(self):
+        # the number of threads of a call does not leak to the OpenMP setting of the thread
+        name = ctypes.util.find_library("gomp")
+        if name is None:
+            pytest.skip("libgomp not found")
+        omp_get_max_threads = ctypes.CDLL(name).omp_get_max_threads
+        before = omp_get_max_threads()
+        my_routine = Genred_numpy(
+            "SqDist(x,y)", self.aliases, reduction_op="Min", axis=1
+        )
+        my_routine(self.x, self.y, backend="CPU", num_threads=before + 3)
+        assert omp_get_max_threads() == before
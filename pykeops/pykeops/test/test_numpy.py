@@ -201,6 +201,38 @@ class NumpyUnitTestCase(unittest.TestCase):
         self.assertFalse(yc_tmp.flags.c_contiguous)
         self.assertTrue(np.allclose(gamma_keops1, gamma_keops2))
 
+    ############################################################
+    def test_launch_plans(self):
+        ############################################################
+        from pykeops.numpy import Genred
+
+        t = self.type_to_test[0]
+
+        my_routine = Genred(
+            "SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], reduction_op="Sum", axis=1
+        )
+
+        # the launch plans of the routine are reused for inputs of the same shapes,
+        # and rebuilt when the shapes change
+        for M, N in [(10, 6), (7, 6), (10, 6), (10, 1), (1, 6), (10, 6)]:
+            x, y = self.x[:M].astype(t), self.y[:N].astype(t)
+            gamma_keops = my_routine(x, y, backend="CPU")
+            gamma_py = squared_distances(x, y).sum(axis=1, keepdims=True)
+            self.assertTrue(gamma_keops.shape == (M, 1))
+            self.assertTrue(np.allclose(gamma_keops, gamma_py, atol=1e-6))
+
+        plans = my_routine.myconv.launch_plans
+        self.assertTrue(len(plans) == 4)
+
+        # the number of plans is bounded
+        max_launch_plans = my_routine.myconv.max_launch_plans
+        for M in range(1, max_launch_plans + 2):
+            x = np.random.rand(M, 3).astype(t)
+            gamma_keops = my_routine(x, self.y.astype(t), backend="CPU")
+            gamma_py = squared_distances(x, self.y.astype(t)).sum(axis=1)
+            self.assertTrue(np.allclose(gamma_keops.ravel(), gamma_py, atol=1e-5))
+        self.assertTrue(len(plans) <= max_launch_plans)
+
     ############################################################
     def test_heterogeneous_var_aliases(self):
         ############################################################
@@ -283,6 +315,159 @@ class NumpyUnitTestCase(unittest.TestCase):
         )[:, :3]
         self.assertTrue(np.allclose(c.ravel(), cnp.ravel()))
 
+    ############################################################
+    def test_argkmin_large_indices(self):
+        ############################################################
+
+        from pykeops.numpy import Genred
+
+        # indices larger than 2^24 cannot be encoded exactly as float32 values,
+        # but are written in a separate array of integers in Cpu mode.
+        N = 2**24 + 8
+        x = np.zeros((2, 1), dtype="float32")
+        y = np.ones((N, 1), dtype="float32")
+        y[2**24 + 1] = 0.0
+        y[5] = 0.5
+
+        my_routine = Genred(
+            "SqDist(x,y)",
+            ["x = Vi(1)", "y = Vj(1)"],
+            reduction_op="KMin_ArgKMin",
+            axis=1,
+            opt_arg=2,
+        )
+        vals, inds = my_routine(x, y, backend="CPU")
+        self.assertEqual(inds.dtype, np.int64)
+        self.assertTrue(np.allclose(vals, [[0.0, 0.25], [0.0, 0.25]]))
+        self.assertTrue(np.array_equal(inds, [[2**24 + 1, 5], [2**24 + 1, 5]]))
+
+    ############################################################
+    def test_arg_reductions_out(self):
+        ############################################################
+
+        from pykeops.numpy import Genred
+
+        x = np.random.rand(10, 2).astype("float32")
+        y = np.random.rand(50, 2).astype("float32")
+        d = ((x[:, None, :] - y[None, :, :]) ** 2).sum(-1)
+        am = np.argsort(d, axis=1)[:, :3]
+        m = np.take_along_axis(d, am, axis=1)
+
+        def routine(reduction_op, opt_arg=None):
+            return Genred(
+                "SqDist(x,y)",
+                ["x = Vi(2)", "y = Vj(2)"],
+                reduction_op=reduction_op,
+                axis=1,
+                opt_arg=opt_arg,
+            )
+
+        # indices are written in the output array given by the user, cast to its dtype
+        for dtype in ["float32", "int64"]:
+            out = np.full((10, 1), -7, dtype=dtype)
+            res = routine("ArgMin")(x, y, backend="CPU", out=out)
+            self.assertTrue(np.array_equal(res.ravel(), am[:, 0]))
+            self.assertTrue(np.array_equal(out.ravel(), am[:, 0]))
+
+        out = np.full((10, 3), -7, dtype="float32")
+        routine("ArgKMin", 3)(x, y, backend="CPU", out=out)
+        self.assertTrue(np.array_equal(out, am))
+
+        # (values,indices) pairs
+        out = np.full((10, 2), -7, dtype="float32")
+        routine("Min_ArgMin")(x, y, backend="CPU", out=out)
+        self.assertTrue(np.allclose(out[:, 0], m[:, 0]))
+        self.assertTrue(np.array_equal(out[:, 1], am[:, 0]))
+
+        out = np.full((10, 6), -7, dtype="float32")
+        routine("KMin_ArgKMin", 3)(x, y, backend="CPU", out=out)
+        self.assertTrue(np.allclose(out[:, ::2], m))
+        self.assertTrue(np.array_equal(out[:, 1::2], am))
+
+    ############################################################
+    def test_kmin(self):
+        ############################################################
+
+        from pykeops.numpy import Genred
+
+        # KMin returns only values : nothing is written in the integer output in Cpu mode
+        x = np.random.rand(10, 1).astype("float32")
+        y = np.random.rand(100, 1).astype("float32")
+
+        my_routine = Genred(
+            "SqDist(x,y)",
+            ["x = Vi(1)", "y = Vj(1)"],
+            reduction_op="KMin",
+            axis=1,
+            opt_arg=3,
+        )
+        c = my_routine(x, y, backend="CPU")
+        cnp = np.sort((x - y.T) ** 2, axis=1)[:, :3]
+        self.assertEqual(c.shape, (10, 3))
+        self.assertTrue(np.allclose(c, cnp))
+
+    ############################################################
+    def test_kernel_linear_solver_precond(self):
+        ############################################################
+        from pykeops.common.operations import KernelLinearSolver
+
+        # with the Nystrom preconditioner, the solver stops when the norm of the
+        # residual (and not its root mean square over the rows) is smaller than eps
+        x = np.random.rand(400, 2)
+        b = np.random.rand(400, 1)
+        alpha, sigma, eps = 0.1, 0.2, 1e-6
+        a = KernelLinearSolver(
+            "numpy", ("gaussian", 2, 1, sigma), x, b, alpha, eps=eps, precond=True
+        )
+        K = np.exp(-squared_distances(x, x) / sigma**2)
+        self.assertTrue(np.linalg.norm(K @ a + alpha * a - b) < 2 * eps)
+
+    ############################################################
+    def test_tiled_scheme(self):
+        ############################################################
+        from unittest import mock
+
+        import pykeops.common.parse_type
+        from pykeops.numpy import Genred
+
+        # dense Cpu reductions use the cache-blocked scheme CpuReduc_tiled for large inputs
+        # only : it must give the same results as the plain CpuReduc scheme.
+        x = np.random.rand(300, 3)
+        y = np.random.rand(500, 3)
+        b = np.random.rand(500, 1)
+        reductions = [
+            ("Sum", None, "block_sum"),
+            ("Sum", None, "kahan_scheme"),
+            ("Max", None, "auto"),
+            ("LogSumExp", None, "auto"),
+            ("Min_ArgMin", None, "auto"),
+            ("KMin_ArgKMin", 4, "auto"),
+        ]
+        for (reduction_op, opt_arg, sum_scheme), t in itertools.product(
+            reductions, self.type_to_test
+        ):
+            args = (x.astype(t), y.astype(t), b.astype(t))
+            res, tags = {}, set()
+            for min_size in [0, np.inf]:
+                # N.B. a new routine is created, since the routine loaded for the first call
+                # is reused for inputs of the same shapes
+                my_routine = Genred(
+                    "Exp(-SqDist(x,y))*b",
+                    ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"],
+                    reduction_op=reduction_op,
+                    axis=1,
+                    opt_arg=opt_arg,
+                    sum_scheme=sum_scheme,
+                )
+                with mock.patch.object(
+                    pykeops.common.parse_type, "cpu_tiled_min_size", min_size
+                ):
+                    res[min_size] = my_routine(*args, backend="CPU")
+                tags.add(my_routine.myconv.params.tag)
+            # K-min type reductions use the CpuReduc_KMin scheme in both cases
+            self.assertTrue(len(tags) == (1 if "KMin" in reduction_op else 2))
+            self.assertTrue(np.allclose(res[0], res[np.inf], atol=1e-6))
+
     ############################################################
     def test_LazyTensor_sum(self):
         ############################################################
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+
+import pykeops
+from pykeops.numpy import Genred
+
+formula = "Exp(-SqDist(x,y)*g)*b"
+aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)", "g=Pm(1)"]
+spec = {"formula": formula, "aliases": aliases, "axis": 1, "dtype": "float64"}
+spec_argmin = {
+    "formula": "SqDist(x,y)",
+    "aliases": ["x=Vi(3)", "y=Vj(3)"],
+    "reduction_op": "ArgMin",
+    "axis": 1,
+    "dtype": "float64",
+}
+
+
+class TestClass:
+    def test_precompile(self):
+        # the same formula is requested twice, to check that concurrent workers
+        # do not conflict when compiling the same hash
+        tags = pykeops.precompile([spec, spec, spec_argmin], workers=2)
+        assert len(tags) == 3 and tags[0] == tags[1] != tags[2]
+        for tag in tags:
+            assert os.path.exists(os.path.join(pykeops.get_build_folder(), tag + ".so"))
+
+        # the precompiled module is used by Genred
+        x, y = np.random.rand(50, 3), np.random.rand(40, 3)
+        b, g = np.random.rand(40, 2), np.array([0.5])
+        res = Genred(formula, aliases, axis=1)(x, y, b, g, backend="CPU")
+        D = ((x[:, None, :] - y[None, :, :]) ** 2).sum(-1)
+        assert np.allclose(res, np.exp(-D * g) @ b)
+
+    def test_precompile_sequential(self):
+        tags = pykeops.precompile([spec_argmin], workers=0)
+        assert tags == pykeops.precompile([spec_argmin], workers=1)
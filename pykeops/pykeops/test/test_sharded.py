@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+
+import pykeops
+import pykeops.common.sharded
+from pykeops.numpy import Genred as Genred_numpy, LazyTensor
+from pykeops.torch import Genred as Genred_torch
+
+
+@pytest.fixture(scope="module", autouse=True)
+def sharded_workers():
+    pykeops.set_sharded_workers(2)
+    yield
+    pykeops.set_sharded_workers(None)
+
+
+class TestClass:
+    M, N, D = 301, 500, 3
+    x = np.random.randn(M, D).astype("float32")
+    y = np.random.randn(N, D).astype("float32")
+
+    @pytest.mark.parametrize(
+        "reduction_op, opt_arg, axis",
+        [("Sum", None, 1), ("ArgKMin", 3, 1), ("Min_ArgMin", None, 0)],
+    )
+    def test_sharded_numpy(self, reduction_op, opt_arg, axis):
+        my_routine = Genred_numpy(
+            "-SqDist(x,y)",
+            ["x=Vi(3)", "y=Vj(3)"],
+            reduction_op=reduction_op,
+            axis=axis,
+            opt_arg=opt_arg,
+        )
+        res = my_routine(self.x, self.y, backend="CPU_sharded")
+        ref = my_routine(self.x, self.y, backend="CPU")
+        for r, s in zip(res, ref) if isinstance(ref, tuple) else [(res, ref)]:
+            assert r.shape == s.shape and r.dtype == s.dtype
+            assert np.allclose(r, s, atol=1e-5)
+
+    def test_sharded_torch(self):
+        my_routine = Genred_torch(
+            "Exp(-SqDist(x,y))*b", ["x=Vi(3)", "y=Vj(3)", "b=Vj(1)"], axis=1
+        )
+        x, y = torch.from_numpy(self.x), torch.from_numpy(self.y)
+        b = torch.rand(self.N, 1)
+        res = my_routine(x, y, b, backend="CPU_sharded")
+        assert torch.allclose(res, my_routine(x, y, b), atol=1e-5)
+        with pytest.raises(ValueError):
+            my_routine(x.requires_grad_(), y, b, backend="CPU_sharded")
+
+    def test_sharded_lazytensor(self):
+        x_i = LazyTensor(self.x[:, None, :])
+        y_j = LazyTensor(self.y[None, :, :])
+        D_ij = ((x_i - y_j) ** 2).sum(-1)
+        res = D_ij.argmin(dim=1, backend="CPU_sharded")
+        assert np.array_equal(res, D_ij.argmin(dim=1))
+
+    def test_sharded_shared_memory(self, monkeypatch):
+        my_routine = Genred_numpy("-SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], axis=1)
+        ref = my_routine(self.x, self.y, backend="CPU")
+
+        # the result is returned in shared memory, and can be used in place by the next calls
+        res = my_routine(self.x, self.y, backend="CPU_sharded")
+        assert pykeops.common.sharded.shared_desc(res) is not None
+        assert np.allclose(res, ref, atol=1e-5)
+
+        # arrays allocated in shared memory, and their views, are not copied
+        x, y = pykeops.shared_empty((self.M, 4)), pykeops.shared_empty((self.N, 3))
+        x[:, :3], y[...] = self.x, self.y
+        out = pykeops.shared_empty((self.M, 1))
+
+        def no_copy(x):
+            raise AssertionError("unexpected copy in shared memory")
+
+        monkeypatch.setattr(pykeops.common.sharded, "to_shared", no_copy)
+        assert my_routine(x[:, :3], y, backend="CPU_sharded", out=out) is out
+        assert np.allclose(out, ref, atol=1e-5)
+        monkeypatch.undo()
+
+        # other output arrays are filled with a copy
+        out = np.zeros((self.M, 1), dtype="float32")
+        assert my_routine(self.x, self.y, backend="CPU_sharded", out=out) is out
+        assert np.allclose(out, ref, atol=1e-5)
+        with pytest.raises(ValueError):
+            my_routine(self.x, self.y, backend="CPU_sharded", out=out[:-1])
+
+        # torch tensors share the memory of the numpy arrays
+        my_routine = Genred_torch("-SqDist(x,y)", ["x=Vi(3)", "y=Vj(3)"], axis=1)
+        out = torch.from_numpy(pykeops.shared_empty((self.M, 1)))
+        x, y = torch.from_numpy(self.x), torch.from_numpy(y)
+        assert my_routine(x, y, backend="CPU_sharded", out=out) is out
+        assert np.allclose(out.numpy(), ref, atol=1e-5)
+
+    def test_sharded_portability(self, monkeypatch):
+        # the shared memory block is released with the last array which uses it
+        x = pykeops.shared_empty((self.M, 3))
+        name = pykeops.common.sharded.shared_desc(x)[0]
+        x_view = x[1:]
+        del x
+        x_view[...] = 1
+        assert name in pykeops.common.sharded.shared_blocks
+        del x_view
+        assert name not in pykeops.common.sharded.shared_blocks
+
+        # the affinity of processes is only available on Linux
+        monkeypatch.delattr(os, "sched_getaffinity", raising=False)
+        cpus = sum(pykeops.common.sharded.numa_nodes(), [])
+        assert cpus and set(cpus) <= set(range(os.cpu_count()))
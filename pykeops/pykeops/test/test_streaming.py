@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from pykeops.numpy import Genred, LazyTensor
+
+
+def assert_same(res, ref):
+    if isinstance(ref, tuple):
+        for r, s in zip(res, ref):
+            assert_same(r, s)
+    else:
+        assert res.shape == ref.shape and res.dtype == ref.dtype
+        assert np.allclose(res, ref, atol=1e-5)
+
+
+class TestClass:
+    M, N, D = 300, 1000, 3
+    x = np.random.randn(M, D).astype("float32")
+    y = np.random.randn(N, D).astype("float32")
+    b = np.random.rand(N, 2).astype("float32")
+    aliases = ["x=Vi(3)", "y=Vj(3)", "b=Vj(2)"]
+
+    @pytest.mark.parametrize(
+        "reduction_op, formula2, opt_arg",
+        [
+            ("Sum", None, None),
+            ("Min", None, None),
+            ("ArgMax", None, None),
+            ("Min_ArgMin", None, None),
+            ("KMin", None, 5),
+            ("ArgKMin", None, 5),
+            ("KMin_ArgKMin", None, 5),
+            ("LogSumExp", None, None),
+            ("LogSumExp", "b", None),
+            ("SumSoftMaxWeight", "b", None),
+        ],
+    )
+    def test_streaming(self, reduction_op, formula2, opt_arg, tmp_path):
+        my_routine = Genred(
+            "-SqDist(x,y)",
+            self.aliases,
+            reduction_op=reduction_op,
+            axis=1,
+            formula2=formula2,
+            opt_arg=opt_arg,
+        )
+        ref = my_routine(self.x, self.y, self.b)
+
+        # memory-mapped arrays
+        np.save(tmp_path / "y.npy", self.y)
+        y = np.load(tmp_path / "y.npy", mmap_mode="r")
+        assert_same(my_routine(self.x, y, self.b, chunk_size=77), ref)
+
+        # iterables of chunks
+        chunks_y, chunks_b = np.array_split(self.y, 7), np.array_split(self.b, 7)
+        assert_same(my_routine(self.x, iter(chunks_y), iter(chunks_b)), ref)
+
+        # both axes are streamed
+        assert_same(my_routine(self.x, self.y, self.b, chunk_size=64), ref)
+
+    def test_streaming_axis_0(self):
+        my_routine = Genred(
+            "SqDist(x,y)", self.aliases[:2], reduction_op="ArgKMin", axis=0, opt_arg=3
+        )
+        ref = my_routine(self.x, self.y)
+        assert_same(my_routine(iter(np.array_split(self.x, 4)), self.y), ref)
+        assert_same(my_routine(self.x, iter(np.array_split(self.y, 3))), ref)
+
+    def test_streaming_lazytensor(self, tmp_path):
+        np.save(tmp_path / "y.npy", self.y)
+        y = np.load(tmp_path / "y.npy", mmap_mode="r")
+        x_i = LazyTensor(self.x[:, None, :])
+        y_j = LazyTensor(y[None, :, :])
+        res = ((x_i - y_j) ** 2).sum(-1).argmin(dim=1, chunk_size=100)
+        ref = ((self.x[:, None, :] - self.y[None, :, :]) ** 2).sum(-1).argmin(1)
+        assert np.array_equal(res.ravel(), ref)
+
+    def test_streaming_errors(self):
+        my_routine = Genred("SqDist(x,y)", self.aliases[:2], axis=1)
+        with pytest.raises(ValueError):
+            my_routine(iter([self.x]), iter([self.y]))
+        with pytest.raises(ValueError):
+            my_routine(self.x[None], self.y[None], chunk_size=10)
+        with pytest.raises(ValueError):
+            Genred("SqDist(x,y)", self.aliases[:2], reduction_op="Zero", axis=1)(
+                self.x, self.y, chunk_size=10
+            )
@@ -321,6 +321,266 @@ class PytorchUnitTestCase(unittest.TestCase):
             )
         )
 
+    ############################################################
+    def test_generic_syntax_multiple_gradients(self):
+        ############################################################
+        import torch
+        from pykeops.torch import Genred
+
+        # gradients wrt. x, sigma (reduced along j) and y, b (reduced along i)
+        # are computed with two fused reductions
+        aliases = ["x = Vi(3)", "y = Vj(3)", "b = Vj(3)", "sigma = Pm(1)"]
+        formula = "Exp(-SqDist(x,y) / sigma) * b"
+        my_routine = Genred(formula, aliases, reduction_op="Sum", axis=1)
+
+        x, y, b, sigma = (
+            torch.tensor(t, dtype=torch.float64, requires_grad=True)
+            for t in (self.x, self.y, self.b, self.sigma)
+        )
+        e = torch.randn(self.M, 3, dtype=torch.float64)
+
+        res_keops = my_routine(x, y, b, sigma, backend="auto")
+        grads_keops = torch.autograd.grad(
+            (res_keops * e).sum(), [x, y, b, sigma], create_graph=True
+        )
+
+        D = ((x[:, None, :] - y[None, :, :]) ** 2).sum(-1)
+        res_torch = torch.exp(-D / sigma) @ b
+        grads_torch = torch.autograd.grad(
+            (res_torch * e).sum(), [x, y, b, sigma], create_graph=True
+        )
+
+        for g_keops, g_torch in zip(grads_keops, grads_torch):
+            self.assertTrue(torch.allclose(g_keops, g_torch))
+
+        # second order derivatives go through the fused gradient reductions
+        gg_keops = torch.autograd.grad((grads_keops[0] ** 2).sum(), [y, b])
+        gg_torch = torch.autograd.grad((grads_torch[0] ** 2).sum(), [y, b])
+        for g_keops, g_torch in zip(gg_keops, gg_torch):
+            self.assertTrue(torch.allclose(g_keops, g_torch))
+
+    ############################################################
+    def test_common_subexpression_elimination(self):
+        ############################################################
+        from keopscore.formulas.GetReduction import GetReduction
+        from keopscore.formulas.Operation import Operation
+        from keopscore.utils.code_gen_utils import c_array
+
+        # the kernel value Exp(-SqDist(x,y)) appears in both gradients
+        red_formula = GetReduction(
+            "Grad_WithSavedForward(Sum_Reduction(Exp(-Sum((x-y)**2))*b,0), Concat(y,b), Var(3,2,0), Var(4,2,0))",
+            ["x=Var(0,3,0)", "y=Var(1,3,1)", "b=Var(2,2,1)"],
+        )
+        table = [
+            c_array("float", dim, name)
+            for (name, dim) in (("x", 3), ("y", 3), ("b", 2), ("e", 2), ("r", 2))
+        ]
+        num_deduplicated = Operation.num_cse_deduplicated
+        code = red_formula.formula(c_array("float", red_formula.dim, "out"), table)
+        self.assertTrue(Operation.num_cse_deduplicated > num_deduplicated)
+        self.assertEqual(
+            code.count(
+                "Starting code block for Exp(-Sum((Var(0,3,0)-Var(1,3,1))**2))."
+            ),
+            1,
+        )
+
+    ############################################################
+    def test_common_subexpression_elimination_threads(self):
+        ############################################################
+        import re
+        import sys
+        import threading
+        from keopscore.formulas.GetReduction import GetReduction
+        from keopscore.utils.code_gen_utils import c_array
+
+        # the code of several formulas is generated at the same time by different threads :
+        # each code must declare all the arrays of repeated subformulas that it uses
+        kernels = [
+            "Exp(-Sum((x-y)**2))",
+            "Inv(1+Sum((x-y)**2))",
+            "Sqrt(1+Sum((x-y)**2))",
+        ]
+        formulas = [
+            f"Grad_WithSavedForward(Sum_Reduction({kernel}*b*{k},0), Concat(y,b), Var(3,2,0), Var(4,2,0))"
+            for kernel in kernels
+            for k in range(1, 6)
+        ]
+        aliases = ["x=Var(0,3,0)", "y=Var(1,3,1)", "b=Var(2,2,1)"]
+        table = [
+            c_array("float", dim, name)
+            for (name, dim) in (("x", 3), ("y", 3), ("b", 2), ("e", 2), ("r", 2))
+        ]
+        codes = [None] * len(formulas)
+
+        def generate(k):
+            red_formula = GetReduction(formulas[k], aliases)
+            out = c_array("float", red_formula.dim, "out")
+            codes[k] = "".join(red_formula.formula(out, table) for _ in range(20))
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [
+                threading.Thread(target=generate, args=(k,))
+                for k in range(len(formulas))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        for code in codes:
+            used = set(re.findall(r"\bcse_\w+", code))
+            self.assertTrue(len(used) > 0)
+            for name in used:
+                self.assertEqual(code.count(f"float {name}["), 1)
+
+    ############################################################
+    def test_formula_simplification(self):
+        ############################################################
+        import torch
+        from pykeops.torch import Genred
+        from keopscore.formulas.GetReduction import GetReduction
+
+        formula = "Minus(Minus(Sqrt(Square(x - y)))) * Sum(Log(Exp(s * b)))"
+
+        # the formula is simplified to Abs(x-y)*(s*b)
+        red_formula = GetReduction(
+            f"Sum_Reduction({formula},0)",
+            ["x=Var(0,3,0)", "y=Var(1,3,1)", "b=Var(2,1,1)", "s=Var(3,1,2)"],
+        )
+        for op in ("-(", "Sqrt", "Sum(", "Log"):
+            self.assertNotIn(op, repr(red_formula))
+
+        # check that the simplified formula gives the same results as the original one
+        aliases = ["x = Vi(3)", "y = Vj(3)", "b = Vj(1)", "s = Pm(1)"]
+        my_routine = Genred(formula, aliases, reduction_op="Sum", axis=1)
+
+        x, y, b, s = (
+            torch.tensor(t, dtype=torch.float64, requires_grad=True)
+            for t in (self.x, self.y, self.g, self.sigma)
+        )
+        res_keops = my_routine(x, y, b, s, backend="auto")
+        grads_keops = torch.autograd.grad(res_keops.sum(), [x, y, b, s])
+
+        D = x[:, None, :] - y[None, :, :]
+        sb = s * b[None, :, :]
+        res_torch = (-(-torch.sqrt(D**2)) * torch.log(torch.exp(sb))).sum(1)
+        grads_torch = torch.autograd.grad(res_torch.sum(), [x, y, b, s])
+
+        self.assertTrue(torch.allclose(res_keops, res_torch))
+        for g_keops, g_torch in zip(grads_keops, grads_torch):
+            self.assertTrue(torch.allclose(g_keops, g_torch))
+
+    ############################################################
+    def test_hoisted_subformulas(self):
+        ############################################################
+        import torch
+        from pykeops.torch import Genred
+        from keopscore.formulas.GetReduction import GetReduction
+
+        # Normalize(x), Sqrt(SqNorm2(x)) and Inv(Square(s)) do not depend on j,
+        # Normalize(y) does not depend on i
+        formula = "Exp(-SqNorm2(Normalize(x) - Normalize(y)) * Inv(Square(s))) * Sqrt(SqNorm2(x)) * b"
+        red_formula = GetReduction(
+            f"Sum_Reduction({formula},0)",
+            ["x=Var(0,3,0)", "y=Var(1,3,1)", "b=Var(2,2,1)", "s=Var(3,1,2)"],
+        )
+        self.assertEqual(len(red_formula.formula.independent_subformulas(1)), 3)
+        self.assertEqual(len(red_formula.formula.independent_subformulas(0)), 2)
+
+        aliases = ["x = Vi(3)", "y = Vj(3)", "b = Vj(2)", "s = Pm(1)"]
+        x, y, b, s = (
+            torch.tensor(t, dtype=torch.float64)
+            for t in (self.x, self.y, self.b[:, :2], self.sigma)
+        )
+        xn, yn = x / x.norm(dim=1, keepdim=True), y / y.norm(dim=1, keepdim=True)
+        K = torch.exp(-((xn[:, None] - yn[None]) ** 2).sum(-1) / s**2)
+        K = K * x.norm(dim=1)[:, None]
+
+        for axis, res_torch in ((1, K @ b), (0, K.sum(0)[:, None] * b)):
+            with self.subTest(axis=axis):
+                my_routine = Genred(formula, aliases, reduction_op="Sum", axis=axis)
+                res_keops = my_routine(x, y, b, s, backend="auto")
+                self.assertTrue(torch.allclose(res_keops, res_torch))
+
+        # batch mode uses the Cpu map-reduce scheme with ranges
+        my_routine = Genred(formula, aliases, reduction_op="Sum", axis=1)
+        res_keops = my_routine(
+            torch.stack((x, 2 * x)), y[None], b[None], s[None], backend="auto"
+        )
+        res_torch = torch.stack((K @ b, my_routine(2 * x, y, b, s)))
+        self.assertTrue(torch.allclose(res_keops, res_torch))
+
+    ############################################################
+    def test_block_sparse_reduction(self):
+        ############################################################
+        import torch
+        from pykeops.torch import Genred
+        from pykeops.torch.cluster import (
+            grid_cluster,
+            cluster_ranges_centroids,
+            sort_clusters,
+            from_matrix,
+        )
+
+        # many small clusters, processed in parallel by the Cpu map-reduce scheme with ranges
+        x = torch.rand(500, 2, dtype=torch.float64)
+        y = torch.rand(400, 2, dtype=torch.float64)
+        b = torch.randn(400, 2, dtype=torch.float64)
+        x_labels, y_labels = grid_cluster(x, 0.1), grid_cluster(y, 0.1)
+        x_ranges, x_centroids, _ = cluster_ranges_centroids(x, x_labels)
+        y_ranges, y_centroids, _ = cluster_ranges_centroids(y, y_labels)
+        x, x_labels = sort_clusters(x, x_labels)
+        (y, b), y_labels = sort_clusters((y, b), y_labels)
+        keep = ((x_centroids[:, None, :] - y_centroids[None, :, :]) ** 2).sum(2) < 0.1
+        ranges_ij = from_matrix(x_ranges, y_ranges, keep)
+
+        mask = keep[x_labels][:, y_labels]
+        K = torch.exp(-((x[:, None, :] - y[None, :, :]) ** 2).sum(2)) * mask
+
+        formula = "Exp(-SqDist(x,y)) * b"
+        for axis, aliases, b, res_torch in (
+            (1, ["x = Vi(2)", "y = Vj(2)", "b = Vj(2)"], b, K @ b),
+            (0, ["x = Vi(2)", "y = Vj(2)", "b = Vi(2)"], x, K.t() @ x),
+        ):
+            with self.subTest(axis=axis):
+                my_routine = Genred(formula, aliases, axis=axis)
+                res_keops = my_routine(x, y, b, ranges=ranges_ij, backend="CPU")
+                self.assertTrue(torch.allclose(res_keops, res_torch))
+
+    ############################################################
+    def test_generic_syntax_zero_gradients(self):
+        ############################################################
+        import torch
+        from keopscore.formulas import Zero_Reduction
+        from keopscore.formulas.GetReduction import GetReduction
+        from pykeops.torch import Genred
+
+        # fused gradients which are all equal to zero are not computed with a reduction
+        grad = GetReduction(
+            "Grad_WithSavedForward(ArgMin_Reduction(SqDist(Var(0,3,0),Var(1,3,1))*Var(2,1,2),0),"
+            "Concat(Var(0,3,0),Var(2,1,2)),Var(3,1,0),Var(4,1,0))"
+        )
+        self.assertTrue(isinstance(grad, Zero_Reduction))
+        self.assertTrue(grad.dim == 4 and grad.tagI == 0)
+
+        # c and p do not appear in the formula
+        aliases = ["x = Vi(3)", "y = Vj(3)", "c = Vi(2)", "p = Pm(1)"]
+        my_routine = Genred("SqDist(x,y)", aliases, reduction_op="Sum", axis=1)
+        x, y, c, p = (
+            torch.rand(*shape, dtype=torch.float64, requires_grad=True)
+            for shape in ((self.M, 3), (self.N, 3), (self.M, 2), (1,))
+        )
+        res = my_routine(x, y, c, p, backend="auto")
+        grads = torch.autograd.grad(res.sum(), [c, p])
+        for g, t in zip(grads, [c, p]):
+            self.assertTrue(g.shape == t.shape)
+            self.assertTrue(torch.all(g == 0))
+
     ############################################################
     def test_non_contiguity(self):
         ############################################################
@@ -413,6 +673,53 @@ class PytorchUnitTestCase(unittest.TestCase):
             )
         )
 
+    ############################################################
+    def test_invkernel_warm_start(self):
+        ############################################################
+        import torch
+        from pykeops.torch.operations import KernelSolve
+
+        formula = "Exp(-oos2*SqDist(x,y))*b"
+        aliases = [
+            "x = Vi(" + str(self.D) + ")",
+            "y = Vj(" + str(self.D) + ")",
+            "b = Vj(" + str(self.E) + ")",
+            "oos2 = Pm(1)",
+        ]
+        Kinv = KernelSolve(formula, aliases, "b", axis=1)
+        args = (self.xc, self.xc, self.ac, self.sigmac)
+        eps = 1e-6
+
+        iterates = []
+        stats = {}
+        c = Kinv(
+            *args, alpha=self.alphac, eps=eps, callback=iterates.append, stats=stats
+        )
+        self.assertTrue(stats["iterations"] > 1)
+        self.assertEqual(len(iterates), stats["iterations"])
+        self.assertEqual(len(stats["residuals"]), stats["iterations"] + 1)
+        # the callback receives the successive iterates, and not the final solution
+        for a_prev, a_next in zip(iterates[:-1], iterates[1:]):
+            self.assertFalse(torch.equal(a_prev, a_next))
+        self.assertTrue(torch.equal(iterates[-1], c))
+        self.assertTrue(torch.all(stats["residuals"][-1] < stats["residuals"][0]))
+        # each column of the right-hand side has converged
+        res = stats["residuals"][-1]
+        self.assertEqual(res.shape, (self.E,))
+        self.assertTrue(torch.all(res**2 < self.M * eps**2))
+
+        # starting from a good initial guess saves iterations
+        stats_warm = {}
+        c_warm = Kinv(*args, alpha=self.alphac, eps=eps, x0=c, stats=stats_warm)
+        self.assertTrue(stats_warm["iterations"] < stats["iterations"])
+        self.assertTrue(
+            np.allclose(
+                c.cpu().data.numpy().ravel(),
+                c_warm.cpu().data.numpy().ravel(),
+                atol=1e-4,
+            )
+        )
+
     ############################################################
     def test_softmax(self):
         ############################################################
@@ -676,6 +983,42 @@ class PytorchUnitTestCase(unittest.TestCase):
                 )
             )
 
+    ############################################################
+    def test_LazyTensor_Kmin_argKmin(self):
+        ############################################################
+        from unittest import mock
+
+        import keopscore
+        from pykeops.torch import LazyTensor
+        import torch
+
+        # small and large values of K, which use different Cpu implementations
+        x = torch.rand(50, 2, dtype=self.dtype, device=self.device)
+        y = torch.rand(1000, 2, dtype=self.dtype, device=self.device)
+        D_ij = (LazyTensor(x[:, None, :]) - LazyTensor(y[None, :, :])).abs()
+        D_torch = (x[:, None, :] - y[None, :, :]).abs()
+
+        for K in [5, 100]:
+            with self.subTest(K=K):
+                m, am = D_ij.Kmin_argKmin(K, dim=1)
+                m_torch, am_torch = D_torch.topk(K, dim=1, largest=False)
+                self.assertTrue(torch.allclose(m, m_torch))
+                self.assertTrue(torch.equal(am, am_torch))
+                self.assertTrue(torch.allclose(D_ij.Kmin(K, dim=1), m_torch))
+                self.assertTrue(torch.equal(D_ij.argKmin(K, dim=1), am_torch))
+                # with ranges, the generic Cpu implementation of the reduction is used
+                ranges_i, ranges_j, slices = (
+                    torch.tensor(r, dtype=torch.int32, device=self.device)
+                    for r in ([[0, 50]], [[0, 1000]], [1])
+                )
+                ranges = (ranges_i, slices, ranges_j, ranges_j, slices, ranges_i)
+                self.assertTrue(
+                    torch.equal(D_ij.argKmin(K, dim=1, ranges=ranges), am_torch)
+                )
+                # the generic implementation can also be selected for dense reductions
+                with mock.patch.object(keopscore, "use_cpu_kmin_scheme", False):
+                    self.assertTrue(torch.equal(D_ij.argKmin(K, dim=1), am_torch))
+
     ############################################################
     def test_TensorDot_with_permute(self):
         ############################################################
@@ -20,7 +20,7 @@ pykeopsconfig.gpu_available = torch.cuda.is_available()  # use torch to detect g
 ##########################################################
 # Import pyKeOps routines
 
-from .generic.generic_red import Genred
+from .generic.generic_red import Genred, merge_states
 from .generic.generic_ops import (
     generic_sum,
     generic_logsumexp,
@@ -33,6 +33,7 @@ from .lazytensor.LazyTensor import LazyTensor, ComplexLazyTensor, Vi, Vj, Pm
 __all__ = sorted(
     [
         "Genred",
+        "merge_states",
         "generic_sum",
         "generic_logsumexp",
         "generic_argmin",
@@ -0,0 +1,5 @@
+from .low_rank import LowRankKernel
+from .nystrom import Nystrom
+from .rff import RandomFourierFeatures
+
+__all__ = sorted(["LowRankKernel", "Nystrom", "RandomFourierFeatures"])
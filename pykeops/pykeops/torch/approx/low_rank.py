@@ -0,0 +1,80 @@
+import torch
+
+
+def eigh(A):
+    # eigenvalues and eigenvectors of the symmetric matrix A, for old and new PyTorch versions
+    if hasattr(torch, "linalg") and hasattr(torch.linalg, "eigh"):
+        return torch.linalg.eigh(A)
+    return torch.symeig(A, eigenvectors=True)
+
+
+class LowRankKernel:
+    r"""Base class for the low-rank approximations :math:`K_{xx} \simeq \Phi \Phi^\top`
+    of a kernel matrix, where :math:`\Phi` is a (N,m) matrix of features with :math:`m \ll N`.
+
+    Once fitted on the points :math:`x_i`, an approximation provides:
+
+      - fast matrix-vector products :math:`v \mapsto \Phi (\Phi^\top v)`, in :math:`O(N m)` operations,
+        with :meth:`matvec` or the ``@`` operator,
+      - preconditioners for the linear systems :math:`(\alpha \operatorname{Id} + K_{xx}) a = b`
+        with :meth:`preconditioner`, which are meant to be used with
+        the **precond** argument of :class:`KernelSolve <pykeops.torch.KernelSolve>`
+        and :meth:`LazyTensor.solve() <pykeops.common.lazy_tensor.GenericLazyTensor.solve>`.
+
+    This class is not meant to be used directly: use :class:`Nystrom`
+    or :class:`RandomFourierFeatures` instead.
+    """
+
+    def __init__(self, n_components=100):
+        if n_components < 1:
+            raise ValueError(
+                f"The number of components ({n_components}) should be positive."
+            )
+        self.n_components = n_components
+        self.phi = None
+
+    def features(self, y):
+        r"""Returns the (M,m) matrix of the features of the points **y**."""
+        raise NotImplementedError()
+
+    def _check_fitted(self):
+        if self.phi is None:
+            raise ValueError(
+                "The kernel approximation must be fitted before being used."
+            )
+
+    def _check_data(self, x):
+        if len(x.shape) != 2:
+            raise ValueError(
+                "The points of a kernel approximation should be a 2d array."
+            )
+
+    def matvec(self, v):
+        r"""Returns the approximation :math:`\Phi (\Phi^\top v)` of the product :math:`K_{xx} v`
+        of the kernel matrix with the (N,D) Tensor **v**."""
+        self._check_fitted()
+        return self.phi @ (self.phi.t() @ v)
+
+    def __matmul__(self, v):
+        return self.matvec(v)
+
+    def preconditioner(self, alpha):
+        r"""Returns the function :math:`r \mapsto (\alpha \operatorname{Id} + \Phi\Phi^\top)^{-1} r`,
+        which is computed with the Woodbury identity in :math:`O(N m)` operations.
+
+        Args:
+            alpha (float): The positive ridge regularization parameter of the linear system.
+        """
+        self._check_fitted()
+        if alpha <= 0:
+            raise ValueError(
+                "Low-rank preconditioners require a positive regularization parameter alpha."
+            )
+        phi = self.phi
+        eye = torch.eye(phi.shape[1], dtype=phi.dtype, device=phi.device)
+        A = torch.inverse(alpha * eye + phi.t() @ phi)
+
+        def precond(r):
+            return (r - phi @ (A @ (phi.t() @ r))) / alpha
+
+        return precond
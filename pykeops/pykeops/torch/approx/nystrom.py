@@ -0,0 +1,121 @@
+import torch
+
+from pykeops.torch import LazyTensor
+from pykeops.torch.approx.low_rank import LowRankKernel, eigh
+from pykeops.torch.knn import IVF
+
+
+class Nystrom(LowRankKernel):
+    r"""Nyström approximation :math:`K_{xx} \simeq K_{xz} K_{zz}^{-1} K_{zx}` of a kernel matrix,
+    where the :math:`z_k` are m landmark points.
+
+    The features are :math:`\Phi = K_{xz} U S^{-1/2}`, where :math:`K_{zz} = U S U^\top`
+    is the eigendecomposition of the kernel matrix of the landmarks
+    (whose negligible eigenvalues are discarded). All the kernel matrices are computed
+    with KeOps, so that any kernel written with LazyTensors can be approximated.
+
+    Example:
+        >>> x = torch.randn(100000, 3)
+        >>> gaussian = lambda x_i, y_j: (-((x_i - y_j) ** 2).sum(-1)).exp()
+        >>> K_approx = Nystrom(gaussian, n_components=200, landmarks="kmeans").fit(x)
+        >>> b = torch.randn(100000, 2)
+        >>> Kb = K_approx @ b  # O(N*m) approximation of K_xx @ b
+        >>> K_xx = gaussian(LazyTensor(x[:, None, :]), LazyTensor(x[None, :, :]))
+        >>> a = K_xx.solve(LazyTensor(b[:, None, :]), alpha=0.1, precond=K_approx.preconditioner(0.1))
+
+    Args:
+        kernel (function): A function of two LazyTensors ``x_i`` and ``y_j``,
+            which returns the symbolic kernel matrix :math:`k(x_i, y_j)`. The kernel
+            should be symmetric and positive definite.
+        n_components (int, default=100): The number m of landmark points.
+        landmarks (string, default="uniform"): The choice of the landmark points, one of:
+
+          - ``"uniform"``: m points of the dataset, sampled uniformly.
+          - ``"kmeans"``: the centroids of the clusters found by the K-means algorithm.
+          - ``"leverage"``: m points of the dataset, sampled according to their
+            approximate ridge leverage scores, which are computed with
+            a preliminary uniform Nyström approximation.
+
+        ridge (float, default=1e-3): The regularization parameter of the ridge
+            leverage scores.
+        Niter (int, default=10): The number of iterations of the K-means algorithm.
+        backend (string, default="auto"): The backend of the KeOps reductions.
+    """
+
+    landmark_methods = ["uniform", "kmeans", "leverage"]
+
+    def __init__(
+        self,
+        kernel,
+        n_components=100,
+        landmarks="uniform",
+        ridge=1e-3,
+        Niter=10,
+        backend="auto",
+    ):
+        super().__init__(n_components)
+        if landmarks not in self.landmark_methods:
+            raise ValueError(
+                f"Unknown landmarks '{landmarks}' for Nystrom approximation: it should be one of "
+                f"{self.landmark_methods}."
+            )
+        self.kernel = kernel
+        self.landmarks = landmarks
+        self.ridge = ridge
+        self.Niter = Niter
+        self.backend = backend
+
+    def kernel_matrix(self, x, y):
+        r"""Returns the dense (M,N) kernel matrix of the points **x** and **y**."""
+        # the rows of the kernel matrix are computed as the products with the identity matrix
+        eye = torch.eye(y.shape[0], dtype=y.dtype, device=y.device)
+        K_ij = self.kernel(LazyTensor(x[:, None, :]), LazyTensor(y[None, :, :]))
+        return (K_ij * LazyTensor(eye[None, :, :])).sum(dim=1, backend=self.backend)
+
+    def _set_landmarks(self, z):
+        s, U = eigh(self.kernel_matrix(z, z))
+        keep = s > s.max() * z.shape[0] * torch.finfo(s.dtype).eps
+        self.z = z
+        self.proj = U[:, keep] / s[keep].sqrt()
+
+    def fit(self, x):
+        r"""Computes the features of the points **x**.
+
+        Args:
+            x ((N,D) Tensor): The points :math:`x_i \in \mathbb{R}^D`.
+
+        Returns:
+            The fitted approximation.
+        """
+        self._check_data(x)
+        N, m = x.shape[0], self.n_components
+        if m > N:
+            raise ValueError(
+                f"The number of landmarks ({m}) should be smaller than the number of points ({N})."
+            )
+        x = x.contiguous()
+        if self.landmarks == "kmeans":
+            z = IVF().fit(x, clusters=m, Niter=self.Niter, backend=self.backend)
+            z = z.centroids
+        else:
+            z = x[torch.randperm(N, device=x.device)[:m]]
+
+        if self.landmarks == "leverage":
+            # ridge leverage scores phi_i^T (Phi^T Phi + ridge * Id)^-1 phi_i
+            self._set_landmarks(z)
+            phi = self.features(x)
+            eye = torch.eye(phi.shape[1], dtype=phi.dtype, device=phi.device)
+            A = torch.inverse(phi.t() @ phi + self.ridge * eye)
+            scores = ((phi @ A) * phi).sum(1).clamp(min=0)
+            z = x[torch.multinomial(scores, m, replacement=False)]
+
+        self._set_landmarks(z.contiguous())
+        self.phi = self.features(x)
+        return self
+
+    def features(self, y):
+        r"""Returns the (M,m') matrix :math:`K_{yz} U S^{-1/2}` of the features of the points **y**,
+        where :math:`m' \leqslant m` is the numerical rank of :math:`K_{zz}`."""
+        if not hasattr(self, "z"):
+            self._check_fitted()
+        return self.kernel_matrix(y.contiguous(), self.z) @ self.proj
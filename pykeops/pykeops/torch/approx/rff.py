@@ -0,0 +1,77 @@
+import math
+
+import torch
+
+from pykeops.torch.approx.low_rank import LowRankKernel
+
+
+class RandomFourierFeatures(LowRankKernel):
+    r"""Random Fourier features approximation :math:`K_{xx} \simeq \Phi \Phi^\top` of a
+    translation-invariant kernel matrix, with
+    :math:`\Phi_{ik} = \sqrt{2/m} \cos(\langle w_k, x_i \rangle + b_k)`,
+    where the frequencies :math:`w_k` are sampled from the Fourier transform of the kernel,
+    and the phases :math:`b_k` uniformly in :math:`[0, 2\pi)`.
+
+    Unlike :class:`Nystrom`, this approximation does not depend on the data, but only
+    supports the kernels whose Fourier transform is known:
+
+      - ``"gaussian"``: :math:`k(x,y) = \exp(-\|x-y\|^2 / \sigma^2)`, with Gaussian frequencies,
+      - ``"laplacian"``: :math:`k(x,y) = \exp(-\|x-y\| / \sigma)`, with multivariate Cauchy frequencies.
+
+    Example:
+        >>> x = torch.randn(100000, 3)
+        >>> K_approx = RandomFourierFeatures("gaussian", sigma=0.5, n_components=1000).fit(x)
+        >>> b = torch.randn(100000, 2)
+        >>> Kb = K_approx @ b  # O(N*m) approximation of K_xx @ b
+
+    Args:
+        kernel (string, default="gaussian"): The kernel, ``"gaussian"`` or ``"laplacian"``.
+        sigma (float, default=1.0): The bandwidth :math:`\sigma` of the kernel.
+        n_components (int, default=100): The number m of random features.
+    """
+
+    kernels = ["gaussian", "laplacian"]
+
+    def __init__(self, kernel="gaussian", sigma=1.0, n_components=100):
+        super().__init__(n_components)
+        if kernel not in self.kernels:
+            raise ValueError(
+                f"Unknown kernel '{kernel}' for random Fourier features: it should be one of "
+                f"{self.kernels}."
+            )
+        self.kernel = kernel
+        self.sigma = sigma
+
+    def kernel_function(self, x_i, y_j):
+        r"""Returns the exact symbolic kernel matrix of LazyTensors **x_i** and **y_j**."""
+        if self.kernel == "gaussian":
+            return (-((x_i - y_j) ** 2).sum(-1) / self.sigma**2).exp()
+        else:
+            return (-((x_i - y_j) ** 2).sum(-1).sqrt() / self.sigma).exp()
+
+    def fit(self, x):
+        r"""Samples the random frequencies and computes the features of the points **x**.
+
+        Args:
+            x ((N,D) Tensor): The points :math:`x_i \in \mathbb{R}^D`.
+
+        Returns:
+            The fitted approximation.
+        """
+        self._check_data(x)
+        D, m = x.shape[1], self.n_components
+        w = torch.randn(D, m, dtype=x.dtype, device=x.device)
+        if self.kernel == "gaussian":
+            self.w = w * math.sqrt(2) / self.sigma
+        else:
+            g = torch.randn(1, m, dtype=x.dtype, device=x.device)
+            self.w = w / (g.abs() * self.sigma)
+        self.b = 2 * math.pi * torch.rand(m, dtype=x.dtype, device=x.device)
+        self.phi = self.features(x)
+        return self
+
+    def features(self, y):
+        r"""Returns the (M,m) matrix of the random Fourier features of the points **y**."""
+        if not hasattr(self, "w"):
+            self._check_fitted()
+        return math.sqrt(2 / self.n_components) * torch.cos(y @ self.w + self.b)
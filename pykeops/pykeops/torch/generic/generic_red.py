@@ -1,18 +1,102 @@
 import torch
+import keopscore
 
 from pykeops.common.get_options import get_tag_backend
 from pykeops.common.operations import preprocess, postprocess
+from pykeops.common.reduction_state import state_reduction, get_state
+from pykeops.common.reduction_state import merge_states as merge_states_generic
+from pykeops.common.sharded import sharded_reduction
+from pykeops.common.executor import submit
+from pykeops.common.threads import get_num_threads, num_threads_scope
+from pykeops.common.strides import check_strides, use_strides
 from pykeops.common.parse_type import (
     get_type,
     get_sizes,
     complete_aliases,
     get_optional_flags,
+    use_int64_index,
+    use_tiles,
 )
 from pykeops.common.utils import axis2cat
 from pykeops import default_device_id
 from pykeops.common.utils import pyKeOps_Warning
 
 
+def get_keops_routine(
+    formula,
+    aliases,
+    backend,
+    dtype,
+    device_id_request,
+    ranges,
+    optional_flags,
+    rec_multVar_highdim,
+    args,
+):
+    # Returns the KeOps routine which computes the reduction on the input tensors args,
+    # with the device of the tensors, the requested device id and the number of batch dimensions.
+    # N.B. when rec_multVar_highdim option is set, it means that formula is of the form "sum(F*b)", where b is a variable
+    # with large dimension. In this case we set option multVar_highdim to allow for the use of the special "final chunk" computation
+    # mode. However, this may not be also true for the gradients of the same formula. In fact only the gradient
+    # with respect to variable b will have the same form. Hence, GenredAutograd saves optional_flags current status
+    # before calling this function.
+    if rec_multVar_highdim:
+        optional_flags["multVar_highdim"] = 1
+    else:
+        optional_flags["multVar_highdim"] = 0
+
+    tagCPUGPU, tag1D2D, tagHostDevice = get_tag_backend(backend, args)
+
+    # number of batch dimensions
+    # N.B. we assume here that there is at least a cat=0 or cat=1 variable in the formula...
+    nbatchdims = max(len(arg.shape) for arg in args) - 2
+    use_ranges = nbatchdims > 0 or ranges
+
+    device_args = args[0].device
+    if tagCPUGPU == 1 & tagHostDevice == 1:
+        for i in range(1, len(args)):
+            if args[i].device.index != device_args.index:
+                raise ValueError(
+                    "[KeOps] Input arrays must be all located on the same device."
+                )
+
+    if device_id_request == -1:  # -1 means auto setting
+        if device_args.index:  # means args are on Gpu
+            device_id_request = device_args.index
+        else:
+            device_id_request = default_device_id if tagCPUGPU == 1 else -1
+    else:
+        if device_args.index:
+            if device_args.index != device_id_request:
+                raise ValueError(
+                    "[KeOps] Gpu device id of arrays is different from device id requested for computation."
+                )
+
+    from pykeops.common.keops_io import keops_binder
+    from pykeops.torch.utils import torchtools
+
+    myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
+        tagCPUGPU,
+        tag1D2D,
+        tagHostDevice,
+        use_ranges,
+        device_id_request,
+        formula,
+        aliases,
+        len(args),
+        dtype,
+        "torch",
+        dict(
+            optional_flags,
+            use_int64_index=use_int64_index(args),
+            use_strides=use_strides(args, torchtools, tagCPUGPU),
+            use_tiles=use_tiles(aliases, args),
+        ),
+    ).import_module()
+
+    return myconv, device_args, device_id_request, nbatchdims
+
+
 class GenredAutograd(torch.autograd.Function):
     """
     This class is the entry point to pytorch auto grad engine.
@@ -32,61 +116,27 @@ class GenredAutograd(torch.autograd.Function):
         nx,
         ny,
         out,
-        *args
+        *args,
     ):
-        # N.B. when rec_multVar_highdim option is set, it means that formula is of the form "sum(F*b)", where b is a variable
-        # with large dimension. In this case we set option multVar_highdim to allow for the use of the special "final chunk" computation
-        # mode. However, this may not be also true for the gradients of the same formula. In fact only the gradient
-        # with respect to variable b will have the same form. Hence, we save optional_flags current status into ctx,
-        # before adding the multVar_highdim option.
-        ctx.optional_flags = optional_flags.copy()
-        if rec_multVar_highdim:
-            optional_flags["multVar_highdim"] = 1
-        else:
-            optional_flags["multVar_highdim"] = 0
+        # N.B.: the Cpu routines read strided tensors in place, while the Gpu routines
+        # expect contiguous data arrays (see pykeops.common.strides)
+        from pykeops.torch.utils import torchtools
 
-        tagCPUGPU, tag1D2D, tagHostDevice = get_tag_backend(backend, args)
+        args = check_strides(args, torchtools, get_tag_backend(backend, args)[0])
 
-        # number of batch dimensions
-        # N.B. we assume here that there is at least a cat=0 or cat=1 variable in the formula...
-        nbatchdims = max(len(arg.shape) for arg in args) - 2
-        use_ranges = nbatchdims > 0 or ranges
-
-        device_args = args[0].device
-        if tagCPUGPU == 1 & tagHostDevice == 1:
-            for i in range(1, len(args)):
-                if args[i].device.index != device_args.index:
-                    raise ValueError(
-                        "[KeOps] Input arrays must be all located on the same device."
-                    )
-
-        if device_id_request == -1:  # -1 means auto setting
-            if device_args.index:  # means args are on Gpu
-                device_id_request = device_args.index
-            else:
-                device_id_request = default_device_id if tagCPUGPU == 1 else -1
-        else:
-            if device_args.index:
-                if device_args.index != device_id_request:
-                    raise ValueError(
-                        "[KeOps] Gpu device id of arrays is different from device id requested for computation."
-                    )
-
-        from pykeops.common.keops_io import keops_binder
-
-        myconv = keops_binder["nvrtc" if tagCPUGPU else "cpp"](
-            tagCPUGPU,
-            tag1D2D,
-            tagHostDevice,
-            use_ranges,
-            device_id_request,
+        # see get_keops_routine for the multVar_highdim option
+        ctx.optional_flags = optional_flags.copy()
+        myconv, device_args, device_id_request, nbatchdims = get_keops_routine(
             formula,
             aliases,
-            len(args),
+            backend,
             dtype,
-            "torch",
+            device_id_request,
+            ranges,
             optional_flags,
-        ).import_module()
+            rec_multVar_highdim,
+            args,
+        )
 
         # Context variables: save everything to compute the gradient:
         ctx.formula = formula
@@ -99,15 +149,7 @@ class GenredAutograd(torch.autograd.Function):
         ctx.myconv = myconv
         ctx.nx = nx
         ctx.ny = ny
-
-        # N.B.: KeOps C++ expects contiguous data arrays
-        test_contig = all(arg.is_contiguous() for arg in args)
-        if not test_contig:
-            pyKeOps_Warning(
-                "at least one of the input tensors is not contiguous. "
-                + "Consider using contiguous data arrays to avoid unnecessary copies."
-            )
-            args = tuple(arg.contiguous() for arg in args)
+        ctx.num_threads = get_num_threads()
 
         # N.B.: KeOps C++ expects contiguous integer arrays as ranges
         if ranges:
@@ -117,14 +159,21 @@ class GenredAutograd(torch.autograd.Function):
             device_args, ranges, nx, ny, nbatchdims, out, *args
         )
 
+        result_ind = None
+        if isinstance(result, tuple):
+            # the indices computed by Arg type reductions are returned
+            # in a separate tensor of integers, which is not differentiable
+            result, result_ind = result
+            ctx.mark_non_differentiable(result_ind)
+
         # relying on the 'ctx.saved_variables' attribute is necessary  if you want to be able to differentiate the output
         #  of the backward once again. It helps pytorch to keep track of 'who is who'.
         ctx.save_for_backward(*args, result)
 
-        return result
+        return result if result_ind is None else (result, result_ind)
 
     @staticmethod
-    def backward(ctx, G):
+    def backward(ctx, G, *G_ind):
         formula = ctx.formula
         aliases = ctx.aliases
         backend = ctx.backend
@@ -186,79 +235,103 @@ class GenredAutograd(torch.autograd.Function):
             + ")"
         )
 
-        # convert to contiguous:
-        G = G.contiguous()
-
-        grads = []  # list of gradients wrt. args;
-
-        for var_ind, (sig, arg_ind) in enumerate(
-            zip(aliases, args)
-        ):  # Run through the arguments
-            # If the current gradient is to be discarded immediatly...
-            if not ctx.needs_input_grad[
+        # N.B.: G is often an expanded tensor, e.g. for the gradient of a sum, which is read
+        # in place by the Cpu routines (see GenredAutograd.forward)
+
+        # in Cpu mode, the outputs of float16 and bfloat16 routines are float32 tensors
+        # (see pykeops.common.operations.postprocess), which are cast back to the dtype of
+        # the inputs, since all the arguments of a routine must have the same dtype.
+        if G.dtype != args[0].dtype:
+            G, result = G.to(args[0].dtype), result.to(args[0].dtype)
+
+        # Adding new aliases is way too dangerous if we want to compute
+        # second derivatives, etc. So we make explicit references to Var<ind,dim,cat> instead.
+        # New here (Joan) : we still add the new variables to the list of "aliases" (without
+        # giving new aliases for them) these will not be used in the C++ code,
+        # but are useful to keep track of the actual variables used in the formula
+        aliases_g = aliases + [eta, resvar]
+        args_g = args + (G,) + (result,)  # Don't forget the gradient to backprop !
+
+        # Gradients which are really needed by the user are grouped according to the axis of
+        # the gradient reduction : i-indexed variables and parameters on one side, j-indexed variables
+        # on the other side. The gradients of each group are computed with a single reduction which
+        # outputs their concatenation, so that the formula is evaluated only once per pair (i,j).
+        groups = ([], [])
+        for var_ind, sig in enumerate(aliases):  # Run through the arguments
+            # If the current gradient is to be discarded immediatly, don't waste time computing it.
+            if ctx.needs_input_grad[
                 var_ind + 11
             ]:  # because of (formula, aliases, backend, dtype, device_id_request, ranges, optional_flags, rec_multVar_highdim, nx, ny, out)
-                grads.append(None)  # Don't waste time computing it.
-
-            else:
-                # Otherwise, the current gradient is really needed by the user. Adding new aliases is way too dangerous if we want to compute
-                # second derivatives, etc. So we make explicit references to Var<ind,dim,cat> instead.
-                # New here (Joan) : we still add the new variables to the list of "aliases" (without
-                # giving new aliases for them) these will not be used in the C++ code,
-                # but are useful to keep track of the actual variables used in the formula
                 _, cat, dim, pos = get_type(sig, position_in_list=var_ind)
-                var = "Var(" + str(pos) + "," + str(dim) + "," + str(cat) + ")"  # V
-                formula_g = (
-                    "Grad_WithSavedForward("
-                    + formula
-                    + ", "
-                    + var
-                    + ", "
-                    + eta
-                    + ", "
-                    + resvar
-                    + ")"
-                )  # Grad<F,V,G,R>
-                aliases_g = aliases + [eta, resvar]
-                args_g = (
-                    args + (G,) + (result,)
-                )  # Don't forget the gradient to backprop !
-
-                # N.B.: if I understand PyTorch's doc, we should redefine this function every time we use it?
-                genconv = GenredAutograd.apply
-
-                # For a reduction of the type sum(F*b), with b a variable, and if we require the gradient
-                # with respect to b, the gradient will be of same type sum(F*eta). So we set again rec_multVar option
-                # in this case.
-                if (
-                    not isinstance(ctx.rec_multVar_highdim, bool)
-                    and pos == ctx.rec_multVar_highdim
-                ):
-                    rec_multVar_highdim = (
-                        nargs  # nargs is the position of variable eta.
-                    )
-                else:
-                    rec_multVar_highdim = None
+                groups[cat % 2].append((var_ind, cat, dim, pos))
+
+        grads = [None] * nargs  # list of gradients wrt. args;
+
+        for group in groups:
+            if not group:
+                continue
+
+            var = None
+            for _, cat, dim, pos in group:
+                var_k = "Var(" + str(pos) + "," + str(dim) + "," + str(cat) + ")"  # V
+                var = var_k if var is None else "Concat(" + var + "," + var_k + ")"
+            formula_g = (
+                "Grad_WithSavedForward("
+                + formula
+                + ", "
+                + var
+                + ", "
+                + eta
+                + ", "
+                + resvar
+                + ")"
+            )  # Grad<F,V,G,R>
+
+            # N.B.: if I understand PyTorch's doc, we should redefine this function every time we use it?
+            genconv = GenredAutograd.apply
+
+            # For a reduction of the type sum(F*b), with b a variable, and if we require the gradient
+            # with respect to b only, the gradient will be of same type sum(F*eta). So we set again rec_multVar option
+            # in this case.
+            if (
+                len(group) == 1
+                and not isinstance(ctx.rec_multVar_highdim, bool)
+                and group[0][3] == ctx.rec_multVar_highdim
+            ):
+                rec_multVar_highdim = nargs  # nargs is the position of variable eta.
+            else:
+                rec_multVar_highdim = None
+
+            # the gradients are computed with the number of threads of the forward call
+            with num_threads_scope(ctx.num_threads):
+                grad_group = genconv(
+                    formula_g,
+                    aliases_g,
+                    backend,
+                    dtype,
+                    device_id_request,
+                    ranges,
+                    optional_flags,
+                    rec_multVar_highdim,
+                    nx,
+                    ny,
+                    None,
+                    *args_g,
+                )
+
+            offset = 0
+            for var_ind, cat, dim, pos in group:
+                arg_ind = args[var_ind]
+                grad = grad_group
+                if len(group) > 1:
+                    grad = grad_group[..., offset : offset + dim]
+                    offset += dim
 
                 if (
                     cat == 2
                 ):  # we're referring to a parameter, so we'll have to sum both wrt 'i' and 'j'
                     # WARNING !! : here we rely on the implementation of DiffT in files in folder keopscore/core/formulas/reductions
                     # if tagI==cat of V is 2, then reduction is done wrt j, so we need to further sum output wrt i
-                    grad = genconv(
-                        formula_g,
-                        aliases_g,
-                        backend,
-                        dtype,
-                        device_id_request,
-                        ranges,
-                        optional_flags,
-                        rec_multVar_highdim,
-                        nx,
-                        ny,
-                        None,
-                        *args_g
-                    )
                     # Then, sum 'grad' wrt 'i' :
                     # I think that '.sum''s backward introduces non-contiguous arrays,
                     # and is thus non-compatible with GenredAutograd: grad = grad.sum(0)
@@ -275,21 +348,6 @@ class GenredAutograd(torch.autograd.Function):
                     )
 
                 else:
-                    grad = genconv(
-                        formula_g,
-                        aliases_g,
-                        backend,
-                        dtype,
-                        device_id_request,
-                        ranges,
-                        optional_flags,
-                        rec_multVar_highdim,
-                        nx,
-                        ny,
-                        None,
-                        *args_g
-                    )
-
                     # N.B.: 'grad' is always a full [A, .., B, M, D] or [A, .., B, N, D] or [A, .., B, D] tensor,
                     #       whereas 'arg_ind' may have some broadcasted batched dimensions.
                     #       Before returning our gradient, we must collapse 'grad' with a .sum() operation,
@@ -308,7 +366,7 @@ class GenredAutograd(torch.autograd.Function):
                 grad = grad.reshape(
                     arg_ind.shape
                 )  # The gradient should have the same shape as the input!
-                grads.append(grad)
+                grads[var_ind] = grad
 
         # Grads wrt. formula, aliases, backend, dtype, device_id_request, ranges, optional_flags, rec_multVar_highdim, nx, ny, out, *args
         return (
@@ -363,6 +421,9 @@ class Genred:
 
     """
 
+    # maximal number of entries of the launches dict of an instance
+    max_launches = 64
+
     def __init__(
         self,
         formula,
@@ -429,6 +490,11 @@ class Genred:
                   - **dtype_acc** = ``"float32"`` : allowed only if dtype is "float16" or "float32".
                   - **dtype_acc** = ``"float64"`` : allowed only if dtype is "float32" or "float64"..
 
+                In Cpu mode, float16 (and, with PyTorch, bfloat16) data is read directly from the input
+                arrays and converted to float32 when it is loaded: the computations are performed in float32,
+                the reductions are accumulated in float32 (default) or float64, and the output is cast back to
+                the dtype of the inputs.
+
             use_double_acc (bool, default False): same as setting dtype_acc="float64" (only one of the two options can be set)
                 If True, accumulate results of reduction in float64 variables, before casting to float32.
                 This can only be set to True when data is in float32 or float64.
@@ -460,6 +526,24 @@ class Genred:
                 "keyword argument cuda_type in Genred is deprecated ; argument is ignored."
             )
 
+        # arguments of the routine, used to build the routines of state and
+        # sharded reductions (see get_state_routine)
+        self.init_args = (
+            formula,
+            aliases,
+            formula2,
+            dict(
+                axis=axis,
+                opt_arg=opt_arg,
+                dtype_acc=dtype_acc,
+                use_double_acc=use_double_acc,
+                sum_scheme=sum_scheme,
+                enable_chunks=enable_chunks,
+                rec_multVar_highdim=rec_multVar_highdim,
+            ),
+        )
+        self.state_routine = None
+
         self.reduction_op = reduction_op
         reduction_op_internal, formula2 = preprocess(reduction_op, formula2)
 
@@ -492,7 +576,60 @@ class Genred:
 
         self.rec_multVar_highdim = rec_multVar_highdim
 
-    def __call__(self, *args, backend="auto", device_id=-1, ranges=None, out=None):
+        # KeOps routines which were used by previous calls, indexed by the
+        # shapes, dtype and device of the inputs (see __call__)
+        self.launches = {}
+
+    def get_state_routine(self):
+        r"""
+        Returns the routine which computes the state of the reduction, i.e. partial
+        results which can be merged (see :mod:`pykeops.common.reduction_state`),
+        and the name of its reduction.
+        """
+        if self.state_routine is None:
+            formula, aliases, formula2, kwargs = self.init_args
+            state_op, formula2 = state_reduction(self.reduction_op, formula2)
+            if state_op == self.reduction_op:
+                self.state_routine = self
+            else:
+                self.state_routine = Genred(
+                    formula, aliases, reduction_op=state_op, formula2=formula2, **kwargs
+                )
+        return self.state_routine, self.state_routine.reduction_op
+
+    def submit(self, *args, **kwargs):
+        r"""
+        Schedules a call of the routine in a thread pool, and returns a
+        :class:`concurrent.futures.Future` of its output.
+
+        The arguments are those of :meth:`__call__`, and the call is performed with the
+        gradient mode of the current thread. KeOps routines release the GIL during the
+        computations, so that independent reductions overlap with each other and with
+        the Python code of other threads.
+
+        Example:
+            >>> future = my_conv.submit(x, y)
+            >>> ...  # other computations
+            >>> a = future.result()
+        """
+        grad_enabled = torch.is_grad_enabled()
+
+        def call():
+            with torch.set_grad_enabled(grad_enabled):
+                return self(*args, **kwargs)
+
+        return submit(call)
+
+    def __call__(
+        self,
+        *args,
+        backend="auto",
+        device_id=-1,
+        ranges=None,
+        out=None,
+        return_state=False,
+        num_threads=None,
+    ):
         r"""
         To apply the routine on arbitrary torch Tensors.
 
@@ -513,12 +650,16 @@ class Genred:
                     - All ``Vj(Dim_k)`` variables are encoded as **2d-tensors** with ``Dim_k`` columns and the same number of lines :math:`N`.
                     - All ``Pm(Dim_k)`` variables are encoded as **1d-tensors** (vectors) of size ``Dim_k``.
 
+                In Cpu mode, non contiguous tensors whose lines are evenly spaced in memory, e.g. slices
+                of columns, transposed or broadcasted tensors, are read in place. The other ones are copied.
+
         Keyword Args:
             backend (string): Specifies the map-reduce scheme.
                 The supported values are:
 
                     - ``"auto"`` (default): let KeOps decide which backend is best suited to your data, based on the tensors' shapes. ``"GPU_1D"`` will be chosen in most cases.
                     - ``"CPU"``: use a simple C++ ``for`` loop on a single CPU core.
+                    - ``"CPU_sharded"``: split the output axis across a pool of worker processes, pinned to the NUMA nodes of the machine, which use the ``"CPU"`` scheme (see :func:`pykeops.set_sharded_workers`). Input arrays are copied in shared memory for each call, unless they were allocated with :func:`pykeops.shared_empty`. Batch dimensions and **ranges** are not supported, and **out** must have the shape of the result.
                     - ``"GPU_1D"``: use a `simple multithreading scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv1D.cu>`_ on the GPU - basically, one thread per value of the output index.
                     - ``"GPU_2D"``: use a more sophisticated `2D parallelization scheme <https://github.com/getkeops/keops/blob/main/keops/core/GpuConv2D.cu>`_ on the GPU.
                     - ``"GPU"``: let KeOps decide which one of the ``"GPU_1D"`` or the ``"GPU_2D"`` scheme will run faster on the given input.
@@ -593,6 +734,22 @@ class Genred:
                 If provided, the output array should all have the same ``dtype``, be **contiguous** and be stored on
                 the **same device** as the arguments. Moreover it should have the correct shape for the output.
 
+            return_state (bool, default False): If True, returns the *state* of the reduction
+                instead of its output: partial results, computed e.g. on a shard of the reduced
+                variables, which can be merged exactly with :func:`merge_states`.
+                States of ``ArgMin``, ``ArgMax``, ``Min_ArgMin`` and ``Max_ArgMax`` reductions are pairs
+                of (M,D) tensors of values and indices, states of ``KMin``, ``ArgKMin`` and
+                ``KMin_ArgKMin`` reductions are pairs of (M,K,D) tensors of values and indices, and states
+                of ``LogSumExp`` and ``SumSoftMaxWeight`` reductions are the (M,1+D) tensors
+                of the maxima :math:`m_i` and of the sums :math:`s_i` of the underlying
+                ``Max_SumShiftExp`` reductions. States of other reductions are their outputs.
+                States are not differentiable.
+
+            num_threads (int, None by default): Number of OpenMP threads used by the Cpu
+                backends for this call, and for the computation of its gradients. If None, we
+                use the value set with :func:`pykeops.set_num_threads`, or the OpenMP default.
+                With the ``"CPU_sharded"`` backend, this is the number of threads of each worker process.
+
         Returns:
             (M,D) or (N,D) Tensor:
 
@@ -604,16 +761,89 @@ class Genred:
 
         """
 
+        if num_threads is not None:
+            with num_threads_scope(num_threads):
+                return self(
+                    *args,
+                    backend=backend,
+                    device_id=device_id,
+                    ranges=ranges,
+                    out=out,
+                    return_state=return_state,
+                )
+
+        if return_state:
+            if out is not None:
+                raise ValueError("The out argument is not supported with return_state.")
+            state_routine, state_op = self.get_state_routine()
+            with torch.no_grad():
+                out = state_routine(
+                    *args, backend=backend, device_id=device_id, ranges=ranges
+                )
+            return get_state(out, state_op, max(len(arg.shape) for arg in args) - 2)
+
+        if backend == "CPU_sharded":
+            if ranges is not None:
+                raise ValueError(
+                    "The CPU_sharded backend does not support the ranges argument."
+                )
+            if torch.is_grad_enabled() and any(arg.requires_grad for arg in args):
+                raise ValueError("The CPU_sharded backend does not support autograd.")
+            if any(arg.is_cuda for arg in args) or (out is not None and out.is_cuda):
+                raise ValueError("The CPU_sharded backend requires Cpu tensors.")
+            formula, aliases, formula2, kwargs = self.init_args
+            # N.B. the numpy arrays share the memory of the tensors
+            res = sharded_reduction(
+                (formula, aliases, self.reduction_op, formula2, kwargs),
+                self.axis,
+                [arg.numpy() for arg in args],
+                out=None if out is None else out.numpy(),
+            )
+            if out is not None:
+                return out
+            if isinstance(res, tuple):
+                return tuple(torch.from_numpy(r) for r in res)
+            return torch.from_numpy(res)
+
         dtype = args[0].dtype.__str__().split(".")[1]
 
+        # Once the KeOps routine has been loaded for inputs with given shapes, dtype and device,
+        # the calls which do not require gradients skip the checks below and the autograd engine,
+        # and go straight to the routine. The routine also depends on the global option
+        # keopscore.use_cpu_kmin_scheme.
+        launch_key = (
+            backend,
+            device_id,
+            bool(ranges),
+            args[0].device,
+            dtype,
+            keopscore.use_cpu_kmin_scheme,
+        ) + tuple(arg.shape for arg in args)
+        launch = self.launches.get(launch_key)
+        if (
+            launch is not None
+            and not (torch.is_grad_enabled() and any(arg.requires_grad for arg in args))
+            and all(arg.is_contiguous() for arg in args)
+        ):
+            myconv, device_args, nx, ny, nbatchdims, nout = launch
+            if ranges:
+                ranges = tuple(r.contiguous() for r in ranges)
+            out = myconv.genred_pytorch(
+                device_args, ranges, nx, ny, nbatchdims, out, *args
+            )
+            return postprocess(
+                out, "torch", self.reduction_op, nout, self.opt_arg, dtype
+            )
+
         nx, ny = get_sizes(self.aliases, *args)
         nout, nred = (nx, ny) if self.axis == 1 else (ny, nx)
 
-        if "Arg" in self.reduction_op:
-            # when using Arg type reductions,
+        if "Arg" in self.reduction_op and get_tag_backend(backend, args)[0] == 1:
+            # when using Arg type reductions in Gpu mode,
             # if nred is greater than 16 millions and dtype=float32, the result is not reliable
             # because we encode indices as floats, so we raise an exception ;
-            # same with float16 type and nred>2048
+            # same with float16 type and nred>2048.
+            # N.B. in Cpu mode, indices are written in a separate array of integers.
             if nred > 1.6e7 and dtype in ("float32", "float"):
                 raise ValueError(
                     "size of input array is too large for Arg type reduction with single precision. Use double precision."
@@ -635,7 +865,64 @@ class Genred:
             nx,
             ny,
             out,
-            *args
+            *args,
         )
 
+        # the calls on contiguous tensors go straight to the routine, which must not be
+        # the one compiled for strided tensors
+        if launch is None and all(arg.is_contiguous() for arg in args):
+            if len(self.launches) >= self.max_launches:
+                self.launches.clear()
+            myconv, device_args, _, nbatchdims = get_keops_routine(
+                self.formula,
+                self.aliases,
+                backend,
+                dtype,
+                device_id,
+                ranges,
+                self.optional_flags,
+                self.rec_multVar_highdim,
+                args,
+            )
+            self.launches[launch_key] = (myconv, device_args, nx, ny, nbatchdims, nout)
+
         return postprocess(out, "torch", self.reduction_op, nout, self.opt_arg, dtype)
+
+
+def merge_states(states, reduction_op="Sum", offsets=None, return_state=False):
+    r"""
+    Merges the states of a reduction computed on several shards of the reduced variables.
+
+    Example:
+        >>> my_conv = Genred('-SqDist(x,y)', ['x = Vi(3)', 'y = Vj(3)'],
+        ...                  reduction_op='LogSumExp', axis=1)
+        >>> x, y = torch.randn(1000, 3), torch.randn(20000, 3)
+        >>> states = [my_conv(x, y[:10000], return_state=True),
+        ...           my_conv(x, y[10000:], return_state=True)]
+        >>> lse = merge_states(states, 'LogSumExp')
+        >>> torch.allclose(lse, my_conv(x, y))
+        True
+
+    Args:
+        states (list of Tensors or pairs of Tensors): The states of the reduction, as returned by
+            :meth:`Genred.__call__` with **return_state** = True.
+
+    Keyword Args:
+        reduction_op (string, default = ``"Sum"``): The reduction of the :class:`Genred` routine
+            which computed the states.
+        offsets (list of integers, default = None): The positions of the first lines of the shards
+            in the full tensors of reduced variables, which are added to the indices of the states
+            of Arg type reductions. By default, indices are left unchanged.
+        return_state (bool, default False): If True, returns the merged state instead of the
+            output of the reduction, e.g. to merge it again with other states.
+
+    Returns:
+        The output of the reduction (or its state) on the union of the shards.
+        Merging states is associative, and ties are resolved in favor of the first states,
+        as in KeOps reductions.
+    """
+    from pykeops.torch.utils import torchtools
+
+    return merge_states_generic(
+        states, reduction_op, torchtools, "torch", offsets, return_state
+    )
@@ -0,0 +1,3 @@
+from .ivf import IVF
+
+__all__ = sorted(["IVF"])
@@ -0,0 +1,78 @@
+import torch
+
+from pykeops.common.ivf import GenericIVF
+from pykeops.torch import LazyTensor
+from pykeops.torch.cluster import from_matrix
+from pykeops.torch.utils import torchtools
+
+
+class IVF(GenericIVF):
+    r"""Inverted file (IVF) index for approximate K-nearest neighbors search, with PyTorch tensors.
+
+    Example:
+        >>> x = torch.randn(100000, 3)
+        >>> index = IVF().fit(x, clusters=300)
+        >>> q = torch.randn(1000, 3)
+        >>> indices = index.kneighbors(q, K=10, nprobe=5)  # (1000, 10) LongTensor
+        >>> index.save("index.pt")
+        >>> index = IVF.load("index.pt")
+
+    See :class:`pykeops.common.ivf.GenericIVF` for a description of the algorithm.
+
+    Args:
+        metric (string or function, default="euclidean"): The distance, either
+            ``"euclidean"`` (squared Euclidean distance), ``"manhattan"``,
+            ``"angular"`` (minus the scalar product), or a function of two
+            LazyTensors ``x_i`` and ``y_j`` which returns a symbolic matrix of distances.
+    """
+
+    LazyTensor = LazyTensor
+    from_matrix = staticmethod(from_matrix)
+    tools = torchtools
+
+    def save(self, path):
+        r"""Saves the fitted index in the file **path**, with ``torch.save``."""
+        torch.save(self._state(), path)
+
+    @classmethod
+    def load(cls, path, map_location=None):
+        r"""Loads an index saved with :meth:`save`. **map_location** is passed to ``torch.load``."""
+        state = torch.load(path, map_location=map_location)
+        return cls(state["metric"])._set_state(state)
+
+    @staticmethod
+    def _random_indices(N, n):
+        return torch.randperm(N)[:n]
+
+    @staticmethod
+    def _sort(labels):
+        return torch.sort(labels)
+
+    @staticmethod
+    def _ranges(labels, clusters):
+        # [start,end) indices of the clusters in the sorted array of labels
+        pivots = torch.bincount(labels, minlength=clusters).cumsum(0)
+        pivots = torch.cat((pivots.new_zeros(1), pivots))
+        return torch.stack((pivots[:-1], pivots[1:]), dim=1).int()
+
+    @staticmethod
+    def _update_centroids(x, labels, c):
+        counts = torch.bincount(labels, minlength=c.shape[0]).view(-1, 1)
+        sums = torch.zeros_like(c).index_add_(0, labels, x)
+        return torch.where(counts > 0, sums / counts.clamp(min=1).type_as(c), c)
+
+    @staticmethod
+    def _normalize(c):
+        return c / c.norm(dim=1, keepdim=True).clamp(min=1e-12)
+
+    @staticmethod
+    def _keep_matrix(probes, clusters):
+        keep = torch.zeros((clusters, clusters), dtype=torch.bool, device=probes.device)
+        keep[torch.arange(clusters, device=probes.device)[:, None], probes] = True
+        return keep
+
+    @staticmethod
+    def _unsort(a, perm):
+        res = torch.empty_like(a)
+        res[perm] = a
+        return res
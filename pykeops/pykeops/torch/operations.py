@@ -8,6 +8,8 @@ from pykeops.common.parse_type import (
     get_sizes,
     complete_aliases,
     get_optional_flags,
+    use_int64_index,
+    use_tiles,
 )
 from pykeops.common.utils import axis2cat
 from pykeops.torch.generic.generic_red import GenredAutograd
@@ -31,6 +33,10 @@ class KernelSolveAutograd(torch.autograd.Function):
         dtype,
         device_id_request,
         eps,
+        x0,
+        callback,
+        stats,
+        precond,
         ranges,
         optional_flags,
         rec_multVar_highdim,
@@ -87,7 +93,11 @@ class KernelSolveAutograd(torch.autograd.Function):
             len(args),
             dtype,
             "torch",
-            optional_flags,
+            dict(
+                optional_flags,
+                use_int64_index=use_int64_index(args),
+                use_tiles=use_tiles(aliases, args),
+            ),
         ).import_module()
 
         # Context variables: save everything to compute the gradient:
@@ -99,6 +109,7 @@ class KernelSolveAutograd(torch.autograd.Function):
         ctx.dtype = dtype
         ctx.device_id_request = device_id_request
         ctx.eps = eps
+        ctx.precond = precond
         ctx.nx = nx
         ctx.ny = ny
         ctx.myconv = myconv
@@ -119,7 +130,16 @@ class KernelSolveAutograd(torch.autograd.Function):
             return res
 
         global copy
-        result = ConjugateGradientSolver("torch", linop, varinv.data, eps)
+        result = ConjugateGradientSolver(
+            "torch",
+            linop,
+            varinv.data,
+            eps,
+            x0=None if x0 is None else x0.data,
+            callback=callback,
+            stats=stats,
+            precond=precond,
+        )
 
         # relying on the 'ctx.saved_variables' attribute is necessary  if you want to be able to differentiate the output
         #  of the backward once again. It helps pytorch to keep track of 'who is who'.
@@ -137,6 +157,7 @@ class KernelSolveAutograd(torch.autograd.Function):
         dtype = ctx.dtype
         device_id_request = ctx.device_id_request
         eps = ctx.eps
+        precond = ctx.precond
         nx = ctx.nx
         ny = ctx.ny
         myconv = ctx.myconv
@@ -182,6 +203,10 @@ class KernelSolveAutograd(torch.autograd.Function):
             dtype,
             device_id_request,
             eps,
+            None,
+            None,
+            None,
+            precond,
             ranges,
             optional_flags,
             rec_multVar_highdim,
@@ -195,8 +220,8 @@ class KernelSolveAutograd(torch.autograd.Function):
         for var_ind, sig in enumerate(aliases):  # Run through the arguments
             # If the current gradient is to be discarded immediatly...
             if not ctx.needs_input_grad[
-                var_ind + 13
-            ]:  # because of (formula, aliases, varinvpos, alpha, backend, dtype, device_id, eps, ranges, optional_flags, rec_multVar_highdim, nx, ny)
+                var_ind + 17
+            ]:  # because of (formula, aliases, varinvpos, alpha, backend, dtype, device_id, eps, x0, callback, stats, precond, ranges, optional_flags, rec_multVar_highdim, nx, ny)
                 grads.append(None)  # Don't waste time computing it.
 
             else:  # Otherwise, the current gradient is really needed by the user:
@@ -275,7 +300,7 @@ class KernelSolveAutograd(torch.autograd.Function):
                         )
                     grads.append(grad)
 
-        # Grads wrt. formula, aliases, varinvpos, alpha, backend, dtype, device_id_request, eps, ranges, optional_flags, rec_multVar_highdim, nx, ny, *args
+        # Grads wrt. formula, aliases, varinvpos, alpha, backend, dtype, device_id_request, eps, x0, callback, stats, precond, ranges, optional_flags, rec_multVar_highdim, nx, ny, *args
         return (
             None,
             None,
@@ -290,6 +315,10 @@ class KernelSolveAutograd(torch.autograd.Function):
             None,
             None,
             None,
+            None,
+            None,
+            None,
+            None,
             *grads,
         )
 
@@ -461,7 +490,17 @@ class KernelSolve:
         self.axis = axis
 
     def __call__(
-        self, *args, backend="auto", device_id=-1, alpha=1e-10, eps=1e-6, ranges=None
+        self,
+        *args,
+        backend="auto",
+        device_id=-1,
+        alpha=1e-10,
+        eps=1e-6,
+        ranges=None,
+        x0=None,
+        callback=None,
+        stats=None,
+        precond=None
     ):
         r"""
         Apply the routine on arbitrary torch Tensors.
@@ -502,6 +541,33 @@ class KernelSolve:
                 If **None** (default), we simply use a **dense Kernel matrix**
                 as we loop over all indices :math:`i\in[0,M)` and :math:`j\in[0,N)`.
 
+            eps (float, default=1e-6): Tolerance of the conjugate gradient solver.
+                The columns of the right-hand side are solved simultaneously
+                but with their own step sizes, and each column stops
+                being updated as soon as the mean squared value of its residual
+                is smaller than **eps** :math:`^2`.
+
+            x0 (Tensor, default=None): An initial guess for the solution,
+                with the same shape as the right-hand side. If **None** (default),
+                the conjugate gradient descent starts from zero. When a sequence of
+                close systems is solved (e.g. during the training of a Gaussian process),
+                using the previous solution as initial guess saves iterations.
+
+            callback (function, default=None): A function which is called after each
+                iteration of the conjugate gradient solver, with a copy of the current
+                solution as argument.
+
+            stats (dict, default=None): If not **None**, the number of iterations of the
+                solver is stored in ``stats["iterations"]``, and ``stats["residuals"]``
+                is the list of the norms of the residuals of the columns,
+                at the beginning and after each iteration.
+
+            precond (function, default=None): A function which applies the inverse of a
+                symmetric, positive definite **preconditioner** of the linear system
+                to a (M,D) or (N,D) Tensor, to speed up the convergence of the solver.
+                :mod:`pykeops.torch.approx` builds such preconditioners
+                from low-rank approximations of the kernel matrix.
+
         Returns:
             (M,D) or (N,D) Tensor:
 
@@ -526,6 +592,10 @@ class KernelSolve:
             dtype,
             device_id,
             eps,
+            x0,
+            callback,
+            stats,
+            precond,
             ranges,
             self.optional_flags,
             self.rec_multVar_highdim,
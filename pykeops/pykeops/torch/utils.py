@@ -3,7 +3,6 @@ import torch
 from pykeops.torch import Genred, KernelSolve
 from pykeops.torch.cluster import swap_axes as torch_swap_axes
 
-
 # from pykeops.torch.generic.generic_red import GenredLowlevel
 
 
@@ -23,6 +22,8 @@ class torchtools:
     KernelSolve = KernelSolve
 
     arraytype = torch.Tensor
+    float32 = torch.float32
+    int64 = torch.int64
     float_types = [float]
 
     # GenredLowlevel = GenredLowlevel
@@ -31,6 +32,26 @@ class torchtools:
     def eq(x, y):
         return torch.eq(x, y)
 
+    @staticmethod
+    def where(cond, x, y):
+        return torch.where(cond, x, y)
+
+    @staticmethod
+    def concatenate(x, axis):
+        return torch.cat(x, dim=axis)
+
+    @staticmethod
+    def argsort(x, axis):
+        return torch.sort(x, dim=axis, stable=True)[1]
+
+    @staticmethod
+    def take_along_axis(x, ind, axis):
+        return torch.gather(x, axis, ind)
+
+    @staticmethod
+    def astype(x, dtype):
+        return x.to(getattr(torch, dtype))
+
     @staticmethod
     def transpose(x):
         return x.t()
@@ -120,6 +141,8 @@ class torchtools:
             return "float64"
         elif dtype == torch.float16:
             return "float16"
+        elif dtype == torch.bfloat16:
+            return "bfloat16"
         elif dtype == int:
             return int
         elif dtype == list:
@@ -159,6 +182,10 @@ class torchtools:
             *shape, dtype=dtype, device=device, requires_grad=requires_grad
         )
 
+    @staticmethod
+    def empty_long(shape, device):
+        return torch.empty(*shape, dtype=torch.int64, device=device)
+
     @staticmethod
     def eye(n, dtype, device):
         return torch.eye(n, dtype=dtype, device=device)
@@ -171,6 +198,8 @@ class torchtools:
             dtype = torch.float64
         elif dtype == "float16":
             dtype = torch.float16
+        elif dtype == "bfloat16":
+            dtype = torch.bfloat16
         elif dtype == "int32":
             dtype = torch.int32
         else:
@@ -190,6 +219,10 @@ class torchtools:
     def get_pointer(x):
         return x.data_ptr()
 
+    @staticmethod
+    def strides(x):
+        return x.stride()
+
     @staticmethod
     def device_type_index(x):
         if isinstance(x, torch.Tensor):
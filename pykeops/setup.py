@@ -49,11 +49,14 @@ setup(
         "pykeops.numpy",
         "pykeops.numpy.cluster",
         "pykeops.numpy.generic",
+        "pykeops.numpy.knn",
         "pykeops.numpy.lazytensor",
         "pykeops.test",
         "pykeops.torch",
+        "pykeops.torch.approx",
         "pykeops.torch.cluster",
         "pykeops.torch.generic",
+        "pykeops.torch.knn",
         "pykeops.torch.lazytensor",
     ],
     package_data={